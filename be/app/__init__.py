@@ -1,18 +1,51 @@
-from flask import Flask, jsonify
+import time
+from flask import Flask, jsonify, g, request
 from flask_cors import CORS
 from app.config import Config, SWAGGER_CONFIG, SWAGGER_TEMPLATE
-from app.database import mongo
+from app.database import mongo, mongo_client_options
 from flasgger import Swagger
 from app.route import register_blueprints
+from app.serialization import FastJSONProvider
+from app.metrics import HTTP_REQUEST_SECONDS
+from app.profiling import request_profiling, reset_profiling
 
 def create_app(): 
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    mongo.init_app(app)
+    mongo.init_app(app, **mongo_client_options(app.config))
+    # Đặt sau init_app vì Flask-PyMongo ghi đè app.json bằng BSONProvider
+    app.json = FastJSONProvider(app)
     CORS(app)
 
     Swagger(app, config=SWAGGER_CONFIG, template=SWAGGER_TEMPLATE)
     register_blueprints(app)
+    register_request_metrics(app)
+    register_request_profiling(app)
     
-    return app
\ No newline at end of file
+    return app
+
+
+def register_request_metrics(app):
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                         method=request.method, route=route, status=response.status_code)
+        return response
+
+
+def register_request_profiling(app):
+    @app.before_request
+    def enable_request_profiling():
+        g.profile_token = request_profiling(request.headers.get('X-Profile'))
+
+    @app.teardown_request
+    def disable_request_profiling(exc):
+        reset_profiling(g.pop('profile_token', None))
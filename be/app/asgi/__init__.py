@@ -0,0 +1,45 @@
+import re
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.routing import Mount
+from app import create_app
+from app.asgi import water_meters, predictions
+from app.asgi.executor import shutdown_executor
+from app.asgi.middleware import RequestMetricsMiddleware
+from app.config import Config
+from app.database import amongo
+from app.services.prediction_jobs import start_prediction_workers, stop_prediction_workers
+
+
+def flask_rule(path):
+    # Nhãn metric giống route Flask: {meter_id:int} -> <int:meter_id>
+    return re.sub(r'\{(\w+):(\w+)\}', r'<\2:\1>', path)
+
+
+def create_asgi_app(flask_app=None):
+    # Các route nóng chạy async trên motor; mọi route còn lại (data-init, bulk, exports, docs...) đi qua ứng dụng Flask
+    flask_app = flask_app or create_app()
+    native_routes = water_meters.routes + predictions.routes
+
+    @asynccontextmanager
+    async def lifespan(app):
+        amongo.init_app(flask_app.config)
+        start_prediction_workers()
+        try:
+            yield
+        finally:
+            stop_prediction_workers()
+            amongo.close()
+            shutdown_executor()
+
+    return Starlette(
+        routes=native_routes + [Mount('/', app=WSGIMiddleware(flask_app, workers=Config.WSGI_FALLBACK_WORKERS))],
+        # CORS cho cả route async: giống flask_cors mặc định, chấp nhận mọi origin và phản hồi lại Origin của request
+        middleware=[Middleware(CORSMiddleware, allow_origin_regex='.*', allow_methods=['*'], allow_headers=['*']),
+                    Middleware(RequestMetricsMiddleware,
+                               route_paths={route.endpoint: flask_rule(route.path) for route in native_routes})],
+        lifespan=lifespan,
+    )
@@ -0,0 +1,19 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from app.config import Config
+
+# Suy luận (torch) và các tác vụ CPU chạy trên pool riêng để không chặn event loop
+inference_executor = ThreadPoolExecutor(max_workers=Config.INFERENCE_EXECUTOR_WORKERS, thread_name_prefix='inference')
+
+
+async def run_inference(fn, *args, **kwargs):
+    # Sao chép context để các contextvar của request (vd. X-Profile) áp dụng cả trong luồng suy luận
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(inference_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown_executor():
+    inference_executor.shutdown(wait=True, cancel_futures=False)
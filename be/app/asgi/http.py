@@ -0,0 +1,37 @@
+from json import JSONDecodeError
+from starlette.responses import Response
+from app.serialization import dumps_bytes, loads
+
+
+class JSONResponse(Response):
+    # Cùng bộ mã hoá với FastJSONProvider của Flask để phản hồi giống hệt bản WSGI
+    media_type = 'application/json'
+
+    def render(self, content):
+        return dumps_bytes(content)
+
+
+def json_response(content, status_code=200):
+    return JSONResponse(content, status_code=status_code)
+
+
+def error_response(message, status_code):
+    return JSONResponse({"error": message}, status_code=status_code)
+
+
+def query_int(request, name, default=None):
+    # Giống request.args.get(name, default, type=int): giá trị không hợp lệ trả về default
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+
+async def read_json(request):
+    body = await request.body()
+    if not body:
+        return None
+    try:
+        return loads(body)
+    except (JSONDecodeError, ValueError):
+        return None
@@ -0,0 +1,35 @@
+import time
+from app.metrics import HTTP_REQUEST_SECONDS
+from app.profiling import request_profiling, reset_profiling
+
+
+class RequestMetricsMiddleware:
+    # Đo thời gian và bật profiling theo header cho các route async; route Flask phía sau tự đo trong after_request
+    def __init__(self, app, route_paths):
+        self.app = app
+        self.route_paths = route_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        profile_header = headers.get(b'x-profile')
+        token = request_profiling(profile_header.decode('latin-1') if profile_header else None)
+        status = {}
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            reset_profiling(token)
+            route = self.route_paths.get(scope.get('endpoint'))
+            if route is not None:
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                             method=scope['method'], route=route, status=status.get('code', 500))
@@ -0,0 +1,93 @@
+from starlette.routing import Route
+from app.asgi.executor import run_inference
+from app.asgi.http import json_response, error_response, query_int, read_json
+from app.ml.inference import inference
+from app.repositories.aio import meters, predictions, thresholds
+
+# Bản async của các route trong prediction_bp
+
+
+async def manual_prediction(request):
+    try:
+        data = await read_json(request)
+        if not data:
+            return error_response("Dữ liệu đầu vào không hợp lệ", 400)
+
+        if 'meter_id' not in data or 'flow_rate' not in data:
+            return error_response("Thiếu trường bắt buộc", 400)
+
+        meter_id = data['meter_id']
+        flow_rate = data['flow_rate']
+
+        meter = await meters.get(meter_id, {"_id": 0, "meter_id": 1})
+        if not meter:
+            return error_response("Không tìm thấy đồng hồ nước", 404)
+
+        is_anomaly, confidence, reconstruction_error, threshold = await run_inference(
+            inference.predict_one, meter_id, flow_rate, data.get('pressure')
+        )
+
+        return json_response({
+            'meter_id': int(meter_id),
+            'flow_rate': float(flow_rate),
+            'is_anomaly': bool(is_anomaly),
+            'predicted_label': "Rò rỉ" if is_anomaly else "Bình thường",
+            'confidence': float(confidence),
+            'reconstruction_error': float(reconstruction_error),
+            'threshold': float(threshold),
+            'message': 'Dự đoán thành công'
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+async def recalculate_threshold(request):
+    try:
+        meter_id = request.path_params['meter_id']
+        meter = await meters.get(meter_id, {"_id": 0, "meter_id": 1})
+        if not meter:
+            return error_response("Không tìm thấy đồng hồ nước", 404)
+
+        data = await read_json(request) or {}
+        days_back = data.get('days_back', 7)
+
+        threshold = await run_inference(inference.calculate_threshold, meter_id, days_back)
+        await thresholds.set(meter_id, threshold)
+        return json_response({
+            'meter_id': meter_id,
+            'threshold': threshold,
+            'days_back': days_back,
+            'message': 'Tính toán ngưỡng thành công'
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+async def get_all_predictions(request):
+    try:
+        meter_id = query_int(request, 'meter_id')
+        limit = query_int(request, 'limit', 50)
+
+        query_filter = {}
+        if meter_id:
+            query_filter['meter_id'] = meter_id
+
+        prediction_docs = await predictions.page(query_filter, limit=limit)
+        total_count = await predictions.count(query_filter)
+
+        return json_response({
+            'predictions': prediction_docs,
+            'total_count': total_count,
+            'message': f'Lấy được {len(prediction_docs)} predictions'
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+PREFIX = '/api/predictions'
+
+routes = [
+    Route(f'{PREFIX}/predictions/manual', manual_prediction, methods=['POST']),
+    Route(f'{PREFIX}/predictions/threshold/{{meter_id:int}}', recalculate_threshold, methods=['POST']),
+    Route(f'{PREFIX}/predictions', get_all_predictions, methods=['GET']),
+]
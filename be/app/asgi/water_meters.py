@@ -0,0 +1,221 @@
+from datetime import datetime
+from starlette.routing import Route
+from pymongo.errors import DuplicateKeyError
+from app.asgi.executor import run_inference
+from app.asgi.http import json_response, error_response, query_int, read_json
+from app.ml.inference import inference
+from app.models import WaterMeter
+from app.repositories.aio import meters, measurements, predictions
+from app.routes.water_meter_route import (
+    PREDICTION_DETAIL_PROJECTION, meter_status_label
+)
+from app.services.prediction_jobs import new_prediction_job, notify_workers
+from app.services.rollups import SCOPES, measurement_update, rollup_update_ops
+from app.database import amongo
+from app.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Bản async của các route trong water_meter_bp; POST /water_meters/bulk vẫn do Flask xử lý
+
+
+async def create_water_meter(request):
+    try:
+        data = await read_json(request)
+
+        if not data:
+            return error_response("Invalid input data", 400)
+
+        if 'branch_id' not in data or 'meter_name' not in data or 'installation_time' not in data:
+            return error_response("Missing required fields", 400)
+
+        meter_id = (await meters.reserve_ids(1))[0]
+        new_meter = {
+            'meter_id': meter_id,
+            'branch_id': data['branch_id'],
+            'meter_name': data['meter_name'],
+            'installation_time': data.get('installation_time', datetime.utcnow().isoformat()),
+            'threshold': await run_inference(inference.calculate_threshold, meter_id)
+        }
+
+        result = await meters.insert_one(new_meter)
+
+        if result.inserted_id:
+            return json_response({
+                'message': 'Water meter created successfully',
+                'data': WaterMeter.to_dict(new_meter)
+            }, 201)
+        return error_response("Failed to create water meter", 500)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+async def get_all_water_meters(request):
+    try:
+        branch_id = query_int(request, 'branch_id')
+        page = query_int(request, 'page', 1)
+        limit = query_int(request, 'limit', 10)
+
+        skip = (page - 1) * limit
+
+        meter_docs = await meters.page(branch_id, skip=skip, limit=limit)
+        total_count = await meters.count_for_branch(branch_id)
+
+        return json_response({
+            'data': [WaterMeter.to_dict(meter) for meter in meter_docs],
+            'total_count': total_count,
+            'page': page,
+            'limit': limit
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+async def get_water_meter_details_predictions(request):
+    try:
+        meter_id = request.path_params['meter_id']
+        meter = await meters.get(meter_id, {"_id": 0, "meter_name": 1})
+        if not meter:
+            return error_response("Water meter not found", 404)
+        page = query_int(request, 'page', 1)
+        limit = query_int(request, 'limit', 20)
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+
+        query_filter = {"meter_id": meter_id}
+
+        if start_date or end_date:
+            time_filter = {}
+            if start_date:
+                time_filter["$gte"] = start_date + "T00:00:00"
+            if end_date:
+                time_filter["$lte"] = end_date + "T23:59:59"
+            query_filter["prediction_time"] = time_filter
+
+        skip = (page - 1) * limit
+        predictions_data = await predictions.page_projected(query_filter, PREDICTION_DETAIL_PROJECTION, skip=skip, limit=limit)
+        total_count = await predictions.count(query_filter)
+
+        return json_response({
+            'data': predictions_data,
+            'total_count': total_count,
+            'page': page,
+            'limit': limit,
+            'meter_info': {
+                'meter_id': meter_id,
+                'meter_name': meter.get('meter_name', f'Water Meter {meter_id}')
+            }
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+async def get_water_meter_status(request):
+    try:
+        meter_id = request.path_params['meter_id']
+        meter = await meters.get(meter_id)
+        if not meter:
+            return error_response("Không tìm thấy đồng hồ nước", 404)
+
+        return json_response({
+            "meter_id": meter_id,
+            "meter_name": meter.get("meter_name"),
+            "status": meter_status_label(await predictions.latest(meter_id)),
+        })
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+async def get_all_water_meters_status(request):
+    try:
+        branch_id = query_int(request, 'branch_id')
+
+        meter_docs = await meters.page(branch_id)
+        latest = await predictions.latest_for_meters([meter['meter_id'] for meter in meter_docs])
+
+        return json_response({"data": [{
+            "meter_id": meter['meter_id'],
+            "meter_name": meter.get("meter_name"),
+            "branch_id": meter.get("branch_id"),
+            "status": meter_status_label(latest.get(meter['meter_id'])),
+        } for meter in meter_docs]})
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+async def record_measurement_rollups(meter_id, branch_id, measurement_time, instant_flow):
+    update = measurement_update(instant_flow)
+    for scope_name, key_value in (('meter', meter_id), ('branch', branch_id)):
+        if key_value is None:
+            continue
+        collection, key_field = SCOPES[scope_name]
+        await amongo.db[collection].bulk_write(
+            rollup_update_ops(key_field, key_value, measurement_time, update), ordered=False)
+
+
+async def enqueue_prediction(measurement_id, meter_id, branch_id, flow_rate, measurement_time, pressure=None):
+    try:
+        await amongo.db.prediction_jobs.insert_one(
+            new_prediction_job(measurement_id, meter_id, branch_id, flow_rate, measurement_time, pressure))
+    except DuplicateKeyError:
+        return
+    notify_workers()
+
+
+async def create_measurement_with_prediction(request):
+    try:
+        meter_id = request.path_params['meter_id']
+        meter = await meters.get(meter_id)
+        if not meter:
+            return error_response("Không tìm thấy đồng hồ nước", 404)
+
+        data = await read_json(request)
+        if not data:
+            return error_response("Dữ liệu đầu vào không hợp lệ", 400)
+
+        if 'instant_flow' not in data or 'measurement_time' not in data:
+            return error_response("Thiếu trường bắt buộc", 400)
+
+        new_id = (await measurements.reserve_ids(1))[0]
+
+        new_measurement = {
+            'id': new_id,
+            'meter_id': meter_id,
+            'instant_flow': float(data['instant_flow']),
+            'measurement_time': data['measurement_time'],
+            'instant_pressure': float(data['instant_pressure']) if data.get('instant_pressure') is not None else None
+        }
+
+        result = await measurements.insert_one(new_measurement)
+
+        if not result.inserted_id:
+            return error_response("Không thể ghi dữ liệu đo", 500)
+
+        try:
+            await record_measurement_rollups(meter_id, meter.get('branch_id'),
+                                             new_measurement['measurement_time'], new_measurement['instant_flow'])
+        except Exception:
+            logger.exception("Lỗi khi cập nhật rollup cho đồng hồ %s", meter_id)
+
+        await enqueue_prediction(new_id, meter_id, meter.get('branch_id'), data['instant_flow'], data['measurement_time'],
+                                 new_measurement['instant_pressure'])
+
+        return json_response({
+            'message': 'Ghi dữ liệu đo thành công',
+            'measurement_id': new_id,
+            'prediction_processing': 'đã bắt đầu'
+        }, 201)
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+PREFIX = '/api/water-meters'
+
+routes = [
+    Route(f'{PREFIX}/water_meters', create_water_meter, methods=['POST']),
+    Route(f'{PREFIX}/water_meters', get_all_water_meters, methods=['GET']),
+    Route(f'{PREFIX}/water_meters/status', get_all_water_meters_status, methods=['GET']),
+    Route(f'{PREFIX}/water_meters/{{meter_id:int}}/predictions', get_water_meter_details_predictions, methods=['GET']),
+    Route(f'{PREFIX}/water_meters/{{meter_id:int}}/status', get_water_meter_status, methods=['GET']),
+    Route(f'{PREFIX}/water_meters/{{meter_id:int}}/measurements', create_measurement_with_prediction, methods=['POST']),
+]
@@ -4,6 +4,68 @@ from dotenv import load_dotenv
 load_dotenv()
 class Config: 
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/mydatabase')
+    # Pool kết nối dùng chung cho mọi luồng của một process: nên >= số luồng xử lý request + luồng nền của mỗi worker
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '0'))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '0'))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '20000'))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000'))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '0'))
+    MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', 'primary')
+    MONGO_WRITE_CONCERN = os.getenv('MONGO_WRITE_CONCERN', '1')
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '2000'))
+    ROLLUP_HOURLY_MAX_DAYS = int(os.getenv('ROLLUP_HOURLY_MAX_DAYS', '7'))
+    ROLLUP_DAILY_MAX_DAYS = int(os.getenv('ROLLUP_DAILY_MAX_DAYS', '180'))
+    MEASUREMENT_RETENTION_DAYS = int(os.getenv('MEASUREMENT_RETENTION_DAYS', '0'))
+    PREDICTION_RETENTION_DAYS = int(os.getenv('PREDICTION_RETENTION_DAYS', '0'))
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')
+    ARCHIVE_COMPRESSION = os.getenv('ARCHIVE_COMPRESSION', 'zstd')
+    # Bộ đệm chuỗi đo cục bộ (memmap) cho tính ngưỡng/chấm điểm lại: chỉ đọc phần mới từ MongoDB
+    WINDOW_STORE_ENABLED = os.getenv('WINDOW_STORE_ENABLED', 'false').lower() == 'true'
+    WINDOW_STORE_DIR = os.getenv('WINDOW_STORE_DIR', 'window_store')
+    DEBUG = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
+    # Gunicorn (gunicorn.conf.py): số worker/luồng, timeout; PRELOAD_MODEL tải trọng số trong process master trước fork
+    GUNICORN_BIND = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+    GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', str(os.cpu_count() or 1)))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '4'))
+    GUNICORN_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+    GUNICORN_GRACEFUL_TIMEOUT = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+    GUNICORN_KEEPALIVE = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+    GUNICORN_MAX_REQUESTS = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+    GUNICORN_MAX_REQUESTS_JITTER = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+    PRELOAD_MODEL = os.getenv('PRELOAD_MODEL', 'true').lower() == 'true'
+    # POST /api/data-init/init_data xoá toàn bộ dữ liệu: tắt mặc định, chỉ bật trong môi trường phát triển
+    DATA_INIT_ENDPOINT_ENABLED = os.getenv('DATA_INIT_ENDPOINT_ENABLED', 'false').lower() == 'true'
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_RATE_LIMIT = int(os.getenv('LOG_RATE_LIMIT', '20'))
+    LOG_RATE_INTERVAL = float(os.getenv('LOG_RATE_INTERVAL', '10'))
+    # Ứng dụng ASGI (asgi.py): số luồng suy luận và số luồng phục vụ các route Flask phía sau
+    INFERENCE_EXECUTOR_WORKERS = int(os.getenv('INFERENCE_EXECUTOR_WORKERS', '2'))
+    WSGI_FALLBACK_WORKERS = int(os.getenv('WSGI_FALLBACK_WORKERS', '10'))
+    # Hàng đợi dự đoán bền vững (prediction_jobs)
+    PREDICTION_WORKER_THREADS = int(os.getenv('PREDICTION_WORKER_THREADS', '2'))
+    PREDICTION_JOB_BATCH_SIZE = int(os.getenv('PREDICTION_JOB_BATCH_SIZE', '16'))
+    PREDICTION_JOB_POLL_SECONDS = float(os.getenv('PREDICTION_JOB_POLL_SECONDS', '1'))
+    PREDICTION_JOB_LEASE_SECONDS = int(os.getenv('PREDICTION_JOB_LEASE_SECONDS', '120'))
+    PREDICTION_JOB_MAX_ATTEMPTS = int(os.getenv('PREDICTION_JOB_MAX_ATTEMPTS', '5'))
+    PREDICTION_JOB_BACKOFF_SECONDS = float(os.getenv('PREDICTION_JOB_BACKOFF_SECONDS', '2'))
+    PREDICTION_JOB_BACKOFF_MAX_SECONDS = float(os.getenv('PREDICTION_JOB_BACKOFF_MAX_SECONDS', '300'))
+    # Bộ đệm thông tin đồng hồ theo từng process (0 = tắt)
+    METER_CACHE_TTL_SECONDS = float(os.getenv('METER_CACHE_TTL_SECONDS', '60'))
+    METER_CACHE_MAX_SIZE = int(os.getenv('METER_CACHE_MAX_SIZE', '100000'))
+    # Cảnh báo rò rỉ: mở sau ALERT_OPEN_AFTER prediction bất thường liên tiếp (hoặc ngay khi độ tin cậy
+    # >= ALERT_CRITICAL_CONFIDENCE), đóng sau ALERT_CLOSE_AFTER prediction bình thường liên tiếp
+    ALERT_OPEN_AFTER = int(os.getenv('ALERT_OPEN_AFTER', '3'))
+    ALERT_CLOSE_AFTER = int(os.getenv('ALERT_CLOSE_AFTER', '6'))
+    ALERT_CRITICAL_CONFIDENCE = float(os.getenv('ALERT_CRITICAL_CONFIDENCE', '0.9'))
+    ALERT_CRITICAL_AFTER = int(os.getenv('ALERT_CRITICAL_AFTER', '12'))
+    ALERT_STATE_RETRIES = int(os.getenv('ALERT_STATE_RETRIES', '3'))
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_ALLOW_HEADER = os.getenv('PROFILE_ALLOW_HEADER', 'false').lower() == 'true'
+    PROFILE_ENGINE = os.getenv('PROFILE_ENGINE', 'cprofile')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '200'))
 
 SWAGGER_CONFIG = {
     "headers": [], 
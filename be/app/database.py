@@ -1,3 +1,88 @@
 from flask_pymongo import PyMongo
+from pymongo import MongoClient
 
-mongo = PyMongo()
\ No newline at end of file
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:
+    AsyncIOMotorClient = None
+
+mongo = PyMongo()
+
+
+class AsyncMongo:
+    # Client motor cho ứng dụng ASGI, tương tự PyMongo: cx là client, db là database trong MONGO_URI
+    def __init__(self):
+        self.cx = None
+        self.db = None
+
+    def init_app(self, config):
+        if AsyncIOMotorClient is None:
+            raise RuntimeError("Async serving requires the motor package")
+        self.cx = AsyncIOMotorClient(config['MONGO_URI'], **mongo_client_options(config))
+        self.db = self.cx.get_default_database()
+
+    def close(self):
+        if self.cx is not None:
+            self.cx.close()
+
+
+amongo = AsyncMongo()
+
+def mongo_client_options(config):
+    # Tham số MongoClient lấy từ Config; giá trị 0 nghĩa là dùng mặc định của pymongo (không giới hạn)
+    options = {
+        'maxPoolSize': config['MONGO_MAX_POOL_SIZE'],
+        'minPoolSize': config['MONGO_MIN_POOL_SIZE'],
+        'maxIdleTimeMS': config['MONGO_MAX_IDLE_TIME_MS'] or None,
+        'waitQueueTimeoutMS': config['MONGO_WAIT_QUEUE_TIMEOUT_MS'] or None,
+        'connectTimeoutMS': config['MONGO_CONNECT_TIMEOUT_MS'],
+        'serverSelectionTimeoutMS': config['MONGO_SERVER_SELECTION_TIMEOUT_MS'],
+        'socketTimeoutMS': config['MONGO_SOCKET_TIMEOUT_MS'] or None,
+        'readPreference': config['MONGO_READ_PREFERENCE'],
+    }
+    write_concern = config['MONGO_WRITE_CONCERN']
+    options['w'] = int(write_concern) if write_concern.isdigit() else write_concern
+    return {key: value for key, value in options.items() if value is not None}
+
+def reconnect_mongo(config):
+    # Gọi trong process con sau fork (gunicorn preload_app): client của process cha không an toàn khi dùng sau fork
+    database_name = mongo.db.name if mongo.db is not None else None
+    mongo.cx = MongoClient(config['MONGO_URI'], connect=False, **mongo_client_options(config))
+    mongo.db = mongo.cx[database_name] if database_name else None
+
+def ensure_unique_index(collection, field):
+    # Chỉ mục cũ cùng khoá nhưng không unique phải bỏ trước khi tạo lại
+    name = f"{field}_1"
+    index = collection.index_information().get(name)
+    if index is not None and not index.get('unique'):
+        collection.drop_index(name)
+    collection.create_index(field, unique=True)
+
+def ensure_indexes():
+    mongo.db.water_meters.create_index("meter_id")
+    mongo.db.meter_measurement_data.create_index([("meter_id", 1), ("measurement_time", -1)])
+    mongo.db.meter_measurement_data.create_index("id", unique=True)
+    mongo.db.meter_measurement_data.create_index([("measurement_time", 1), ("id", 1)])
+    mongo.db.predictions.create_index([("meter_id", 1), ("prediction_time", -1)])
+    ensure_unique_index(mongo.db.predictions, "p_id")
+    mongo.db.predictions.create_index([("prediction_time", 1), ("p_id", 1)])
+    mongo.db.predictions.create_index("measurement_id", unique=True,
+                                      partialFilterExpression={"measurement_id": {"$exists": True}})
+    mongo.db.prediction_jobs.create_index([("status", 1), ("available_at", 1)])
+    mongo.db.prediction_jobs.create_index([("status", 1), ("lease_expires_at", 1)])
+    mongo.db.meter_rollups.create_index([("meter_id", 1), ("resolution", 1), ("bucket", 1)], unique=True)
+    mongo.db.branch_rollups.create_index([("branch_id", 1), ("resolution", 1), ("bucket", 1)], unique=True)
+    mongo.db.meter_status.create_index("meter_id", unique=True)
+    mongo.db.meter_status.create_index([("branch_id", 1), ("is_leak", 1)])
+    mongo.db.alerts.create_index("id", unique=True)
+    mongo.db.alerts.create_index([("status", 1), ("branch_id", 1), ("time", -1)])
+    mongo.db.alerts.create_index([("meter_id", 1), ("time", -1)])
+    # Mỗi đồng hồ có tối đa một cảnh báo đang mở
+    mongo.db.alerts.create_index("meter_id", unique=True, name="meter_id_open",
+                                 partialFilterExpression={"status": "open"})
+    mongo.db.alert_state.create_index("meter_id", unique=True)
+    mongo.db.shadow_predictions.create_index([("candidate_model_id", 1), ("measurement_id", 1)], unique=True)
+    mongo.db.shadow_predictions.create_index([("candidate_model_id", 1), ("measurement_time", 1)])
+    # Bộ đếm id: seed một lần ở đây thay vì trên mỗi lần cấp id
+    from app.repositories import seed_counters
+    seed_counters()
@@ -0,0 +1,101 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from app.config import Config
+from app.serialization import dumps_bytes
+
+_configured = False
+_configure_lock = threading.Lock()
+_listener = None
+
+
+class RateLimitFilter(logging.Filter):
+    # Giới hạn số bản ghi cho mỗi mẫu thông điệp trong một khoảng thời gian; số bản bị bỏ được báo ở bản kế tiếp
+    def __init__(self, limit, interval):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.windows = {}
+
+    def filter(self, record):
+        if self.limit <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window_start, count, suppressed = self.windows.get(key, (now, 0, 0))
+            if now - window_start >= self.interval:
+                window_start, count = now, 0
+            if count >= self.limit:
+                self.windows[key] = (window_start, count, suppressed + 1)
+                return False
+            self.windows[key] = (window_start, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return dumps_bytes(entry).decode('utf-8')
+
+
+def start_listener(log_queue, handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+
+
+def restart_listener_after_fork():
+    # Luồng ghi log không còn trong process con sau fork (gunicorn preload_app): tạo luồng mới cho cùng hàng đợi
+    if _listener is not None:
+        start_listener(_listener.queue, *_listener.handlers)
+
+
+def configure_logging():
+    # Ghi log qua hàng đợi: luồng xử lý request chỉ đưa bản ghi vào queue, việc ghi ra stderr chạy ở luồng nền
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(RateLimitFilter(Config.LOG_RATE_LIMIT, Config.LOG_RATE_INTERVAL))
+
+        root = logging.getLogger('app')
+        root.setLevel(Config.LOG_LEVEL)
+        root.addHandler(queue_handler)
+        root.propagate = False
+
+        start_listener(log_queue, handler)
+        atexit.register(lambda: _listener.stop())
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=restart_listener_after_fork)
+        _configured = True
+
+
+def get_logger(name):
+    configure_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Bộ đếm dạng Prometheus tối giản, giữ trong bộ nhớ của từng process. Mỗi worker gunicorn có số liệu riêng nên mọi
+# mẫu mang nhãn worker (pid): mỗi lần scrape /metrics có thể do worker khác trả lời, chuỗi của từng worker vẫn không
+# bị giảm; cộng gộp phía Prometheus bằng sum without (worker)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(label_names, label_values, *extra):
+    pairs = list(zip(label_names, label_values))
+    pairs.extend(pair for pair in extra if pair)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, None, value) for key, value in self.values.items()]
+
+    def render(self, worker=None):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+        for name, key, extra, value in self.samples():
+            lines.append(f'{name}{format_labels(self.label_names, key, extra, worker)} {value}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount=1.0, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def inc(self, amount=1.0, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self.lock:
+            snapshot = [(key, list(state['counts']), state['sum'], state['count']) for key, state in self.values.items()]
+        samples = []
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f'{self.name}_bucket', key, ('le', repr(bound)), cumulative))
+            samples.append((f'{self.name}_bucket', key, ('le', '+Inf'), count))
+            samples.append((f'{self.name}_sum', key, None, total))
+            samples.append((f'{self.name}_count', key, None, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        worker = ('worker', str(os.getpid()))
+        return '\n'.join(metric.render(worker) for metric in self.metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('method', 'route', 'status')))
+PREDICTION_STAGE_SECONDS = REGISTRY.register(Histogram(
+    'prediction_stage_seconds', 'Time spent in each prediction stage (fetch, scaler, forward, write, threshold)', ('stage',)))
+PREDICTIONS_TOTAL = REGISTRY.register(Counter(
+    'predictions_total', 'Predictions made, by outcome', ('outcome',)))
+PREDICTION_BACKLOG = REGISTRY.register(Gauge(
+    'prediction_backlog', 'Prediction jobs queued or leased'))
+PREDICTION_JOBS_TOTAL = REGISTRY.register(Counter(
+    'prediction_jobs_total', 'Prediction job outcomes (done, retry, dead)', ('outcome',)))
+ALERTS_TOTAL = REGISTRY.register(Counter(
+    'alerts_total', 'Alert transitions by event (opened, escalated, closed)', ('event',)))
+SHADOW_PREDICTIONS_TOTAL = REGISTRY.register(Counter(
+    'shadow_predictions_total', 'Shadow model predictions by outcome (recorded, dropped, error)', ('outcome',)))
+INFERENCE_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'inference_request_seconds', 'Round trip to the inference server by operation', ('op',)))
+DB_OPERATION_SECONDS = REGISTRY.register(Histogram(
+    'db_operation_seconds', 'MongoDB operation latency by collection and operation', ('collection', 'operation')))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit/miss)', ('cache', 'result')))
+MODEL_LOAD_SECONDS = REGISTRY.register(Gauge(
+    'model_load_seconds', 'Time taken by the last model load', ('model',)))
@@ -5,11 +5,50 @@ load_dotenv()
 class MLConfig: 
     LSTM_AE_MODEL_PATH = os.getenv('LSTM_AE_MODEL_PATH', 'app/ml/models/lstm_autoencoder/lstm_ae.pth')
 
+    # Các cột của meter_measurement_data làm đầu vào mô hình, phải có instant_flow (vd. "instant_flow,instant_pressure")
+    LSTM_AE_FEATURES = [feature.strip() for feature in os.getenv('LSTMAE_FEATURES', 'instant_flow').split(',') if feature.strip()]
+
     LSTM_AE_CONFIG = {
-        'input_size': int(os.getenv("LSTMAE_INPUT_SIZE", "1")),  
+        'input_size': int(os.getenv("LSTMAE_INPUT_SIZE", str(len(LSTM_AE_FEATURES)))),  
         'hidden_size': int(os.getenv("LSTMAE_HIDDEN_SIZE", "32")),
         'num_layers': int(os.getenv("LSTMAE_NUM_LAYERS", "1")),
         'dropout_ratio': float(os.getenv("LSTMAE_DROPOUT_RATIO", "0.1")),
         'seq_len': int(os.getenv("LSTMAE_SEQ_LEN", "168")),  
         'use_act': os.getenv("LSTMAE_USE_ACT", "true").lower() == "true",
-    }
\ No newline at end of file
+    }
+
+    # model_id trong ai_models của mô hình đang phục vụ, được ghi vào mỗi prediction. Nếu bản ghi có model_path/config/features
+    # (mô hình huấn luyện bằng app.ml.training) thì predictor dùng các giá trị đó thay cho LSTM_AE_MODEL_PATH
+    MODEL_ID = int(os.getenv('MODEL_ID', '1'))
+    # Shadow: mô hình ứng viên (model_id trong ai_models, 0 = tắt) chấm điểm một phần dự đoán trên luồng riêng
+    SHADOW_MODEL_ID = int(os.getenv('SHADOW_MODEL_ID', '0'))
+    SHADOW_SAMPLE_RATE = float(os.getenv('SHADOW_SAMPLE_RATE', '0.2'))
+    SHADOW_QUEUE_SIZE = int(os.getenv('SHADOW_QUEUE_SIZE', '1000'))
+    SHADOW_BATCH_SIZE = int(os.getenv('SHADOW_BATCH_SIZE', '32'))
+
+    # Số điểm đo gần nhất tối đa được đọc cho một lần tính ngưỡng
+    THRESHOLD_MAX_HISTORY = int(os.getenv('THRESHOLD_MAX_HISTORY', '5000'))
+    # Ngưỡng lấy từ sketch phân vị cập nhật sau mỗi dự đoán ("sketch") hoặc luôn tính lại từ lịch sử ("rescore")
+    THRESHOLD_SOURCE = os.getenv('THRESHOLD_SOURCE', 'sketch').lower()
+    THRESHOLD_PERCENTILE = float(os.getenv('THRESHOLD_PERCENTILE', '90'))
+    THRESHOLD_SKETCH_ACCURACY = float(os.getenv('THRESHOLD_SKETCH_ACCURACY', '0.01'))
+    # 0 = không suy giảm; ví dụ 168 để điểm cũ một tuần chỉ còn nửa trọng số
+    THRESHOLD_SKETCH_HALF_LIFE_HOURS = float(os.getenv('THRESHOLD_SKETCH_HALF_LIFE_HOURS', '0'))
+    THRESHOLD_SKETCH_MIN_COUNT = int(os.getenv('THRESHOLD_SKETCH_MIN_COUNT', '168'))
+
+    # Thiết bị và luồng torch cho suy luận. 0 = giữ mặc định của torch (một luồng cho mỗi lõi, dễ tranh CPU khi có nhiều worker)
+    TORCH_DEVICE = os.getenv('TORCH_DEVICE', 'auto').lower()
+    TORCH_INTRA_OP_THREADS = int(os.getenv('TORCH_INTRA_OP_THREADS', '0'))
+    TORCH_INTER_OP_THREADS = int(os.getenv('TORCH_INTER_OP_THREADS', '0'))
+    TORCH_INFERENCE_MODE = os.getenv('TORCH_INFERENCE_MODE', 'true').lower() == 'true'
+    # Ghim CPU cho process suy luận: "" = không ghim, "auto" = chia đều các lõi cho worker theo chỉ số, hoặc danh sách như "0-3,8"
+    TORCH_CPU_AFFINITY = os.getenv('TORCH_CPU_AFFINITY', '').strip().lower()
+
+    # Suy luận: "local" chạy predictor trong process API, "remote" gửi tới inference server (python -m app.ml.inference_server)
+    INFERENCE_MODE = os.getenv('INFERENCE_MODE', 'local').lower()
+    # Mặc định chỉ nghe trên loopback; authkey bắt buộc (kết nối dùng pickle, ai có authkey là chạy được mã)
+    INFERENCE_SERVER_ADDRESS = os.getenv('INFERENCE_SERVER_ADDRESS', '127.0.0.1:6100')
+    INFERENCE_SERVER_AUTHKEY = os.getenv('INFERENCE_SERVER_AUTHKEY', '').encode('utf-8')
+    INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '2'))
+    INFERENCE_TORCH_THREADS = int(os.getenv('INFERENCE_TORCH_THREADS', '1'))
+    INFERENCE_TIMEOUT = float(os.getenv('INFERENCE_TIMEOUT', '30'))
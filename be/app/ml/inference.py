@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import namedtuple
+from multiprocessing.connection import Client
+from app.metrics import INFERENCE_REQUEST_SECONDS
+from app.profiling import requested_engine, profiled
+from .config import MLConfig
+
+# Điểm vào duy nhất cho suy luận từ phía API. Chế độ remote không import torch trong process API.
+
+# Kết quả của item không chấm điểm được (lỗi đọc dữ liệu, tải hoặc chạy mô hình). Hàng đợi dự đoán thử lại job đó;
+# các API trả kết quả ngay dùng fallback_result (bình thường, ngưỡng đang lưu)
+PredictionFailure = namedtuple('PredictionFailure', ['meter_id', 'error', 'threshold'])
+
+
+def fallback_result(result):
+    if isinstance(result, PredictionFailure):
+        return False, 0.95, 0.0, result.threshold
+    return result
+
+
+def parse_address(address):
+    # "host:port" -> (host, port); đường dẫn (có "/") -> Unix socket
+    if '/' in address:
+        return address
+    host, _, port = address.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+
+def require_authkey(authkey):
+    if not authkey:
+        raise ValueError("INFERENCE_SERVER_AUTHKEY must be set to use the inference server")
+    return authkey
+
+
+class LocalInference:
+    def __init__(self):
+        self._predictor = None
+
+    @property
+    def predictor(self):
+        if self._predictor is None:
+            from app.ml.predict import predictor
+            self._predictor = predictor
+        return self._predictor
+
+    def predict_one(self, meter_id, flow_rate, pressure=None):
+        return self.predictor.predict_one(meter_id, flow_rate, pressure)
+
+    def predict_many(self, items):
+        # items: (meter_id, flow_rate) hoặc (meter_id, flow_rate, pressure); cả lô chạy qua mô hình trong một lượt forward
+        return self.predictor.predict_many(items)
+
+    def predict_with_windows(self, items):
+        # Kèm cửa sổ đầu vào đã chuẩn bị của từng item để mô hình shadow dùng lại; item lỗi là PredictionFailure
+        with profiled('predict', items=len(items)):
+            return self.predictor.predict_windows(items)
+
+    def calculate_threshold(self, meter_id, days_back=7, percentile=MLConfig.THRESHOLD_PERCENTILE):
+        return self.predictor.calculate_threshold(meter_id, days_back, percentile)
+
+
+class RemoteInference:
+    def __init__(self, address, authkey, timeout):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.timeout = timeout
+        # Mỗi luồng giữ một kết nối riêng: request/response trên cùng kết nối không bị xen kẽ
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = Client(self.address, authkey=self.authkey)
+        return conn
+
+    def drop_connection(self):
+        conn = getattr(self.local, 'conn', None)
+        self.local.conn = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def call(self, op, **payload):
+        request = dict(payload, op=op, profile=requested_engine())
+        with INFERENCE_REQUEST_SECONDS.time(op=op):
+            try:
+                conn = self.connection()
+                conn.send(request)
+                if not conn.poll(self.timeout):
+                    raise TimeoutError(f"Inference server did not answer {op} within {self.timeout}s")
+                response = conn.recv()
+            except (OSError, EOFError, TimeoutError):
+                # Kết nối hỏng hoặc phản hồi đến muộn: bỏ kết nối để lần sau mở lại, tránh đọc nhầm phản hồi cũ
+                self.drop_connection()
+                raise
+        if not response.get('ok'):
+            raise RuntimeError(f"Inference server error: {response.get('error')}")
+        return response['result']
+
+    def predict_one(self, meter_id, flow_rate, pressure=None):
+        return self.predict_many([(meter_id, flow_rate, pressure)])[0]
+
+    def predict_results(self, items):
+        return [result if isinstance(result, PredictionFailure) else tuple(result)
+                for result in self.call('predict', items=list(items))]
+
+    def predict_many(self, items):
+        return [fallback_result(result) for result in self.predict_results(items)]
+
+    def predict_with_windows(self, items):
+        # Cửa sổ nằm trong process suy luận, không gửi về API
+        return self.predict_results(items), None, None
+
+    def calculate_threshold(self, meter_id, days_back=7, percentile=MLConfig.THRESHOLD_PERCENTILE):
+        return self.call('threshold', meter_id=meter_id, days_back=days_back, percentile=percentile)
+
+    def ping(self):
+        started = time.perf_counter()
+        self.call('ping')
+        return time.perf_counter() - started
+
+
+def create_inference():
+    if MLConfig.INFERENCE_MODE == 'remote':
+        return RemoteInference(MLConfig.INFERENCE_SERVER_ADDRESS, MLConfig.INFERENCE_SERVER_AUTHKEY,
+                               MLConfig.INFERENCE_TIMEOUT)
+    return LocalInference()
+
+
+inference = create_inference()
@@ -0,0 +1,132 @@
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from multiprocessing.connection import Listener
+from app.logging_utils import get_logger
+from app.profiling import request_profiling, reset_profiling
+from .config import MLConfig
+from .inference import parse_address, require_authkey
+
+logger = get_logger(__name__)
+
+# Biến toàn cục trong mỗi process suy luận, được khởi tạo bởi init_worker
+_predictor = None
+
+
+def init_worker(torch_threads, workers):
+    # Chạy một lần trong mỗi process con (spawn): cố định số luồng torch, ghim CPU theo chỉ số worker, mở kết nối MongoDB riêng và tải mô hình
+    global _predictor
+    from app.ml.runtime import configure_torch
+    worker_index = multiprocessing.current_process()._identity[0] - 1
+    configure_torch(intra_threads=torch_threads, worker_index=worker_index, workers=workers)
+
+    from app import create_app
+    create_app()
+    from app.ml.predict import predictor
+    predictor.load_model()
+    _predictor = predictor
+
+
+def with_profiling(profile, fn, *args):
+    token = request_profiling(profile) if profile else None
+    try:
+        return fn(*args)
+    finally:
+        reset_profiling(token)
+
+
+def predict_chunk(items, profile=None):
+    # Phần lô của một process chạy qua mô hình trong một lượt forward; item lỗi trả về PredictionFailure
+    return with_profiling(profile, _predictor.predict_results, items)
+
+
+def split_items(items, workers):
+    # Mỗi process một đoạn liên tiếp, giữ nguyên thứ tự kết quả khi nối lại
+    size = max(1, -(-len(items) // workers))
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def threshold_item(meter_id, days_back, percentile, profile=None):
+    return float(with_profiling(profile, _predictor.calculate_threshold, meter_id, days_back, percentile))
+
+
+class InferenceServer:
+    def __init__(self, address, authkey, workers, torch_threads):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.pool = None
+
+    def dispatch(self, request):
+        try:
+            op = request.get('op')
+            profile = request.get('profile')
+            if op == 'ping':
+                result = {'pid': os.getpid(), 'workers': self.workers, 'torch_threads': self.torch_threads}
+            elif op == 'predict':
+                chunks = split_items([tuple(item) for item in request['items']], self.workers)
+                result = [item_result for chunk_results in
+                          self.pool.starmap(predict_chunk, [(chunk, profile) for chunk in chunks], chunksize=1)
+                          for item_result in chunk_results]
+            elif op == 'threshold':
+                result = self.pool.apply(threshold_item, (request['meter_id'], request.get('days_back', 7),
+                                                          request.get('percentile', MLConfig.THRESHOLD_PERCENTILE), profile))
+            else:
+                raise ValueError(f"Unknown op: {op}")
+            return {'ok': True, 'result': result}
+        except Exception as e:
+            logger.exception("Lỗi khi xử lý yêu cầu suy luận")
+            return {'ok': False, 'error': str(e)}
+
+    def handle_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self.dispatch(request))
+
+    def serve_forever(self):
+        if not isinstance(self.address, str) and self.address[0] not in ('127.0.0.1', 'localhost', '::1'):
+            logger.warning("Inference server nghe trên địa chỉ không phải loopback %s", self.address[0])
+        context = multiprocessing.get_context('spawn')
+        self.pool = context.Pool(self.workers, initializer=init_worker, initargs=(self.torch_threads, self.workers))
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+        try:
+            with Listener(self.address, authkey=self.authkey) as listener:
+                if isinstance(self.address, str):
+                    # Unix socket: chỉ user chạy server được kết nối
+                    os.chmod(self.address, 0o600)
+                logger.info("Inference server đang lắng nghe", extra={'fields': {
+                    'address': str(self.address), 'workers': self.workers, 'torch_threads': self.torch_threads
+                }})
+                while True:
+                    try:
+                        conn = listener.accept()
+                    except multiprocessing.AuthenticationError:
+                        logger.warning("Từ chối kết nối sai authkey")
+                        continue
+                    threading.Thread(target=self.handle_connection, args=(conn,), daemon=True).start()
+        finally:
+            self.pool.terminate()
+            self.pool.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inference server: nhận yêu cầu dự đoán theo lô và chia cho nhiều process")
+    parser.add_argument('--address', default=MLConfig.INFERENCE_SERVER_ADDRESS, help='host:port hoặc đường dẫn Unix socket')
+    parser.add_argument('--workers', type=int, default=MLConfig.INFERENCE_WORKERS)
+    parser.add_argument('--threads', type=int, default=MLConfig.INFERENCE_TORCH_THREADS, help='Số luồng torch mỗi process')
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        InferenceServer(args.address, MLConfig.INFERENCE_SERVER_AUTHKEY, args.workers, args.threads).serve_forever()
+    except KeyboardInterrupt:
+        pass
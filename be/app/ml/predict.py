@@ -1,19 +1,43 @@
 import torch
 import numpy as np
+from collections import namedtuple
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 from datetime import datetime, timedelta
 import os
-from app.database import mongo
+import time
+from app.config import Config
+from app.repositories import measurements, thresholds, ai_models
+from app.repositories.measurements import fill_missing
+from app.services import window_store
+from app.logging_utils import get_logger
+from app.metrics import PREDICTION_STAGE_SECONDS, PREDICTIONS_TOTAL, MODEL_LOAD_SECONDS
+from app.profiling import profiled
+from app.services.threshold_sketches import sketch_threshold, seed_sketch
 from .config import MLConfig
+from .inference import PredictionFailure, fallback_result
+from .runtime import configure_torch, resolve_device, inference_context
+
+logger = get_logger(__name__)
+
 try:
     from app.ml.models.lstm_autoencoder.lstm_autoencoder import LSTMAE
 except ImportError as e:
-    print(f"Warning: Could not import LSTMAE model: {e}")
+    logger.warning("Could not import LSTMAE model: %s", e)
     LSTMAE = None
 
+SCALER_HISTORY = 500
+THRESHOLD_BATCH_SIZE = 256
+
+# Cửa sổ đầu vào đã co giãn (seq_len, số đặc trưng) và scaler đã fit cho nó. key = (đặc trưng, seq_len): mô hình khác
+# (shadow) dùng lại được cửa sổ của mô hình chính khi key trùng
+PreparedWindow = namedtuple('PreparedWindow', ['key', 'values', 'scaler'])
+
 class LSTMAEPredictor:
-    def __init__(self, model_path=None, config=None):
+    # Mô hình chính cập nhật sketch sai số và ngưỡng lưu trên water_meters
+    use_sketch = True
+
+    def __init__(self, model_path=None, config=None, features=None, model_id=None):
         self.model_path = model_path or os.path.join(os.path.dirname(__file__), 'models/lstm_autoencoder/lstm_ae.pth')
         self.config = config or {
             'input_size': 1,
@@ -23,185 +47,309 @@ class LSTMAEPredictor:
             'seq_len': 168,  # 7 days * 24 hours
             'use_act': True
         }
+        self.set_features(features)
+        self.model_id = model_id
         self.model = None
-        self.scaler = MinMaxScaler()
         self.threshold = None
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.device = resolve_device()
         
+    def set_features(self, features):
+        self.features = list(features or ['instant_flow'])
+        if 'instant_flow' not in self.features:
+            logger.warning("LSTMAE_FEATURES thiếu instant_flow, tự thêm vào đầu danh sách")
+            self.features.insert(0, 'instant_flow')
+        self.flow_index = self.features.index('instant_flow')
+
+    def apply_registration(self):
+        # Mô hình đăng ký trong ai_models (app.ml.training) mang theo tệp trọng số, cấu hình và đặc trưng của nó
+        model = ai_models.get(self.model_id) if self.model_id is not None else None
+        if not model or not model.get('model_path'):
+            return False
+        self.model_path = model['model_path']
+        if model.get('config'):
+            self.config = dict(model['config'])
+        if model.get('features'):
+            self.set_features(model['features'])
+        return True
+
+    def get_threshold(self, meter_id):
+        return thresholds.get(meter_id)
+
+    def store_threshold(self, meter_id, threshold):
+        thresholds.set(meter_id, threshold)
+
     def load_model(self):
         if LSTMAE is None:
-            print("Không tìm thấy lớp LSTM-AutoEncoder!")
+            logger.error("Không tìm thấy lớp LSTM-AutoEncoder!")
             return
             
-        self.model = LSTMAE(**self.config)
+        configure_torch()
+        self.apply_registration()
+        started = time.perf_counter()
+        # Dựng và nạp trọng số xong mới gán: luồng khác không bao giờ thấy mô hình chưa có trọng số
+        model = LSTMAE(**self.config)
         if os.path.exists(self.model_path):
-            self.model.load_state_dict(torch.load(self.model_path, map_location=self.device))
-            print(f"Đã tải mô hình từ {self.model_path}")
+            model.load_state_dict(torch.load(self.model_path, map_location=self.device))
+            logger.info("Đã tải mô hình từ %s", self.model_path)
         else:
-            print(f"Không tìm thấy tệp mô hình tại {self.model_path}, sử dụng mô hình chưa được huấn luyện")
-        self.model.to(self.device)
-        self.model.eval()
+            logger.warning("Không tìm thấy tệp mô hình tại %s, sử dụng mô hình chưa được huấn luyện", self.model_path)
+        model.to(self.device)
+        model.eval()
+        self.model = model
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - started, model='lstm_ae')
         
-    def prepare_data(self, data, fit_scaler=False):
-        data = np.array(data).reshape(-1, 1)
-        if fit_scaler:
-            data_scaled = self.scaler.fit_transform(data)
-        else:
-            data_scaled = self.scaler.transform(data)
-        return data_scaled.flatten()
+    def feature_rows(self, data):
+        return np.asarray(data, dtype=np.float64).reshape(-1, len(self.features))
+
+    def fit_scaler(self, data):
+        # MinMaxScaler co giãn từng cột (đặc trưng) độc lập. Mỗi lần gọi fit một scaler riêng vì predictor
+        # được dùng chung giữa các luồng worker
+        return MinMaxScaler().fit(self.feature_rows(data))
+
+    def prepare_data(self, data, scaler):
+        return scaler.transform(self.feature_rows(data))
+
+    def sliding_windows(self, data_scaled):
+        # (n, đặc trưng) -> (n - seq_len + 1, seq_len, đặc trưng), là view nên không sao chép dữ liệu
+        return np.lib.stride_tricks.sliding_window_view(data_scaled, self.config['seq_len'], axis=0).transpose(0, 2, 1)
+
+    def current_values(self, current_flow_rate, current_pressure, last_row):
+        # Đặc trưng không được gửi kèm bản ghi mới lấy theo giá trị đo gần nhất
+        values = {'instant_flow': current_flow_rate, 'instant_pressure': current_pressure}
+        return [float(values[feature]) if values.get(feature) is not None else last_row[index]
+                for index, feature in enumerate(self.features)]
         
-    def calculate_threshold(self, meter_id, days_back=7, percentile=90):
+    def calculate_threshold(self, meter_id, days_back=7, percentile=MLConfig.THRESHOLD_PERCENTILE):
+        with profiled('threshold', meter_id=meter_id, days_back=days_back, percentile=percentile), \
+                PREDICTION_STAGE_SECONDS.time(stage='threshold'):
+            return self._calculate_threshold(meter_id, days_back, percentile)
+
+    def _calculate_threshold(self, meter_id, days_back, percentile):
         try:
+            if self.use_sketch and MLConfig.THRESHOLD_SOURCE == 'sketch':
+                threshold = sketch_threshold(meter_id, percentile)
+                if threshold is not None:
+                    self.threshold = threshold
+                    return threshold
+
             if self.model is None:
                 self.load_model()
                 
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days_back)
             
-            historical_data = list(mongo.db.meter_measurement_data.find({
-                "meter_id": meter_id,
-                "measurement_time": {
-                    "$gte": start_date.isoformat(),
-                    "$lte": end_date.isoformat()
-                }
-            }).sort("measurement_time", 1))
+            # Giới hạn số điểm lịch sử cho mỗi lần tính ngưỡng (MLConfig.THRESHOLD_MAX_HISTORY, lấy các điểm gần nhất).
+            # Với bộ đệm cục bộ, chỉ các bản ghi mới kể từ lần trước được đọc từ MongoDB
+            fetch_window = window_store.feature_window if Config.WINDOW_STORE_ENABLED else measurements.feature_window
+            history = fetch_window(meter_id, MLConfig.THRESHOLD_MAX_HISTORY, self.features,
+                                   start_date.isoformat(), end_date.isoformat())
             
-            if len(historical_data) < self.config['seq_len'] * 2:
-                print(f"Không đủ dữ liệu trong {days_back} ngày, lấy tất cả dữ liệu có sẵn")
-                historical_data = list(mongo.db.meter_measurement_data.find({
-                    "meter_id": meter_id
-                }).sort("measurement_time", 1))
+            if len(history) < self.config['seq_len'] * 2:
+                logger.debug("Không đủ dữ liệu trong %s ngày, lấy dữ liệu gần nhất có sẵn", days_back)
+                history = fetch_window(meter_id, MLConfig.THRESHOLD_MAX_HISTORY, self.features)
             
-            if len(historical_data) < self.config['seq_len']:
-                print(f"Không đủ dữ liệu lịch sử cho đồng hồ {meter_id}")
+            if len(history) < self.config['seq_len']:
+                logger.info("Không đủ dữ liệu lịch sử cho đồng hồ %s", meter_id)
                 return 0.015  
                 
-            flow_rates = [float(row['instant_flow']) for row in historical_data]
-            flow_data_scaled = self.prepare_data(flow_rates, fit_scaler=True)
-            
-            sequences = []
-            for i in range(len(flow_data_scaled) - self.config['seq_len'] + 1):
-                seq = flow_data_scaled[i:i + self.config['seq_len']]
-                sequences.append(seq)
+            data = fill_missing(history[::-1])
+            data_scaled = self.prepare_data(data, self.fit_scaler(data))
+            sequences = self.sliding_windows(data_scaled)
                 
             if len(sequences) == 0:
                 return 0.015
-                
-            sequences = np.array(sequences)[:, :, np.newaxis]
             
+            # Chạy mô hình theo lô cửa sổ thay vì từng cửa sổ một
             reconstruction_errors = []
             self.model.eval()
-            with torch.no_grad():
-                for seq in sequences:
-                    seq_tensor = torch.FloatTensor(seq).unsqueeze(0).to(self.device)
-                    reconstructed = self.model(seq_tensor)
-                    point_errors = torch.mean((seq_tensor - reconstructed) ** 2, dim=2)
-                    last_error = point_errors[0, -1].item()
-                    reconstruction_errors.append(last_error)
+            with inference_context():
+                for start in range(0, len(sequences), THRESHOLD_BATCH_SIZE):
+                    batch = torch.as_tensor(np.ascontiguousarray(sequences[start:start + THRESHOLD_BATCH_SIZE]),
+                                            dtype=torch.float32, device=self.device)
+                    reconstructed = self.model(batch)
+                    last_errors = torch.mean((batch[:, -1, :] - reconstructed[:, -1, :]) ** 2, dim=1)
+                    reconstruction_errors.append(last_errors.cpu().numpy())
+            reconstruction_errors = np.concatenate(reconstruction_errors)
             
             self.threshold = np.percentile(reconstruction_errors, percentile)
-            print(f"Tính ngưỡng cho đồng hồ {meter_id}: {self.threshold:.6f} (percentile {percentile})")
-            print(f"Meter {meter_id} - Số sequences: {len(sequences)}, Số errors: {len(reconstruction_errors)}")
-            print(f"Meter {meter_id} - Min error: {min(reconstruction_errors):.6f}, Max error: {max(reconstruction_errors):.6f}")
-            print(f"Meter {meter_id} - Mean error: {np.mean(reconstruction_errors):.6f}, Std error: {np.std(reconstruction_errors):.6f}")
+            if self.use_sketch and MLConfig.THRESHOLD_SOURCE == 'sketch':
+                seed_sketch(meter_id, reconstruction_errors)
+            logger.info("Tính ngưỡng cho đồng hồ", extra={'fields': {
+                'meter_id': meter_id,
+                'threshold': float(self.threshold),
+                'percentile': percentile,
+                'sequences': len(sequences),
+                'error_min': float(np.min(reconstruction_errors)),
+                'error_max': float(np.max(reconstruction_errors)),
+                'error_mean': float(np.mean(reconstruction_errors)),
+                'error_std': float(np.std(reconstruction_errors)),
+            }})
             
             return self.threshold
             
-        except Exception as e:
-            print(f"Lỗi khi tính ngưỡng: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Lỗi khi tính ngưỡng cho đồng hồ %s", meter_id)
             return 0.015
     
-    def predict_one(self, meter_id, current_flow_rate):
-    
+    def window_key(self):
+        return tuple(self.features), self.config['seq_len']
+
+    def prepare_window(self, meter_id, current_flow_rate, current_pressure=None):
+        # Cửa sổ đầu vào đã co giãn kèm scaler của nó; None nếu không đủ dữ liệu gần đây
+        seq_len = self.config['seq_len']
+        with PREDICTION_STAGE_SECONDS.time(stage='fetch'):
+            # Một truy vấn cho cả cửa sổ đầu vào và dữ liệu fit scaler (500 điểm gần nhất), mới nhất trước
+            history = measurements.feature_window(meter_id, max(seq_len - 1, SCALER_HISTORY), self.features)
+
+        if len(history) < seq_len - 1:
+            logger.info("Không đủ dữ liệu gần đây cho đồng hồ %s (có %s, cần %s)", meter_id, len(history), seq_len - 1)
+            return None
+
+        # Đảo lại thành thứ tự thời gian, điền giá trị thiếu rồi nối giá trị hiện tại vào cuối cửa sổ
+        history = fill_missing(history[::-1])
+        window = np.vstack([history[-(seq_len - 1):],
+                            self.current_values(current_flow_rate, current_pressure, history[-1])])
+
+        with PREDICTION_STAGE_SECONDS.time(stage='scaler'):
+            scaler = self.fit_scaler(history[-SCALER_HISTORY:] if len(history) >= 50 else window)
+            return PreparedWindow(self.window_key(), self.prepare_data(window, scaler).astype(np.float32), scaler)
+
+    def predict_one(self, meter_id, current_flow_rate, current_pressure=None):
+        with profiled('predict', meter_id=meter_id, flow_rate=current_flow_rate):
+            return fallback_result(self.predict_windows([(meter_id, current_flow_rate, current_pressure)])[0][0])
+
+    def predict_many(self, items):
+        return [fallback_result(result) for result in self.predict_results(items)]
+
+    def predict_results(self, items):
+        # Như predict_many nhưng item lỗi là PredictionFailure thay vì kết quả dự phòng
+        with profiled('predict', items=len(items)):
+            return self.predict_windows(items)[0]
+
+    def predict_windows(self, items, windows=None):
+        # items: (meter_id, flow_rate) hoặc (meter_id, flow_rate, pressure). windows: cửa sổ đã chuẩn bị sẵn cho từng
+        # item (vd. của mô hình chính), chỉ dùng lại khi cùng đặc trưng và seq_len. Mọi cửa sổ của lô chạy qua mô hình
+        # trong một lượt forward. Trả về (kết quả, cửa sổ) theo thứ tự items và thời gian chấm điểm cả lô (forward và
+        # phân loại, không gồm chuẩn bị cửa sổ). Item lỗi có kết quả PredictionFailure
+        key = self.window_key()
+        results, prepared = [None] * len(items), [None] * len(items)
+        for index, item in enumerate(items):
+            window = windows[index] if windows is not None else None
+            if window is not None and window.key == key:
+                prepared[index] = window
+                continue
+            try:
+                prepared[index] = self.prepare_window(*item)
+                if prepared[index] is None:
+                    results[index] = self.insufficient_result(item[0])
+            except Exception as e:
+                logger.exception("Lỗi trong prediction cho đồng hồ %s", item[0])
+                results[index] = self.error_result(item[0], e)
+
+        scored = [index for index, window in enumerate(prepared) if window is not None]
+        started = time.perf_counter()
+        if not scored:
+            return results, prepared, 0.0
         try:
             if self.model is None:
                 self.load_model()
-                
-            meter_doc = mongo.db.water_meters.find_one({"meter_id": meter_id})
-            if meter_doc and 'threshold' in meter_doc:
-                db_threshold = float(meter_doc['threshold'])
-            else:
-                db_threshold = None
-                
-            recent_data = list(mongo.db.meter_measurement_data.find({
-                "meter_id": meter_id
-            }).sort("measurement_time", -1).limit(self.config['seq_len'] - 1))
-            
-            if len(recent_data) < self.config['seq_len'] - 1:
-                print(f"Không đủ dữ liệu gần đây cho đồng hồ {meter_id} (có {len(recent_data)}, cần {self.config['seq_len']-1})")
-                final_threshold = db_threshold if db_threshold is not None else self.calculate_threshold(meter_id)
-                return False, 0.95, 0.0, final_threshold
-            
-            flow_rates = [float(row['instant_flow']) for row in reversed(recent_data)] + [float(current_flow_rate)]
-            
-            historical_data = list(mongo.db.meter_measurement_data.find({
-                "meter_id": meter_id
-            }).sort("measurement_time", -1).limit(500))
-            
-            if len(historical_data) >= 50:
-                historical_flows = [float(row['instant_flow']) for row in historical_data]
-                self.prepare_data(historical_flows, fit_scaler=True)
-                flow_data_scaled = self.prepare_data(flow_rates, fit_scaler=False)
-            else:
-                flow_data_scaled = self.prepare_data(flow_rates, fit_scaler=True)
-            
-            current_seq = flow_data_scaled.reshape(1, self.config['seq_len'], 1)
-            current_seq_tensor = torch.FloatTensor(current_seq).to(self.device)
-            
-            self.model.eval()
-            with torch.no_grad():
-                reconstructed = self.model(current_seq_tensor)
-                point_errors = torch.mean((current_seq_tensor - reconstructed) ** 2, dim=2)
-                reconstruction_error = point_errors[0, -1].item() 
-                
-                original_last_point = current_seq_tensor[0, -1, 0].item()  
-                reconstructed_last_point = reconstructed[0, -1, 0].item()  
-                
-                   
-                original_unscaled = self.scaler.inverse_transform([[original_last_point]])[0][0]
-                reconstructed_unscaled = self.scaler.inverse_transform([[reconstructed_last_point]])[0][0]
-                print(f"Meter {meter_id} - Flow gốc: {original_unscaled:.3f}, Flow tái tạo: {reconstructed_unscaled:.3f}")                
-                print(f"Meter {meter_id} - Reconstruction error: {reconstruction_error:.6f}") 
-            
-            if db_threshold is not None:
-                final_threshold = db_threshold
-            else:
-                print("Tính ngưỡng từ dữ liệu lịch sử...")
-                final_threshold = self.calculate_threshold(meter_id, days_back=7, percentile=90)
-                mongo.db.water_meters.update_one(
-                    {"meter_id": meter_id},
-                    {"$set": {"threshold": final_threshold}}
-                )
-            
-            is_anomaly = reconstruction_error > final_threshold
-            if reconstructed_unscaled > original_unscaled: 
-                is_anomaly = False
+            errors, flows = self.forward([prepared[index] for index in scored])
+        except Exception as e:
+            logger.exception("Lỗi khi chạy mô hình cho lô %s cửa sổ", len(scored))
+            for index in scored:
+                results[index] = self.error_result(items[index][0], e)
+            return results, prepared, time.perf_counter() - started
 
-            flow_diff_ratio = abs(reconstructed_unscaled - original_unscaled) / max(abs(original_unscaled), 1e-3)
-            error_factor = min(reconstruction_error / max(final_threshold, 1e-8), 3.0)  
-            
-            if is_anomaly:
-                combined_factor = 0.7 * error_factor + 0.3 * flow_diff_ratio
-                confidence = min(0.95, 0.60 + 0.35 * min(combined_factor, 1.0))
-                print(f"Meter {meter_id} - ANOMALY: error_factor={error_factor:.3f}, flow_diff_ratio={flow_diff_ratio:.3f}, confidence={confidence:.3f}")
-            else:
-                normal_factor = 1.0 - min(error_factor / 2.0, 1.0)  
-                confidence = max(0.75, 0.75 + 0.20 * normal_factor)
-                print(f"Meter {meter_id} - NORMAL: error_factor={error_factor:.3f}, normal_factor={normal_factor:.3f}, confidence={confidence:.3f}")
-                
-            print(f"Meter {meter_id} - Flow diff: {abs(reconstructed_unscaled - original_unscaled):.3f} ({flow_diff_ratio*100:.1f}%)")
+        for index, reconstruction_error, (original_unscaled, reconstructed_unscaled) in zip(scored, errors, flows):
+            try:
+                results[index] = self.classify(items[index][0], float(reconstruction_error),
+                                               float(original_unscaled), float(reconstructed_unscaled))
+            except Exception as e:
+                logger.exception("Lỗi trong prediction cho đồng hồ %s", items[index][0])
+                results[index] = self.error_result(items[index][0], e)
+        return results, prepared, time.perf_counter() - started
 
-            print(f"Prediction for meter {meter_id}: reconstructed_value={reconstructed[0, -1].item()} anomaly={is_anomaly}, confidence={confidence:.3f}, error={reconstruction_error:.6f}, threshold={final_threshold:.6f}")
+    def forward(self, windows):
+        # (sai số điểm cuối, (lưu lượng thực, lưu lượng tái tạo) chưa co giãn) cho từng cửa sổ
+        batch = torch.as_tensor(np.stack([window.values for window in windows]), dtype=torch.float32, device=self.device)
+        self.model.eval()
+        with PREDICTION_STAGE_SECONDS.time(stage='forward'), inference_context():
+            reconstructed = self.model(batch)
+            # Sai số của điểm cuối, trung bình trên các đặc trưng
+            errors = torch.mean((batch[:, -1] - reconstructed[:, -1]) ** 2, dim=1).cpu().numpy()
+            last_points = torch.stack([batch[:, -1], reconstructed[:, -1]], dim=1).cpu().numpy()
+        flows = [window.scaler.inverse_transform(points)[:, self.flow_index] for window, points in zip(windows, last_points)]
+        return errors, flows
+
+    def insufficient_result(self, meter_id):
+        db_threshold = self.get_threshold(meter_id)
+        final_threshold = db_threshold if db_threshold is not None else self.calculate_threshold(meter_id)
+        PREDICTIONS_TOTAL.inc(outcome='insufficient_data')
+        return False, 0.95, 0.0, float(final_threshold)
+
+    def error_result(self, meter_id, error):
+        PREDICTIONS_TOTAL.inc(outcome='error')
+        try:
+            db_threshold = self.get_threshold(meter_id)
+        except Exception:
+            db_threshold = None
+        return PredictionFailure(meter_id, repr(error), float(db_threshold) if db_threshold is not None else 0.015)
+
+    def classify(self, meter_id, reconstruction_error, original_unscaled, reconstructed_unscaled):
+        final_threshold = self.get_threshold(meter_id)
+        if final_threshold is None:
+            logger.info("Tính ngưỡng từ dữ liệu lịch sử cho đồng hồ %s", meter_id)
+            final_threshold = self.calculate_threshold(meter_id, days_back=7)
+            self.store_threshold(meter_id, final_threshold)
+
+        is_anomaly = reconstruction_error > final_threshold
+        if reconstructed_unscaled > original_unscaled:
+            is_anomaly = False
+
+        flow_diff_ratio = abs(reconstructed_unscaled - original_unscaled) / max(abs(original_unscaled), 1e-3)
+        error_factor = min(reconstruction_error / max(final_threshold, 1e-8), 3.0)
+        if is_anomaly:
+            combined_factor = 0.7 * error_factor + 0.3 * flow_diff_ratio
+            confidence = min(0.95, 0.60 + 0.35 * min(combined_factor, 1.0))
+        else:
+            normal_factor = 1.0 - min(error_factor / 2.0, 1.0)
+            confidence = max(0.75, 0.75 + 0.20 * normal_factor)
+
+        PREDICTIONS_TOTAL.inc(outcome='anomaly' if is_anomaly else 'normal')
+        logger.debug("Prediction", extra={'fields': {
+            'meter_id': meter_id,
+            'anomaly': bool(is_anomaly),
+            'confidence': float(confidence),
+            'error': reconstruction_error,
+            'threshold': float(final_threshold),
+            'error_factor': float(error_factor),
+            'flow': original_unscaled,
+            'flow_reconstructed': reconstructed_unscaled,
+            'flow_diff_ratio': float(flow_diff_ratio),
+        }})
+
+        # Kiểu Python thuần: kết quả được ghi thẳng vào Mongo (BSON không mã hoá được số numpy)
+        return bool(is_anomaly), float(confidence), float(reconstruction_error), float(final_threshold)
+
+class ShadowPredictor(LSTMAEPredictor):
+    # Mô hình ứng viên chạy song song: ngưỡng riêng giữ trong bộ nhớ, không ghi đè ngưỡng/sketch của mô hình chính
+    use_sketch = False
+
+    def __init__(self, model_id):
+        super().__init__(config=MLConfig.LSTM_AE_CONFIG, features=MLConfig.LSTM_AE_FEATURES, model_id=model_id)
+        self.meter_thresholds = {}
+
+    def apply_registration(self):
+        if not super().apply_registration():
+            raise ValueError(f"Model {self.model_id} has no registered weights in ai_models")
+        return True
+
+    def get_threshold(self, meter_id):
+        return self.meter_thresholds.get(meter_id)
+
+    def store_threshold(self, meter_id, threshold):
+        self.meter_thresholds[meter_id] = float(threshold)
 
-            return is_anomaly, confidence, reconstruction_error, final_threshold
-            
-        except Exception as e:
-            print(f"Lỗi trong prediction: {e}")
-            import traceback
-            traceback.print_exc()
-            fallback_threshold = db_threshold if db_threshold is not None else 0.015
-            return False, 0.95, 0.0, fallback_threshold
 
-predictor = LSTMAEPredictor(config=MLConfig.LSTM_AE_CONFIG, model_path=MLConfig.LSTM_AE_MODEL_PATH)
\ No newline at end of file
+predictor = LSTMAEPredictor(config=MLConfig.LSTM_AE_CONFIG, model_path=MLConfig.LSTM_AE_MODEL_PATH,
+                            features=MLConfig.LSTM_AE_FEATURES, model_id=MLConfig.MODEL_ID)
\ No newline at end of file
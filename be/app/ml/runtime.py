@@ -0,0 +1,98 @@
+import os
+import threading
+import torch
+from app.logging_utils import get_logger
+from .config import MLConfig
+
+logger = get_logger(__name__)
+
+# Cấu hình torch được áp dụng một lần cho mỗi process (set_interop_threads chỉ gọi được trước khi torch chạy song song)
+_configured_pid = None
+_configured = {}
+_lock = threading.Lock()
+
+
+def resolve_device(name=None):
+    name = (name or MLConfig.TORCH_DEVICE).lower()
+    if name == 'auto':
+        name = 'cuda' if torch.cuda.is_available() else 'cpu'
+    return torch.device(name)
+
+
+def parse_cpu_list(spec):
+    cpus = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-', 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def worker_cpus(spec, worker_index=None, workers=None):
+    if not spec:
+        return None
+    if spec != 'auto':
+        return parse_cpu_list(spec)
+    if worker_index is None or not workers:
+        return None
+    # Chia các lõi khả dụng thành các khối liên tiếp, mỗi worker một khối; thiếu lõi thì các worker dùng chung theo vòng
+    cpus = available_cpus()
+    if workers >= len(cpus):
+        return [cpus[worker_index % len(cpus)]]
+    per_worker = len(cpus) // workers
+    start = (worker_index % workers) * per_worker
+    return cpus[start:start + per_worker]
+
+
+def configure_torch(intra_threads=None, inter_threads=None, affinity=None, worker_index=None, workers=None):
+    global _configured_pid, _configured
+    with _lock:
+        if _configured_pid == os.getpid():
+            return _configured
+
+        affinity = MLConfig.TORCH_CPU_AFFINITY if affinity is None else affinity
+        cpus = worker_cpus(affinity, worker_index, workers)
+        if cpus and hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cpus)
+        elif cpus:
+            logger.warning("Hệ điều hành không hỗ trợ ghim CPU, bỏ qua TORCH_CPU_AFFINITY")
+            cpus = None
+
+        intra_threads = MLConfig.TORCH_INTRA_OP_THREADS if intra_threads is None else intra_threads
+        inter_threads = MLConfig.TORCH_INTER_OP_THREADS if inter_threads is None else inter_threads
+        # Đã ghim CPU mà không chỉ định số luồng: dùng đúng số lõi được ghim
+        if not intra_threads and cpus:
+            intra_threads = len(cpus)
+        if intra_threads:
+            torch.set_num_threads(intra_threads)
+        if inter_threads:
+            try:
+                torch.set_interop_threads(inter_threads)
+            except RuntimeError as e:
+                logger.warning("Không đặt được số luồng inter-op: %s", e)
+
+        _configured = {
+            'intra_op_threads': torch.get_num_threads(),
+            'inter_op_threads': torch.get_num_interop_threads(),
+            'cpus': cpus,
+            'inference_mode': MLConfig.TORCH_INFERENCE_MODE,
+        }
+        _configured_pid = os.getpid()
+        logger.info("Cấu hình torch", extra={'fields': dict(_configured, pid=_configured_pid, worker_index=worker_index)})
+        return _configured
+
+
+def inference_context(enabled=None):
+    enabled = MLConfig.TORCH_INFERENCE_MODE if enabled is None else enabled
+    return torch.inference_mode() if enabled else torch.no_grad()
@@ -0,0 +1,63 @@
+import argparse
+import os
+from app import create_app
+from app.ml.config import MLConfig
+from app.repositories import ai_models
+from .dataset import build_window_store, iter_mongo_meters, iter_parquet_meters
+from .trainer import train
+
+# Huấn luyện/fine-tune LSTMAE trên dữ liệu đồng hồ:
+#   python -m app.ml.training --source mongo --output training/run1
+#   python -m app.ml.training --source parquet --parquet archive/measurements --init-from app/ml/models/lstm_autoencoder/lstm_ae.pth
+#   python -m app.ml.training --output training/run1 --resume
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Huấn luyện hoặc fine-tune LSTM-AutoEncoder")
+    parser.add_argument('--source', choices=['mongo', 'parquet'], default='mongo')
+    parser.add_argument('--parquet', help='Tệp hoặc thư mục Parquet (xuất dữ liệu/lưu trữ measurements)')
+    parser.add_argument('--meters', type=int, nargs='+', help='Chỉ dùng các đồng hồ này')
+    parser.add_argument('--features', default=','.join(MLConfig.LSTM_AE_FEATURES))
+    parser.add_argument('--output', default='training/latest', help='Thư mục chứa tập cửa sổ, checkpoint và trọng số')
+    parser.add_argument('--val-fraction', type=float, default=0.1)
+    parser.add_argument('--stride', type=int, default=1, help='Khoảng cách giữa hai cửa sổ liên tiếp')
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--patience', type=int, default=5, help='Số epoch không cải thiện validation trước khi dừng')
+    parser.add_argument('--workers', type=int, default=2, help='Số worker DataLoader')
+    parser.add_argument('--threads', type=int, help='Số luồng torch')
+    parser.add_argument('--init-from', help='Trọng số ban đầu để fine-tune')
+    parser.add_argument('--resume', action='store_true', help='Tiếp tục từ checkpoint và tập cửa sổ đã có trong --output')
+    parser.add_argument('--name', default='LSTM Autoencoder', help='Tên mô hình khi đăng ký vào ai_models')
+    parser.add_argument('--no-register', action='store_true')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        store_path = os.path.join(args.output, 'windows')
+        features = [feature.strip() for feature in args.features.split(',') if feature.strip()]
+        seq_len = MLConfig.LSTM_AE_CONFIG['seq_len']
+
+        if not (args.resume and os.path.exists(os.path.join(store_path, 'meta.json'))):
+            if args.source == 'parquet':
+                meters = iter_parquet_meters(args.parquet, features, args.meters)
+            else:
+                meters = iter_mongo_meters(features, args.meters)
+            build_window_store(meters, store_path, features, seq_len, args.val_fraction, args.stride)
+
+        result = train(store_path, args.output, MLConfig.LSTM_AE_CONFIG, epochs=args.epochs,
+                       batch_size=args.batch_size, learning_rate=args.lr, patience=args.patience,
+                       workers=args.workers, threads=args.threads, init_from=args.init_from, resume=args.resume)
+        print(result)
+
+        if not args.no_register:
+            model = ai_models.register(args.name, os.path.abspath(result['weights_path']),
+                                       features=features, config=result['config'], epochs=result['epochs'],
+                                       val_loss=result['best_val_loss'], train_windows=result['train_windows'],
+                                       val_windows=result['val_windows'], fine_tuned_from=args.init_from)
+            print(f"Registered model_id={model['model_id']} ({model['model_path']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+import os
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+from app.database import mongo
+from app.logging_utils import get_logger
+from app.repositories.measurements import feature_value, fill_missing
+
+try:
+    import pyarrow.dataset as pads
+except ImportError:
+    pads = None
+
+logger = get_logger(__name__)
+
+# Tập cửa sổ huấn luyện trên đĩa: rows.f32 là các điểm đo đã co giãn theo từng đồng hồ (float32, số đặc trưng cột),
+# train.npy/val.npy là vị trí bắt đầu của các cửa sổ. Dataset chỉ memmap các tệp này nên bộ nhớ không phụ thuộc
+# kích thước đội đồng hồ.
+ROWS_FILE = 'rows.f32'
+TRAIN_INDEX_FILE = 'train.npy'
+VAL_INDEX_FILE = 'val.npy'
+META_FILE = 'meta.json'
+MONGO_BATCH_SIZE = 10000
+
+
+def iter_mongo_meters(features, meter_ids=None):
+    # Sắp xếp (meter_id giảm, thời gian tăng) là chiều ngược của chỉ mục (meter_id, measurement_time) nên không sắp xếp trong bộ nhớ
+    query = {'meter_id': {'$in': list(meter_ids)}} if meter_ids else {}
+    cursor = mongo.db.meter_measurement_data.find(
+        query, {'_id': 0, 'meter_id': 1, **{feature: 1 for feature in features}},
+        sort=[('meter_id', -1), ('measurement_time', 1)], batch_size=MONGO_BATCH_SIZE
+    )
+    current_id, rows = None, []
+    for doc in cursor:
+        if doc['meter_id'] != current_id:
+            if rows:
+                yield current_id, fill_missing(np.array(rows, dtype=np.float64))
+            current_id, rows = doc['meter_id'], []
+        rows.append([feature_value(doc, feature) for feature in features])
+    if rows:
+        yield current_id, fill_missing(np.array(rows, dtype=np.float64))
+
+
+def iter_parquet_meters(path, features, meter_ids=None):
+    # Đọc tệp xuất/lưu trữ Parquet (thư mục hoặc một tệp) theo từng đồng hồ, chỉ các cột cần thiết
+    if pads is None:
+        raise RuntimeError("pyarrow is required to train from Parquet")
+    dataset = pads.dataset(path, format='parquet')
+    if meter_ids is None:
+        meter_ids = sorted(set(dataset.to_table(columns=['meter_id']).column('meter_id').to_pylist()))
+    for meter_id in meter_ids:
+        table = dataset.to_table(columns=['measurement_time', *features], filter=pads.field('meter_id') == meter_id)
+        if table.num_rows == 0:
+            continue
+        table = table.sort_by('measurement_time')
+        yield meter_id, fill_missing(np.column_stack([
+            table.column(feature).to_numpy(zero_copy_only=False).astype(np.float64)
+            for feature in features
+        ]))
+
+
+def scale_rows(rows):
+    # Co giãn min-max theo từng đồng hồ và từng đặc trưng, giống cách predictor fit scaler cho mỗi đồng hồ
+    low = rows.min(axis=0)
+    span = rows.max(axis=0) - low
+    span[span == 0] = 1.0
+    return (rows - low) / span
+
+
+def build_window_store(meters, path, features, seq_len, val_fraction=0.1, stride=1):
+    # Ghi tuần tự từng đồng hồ ra đĩa; cửa sổ không vượt qua ranh giới giữa hai đồng hồ.
+    # Tập validation là phần cuối (theo thời gian) của mỗi đồng hồ để không trùng cửa sổ với tập train.
+    os.makedirs(path, exist_ok=True)
+    train_starts, val_starts = [], []
+    offset = 0
+    meter_count = 0
+    with open(os.path.join(path, ROWS_FILE), 'wb') as file:
+        for meter_id, rows in meters:
+            if len(rows) < seq_len:
+                continue
+            file.write(scale_rows(rows).astype(np.float32).tobytes())
+            starts = np.arange(offset, offset + len(rows) - seq_len + 1, stride, dtype=np.int64)
+            split = len(starts) - int(len(starts) * val_fraction)
+            # Bỏ các cửa sổ train chồng lên phần validation
+            train_starts.append(starts[:max(split - seq_len + 1, 0)] if split < len(starts) else starts)
+            val_starts.append(starts[split:])
+            offset += len(rows)
+            meter_count += 1
+
+    train = np.concatenate(train_starts) if train_starts else np.empty(0, dtype=np.int64)
+    val = np.concatenate(val_starts) if val_starts else np.empty(0, dtype=np.int64)
+    np.save(os.path.join(path, TRAIN_INDEX_FILE), train)
+    np.save(os.path.join(path, VAL_INDEX_FILE), val)
+    meta = {'features': list(features), 'seq_len': seq_len, 'rows': offset, 'meters': meter_count,
+            'train_windows': len(train), 'val_windows': len(val)}
+    with open(os.path.join(path, META_FILE), 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+    logger.info("Đã tạo tập cửa sổ huấn luyện", extra={'fields': dict(meta, path=path)})
+    return meta
+
+
+def load_store_meta(path):
+    with open(os.path.join(path, META_FILE), encoding='utf-8') as file:
+        return json.load(file)
+
+
+class WindowDataset(Dataset):
+    def __init__(self, path, split='train'):
+        self.path = path
+        self.meta = load_store_meta(path)
+        self.seq_len = self.meta['seq_len']
+        self.width = len(self.meta['features'])
+        self.index_file = TRAIN_INDEX_FILE if split == 'train' else VAL_INDEX_FILE
+        self.length = self.meta['train_windows' if split == 'train' else 'val_windows']
+        self.rows = None
+        self.starts = None
+
+    def __len__(self):
+        return self.length
+
+    def open(self):
+        # Mở memmap lười trong từng worker của DataLoader, không truyền mảng lớn qua pickle
+        self.rows = np.memmap(os.path.join(self.path, ROWS_FILE), dtype=np.float32, mode='r',
+                              shape=(self.meta['rows'], self.width))
+        self.starts = np.load(os.path.join(self.path, self.index_file), mmap_mode='r')
+
+    def __getitem__(self, index):
+        if self.rows is None:
+            self.open()
+        start = int(self.starts[index])
+        return torch.from_numpy(np.array(self.rows[start:start + self.seq_len]))
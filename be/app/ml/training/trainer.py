@@ -0,0 +1,108 @@
+import math
+import os
+import time
+import torch
+from torch import nn
+from torch.utils.data import DataLoader
+from app.logging_utils import get_logger
+from app.ml.models.lstm_autoencoder.lstm_autoencoder import LSTMAE
+from app.ml.runtime import configure_torch, inference_context
+from .dataset import WindowDataset
+
+logger = get_logger(__name__)
+
+CHECKPOINT_FILE = 'checkpoint.pt'
+BEST_WEIGHTS_FILE = 'lstm_ae.pth'
+
+
+def save_atomic(state, path):
+    # Ghi ra tệp tạm rồi đổi tên: dừng giữa chừng không làm hỏng checkpoint trước đó
+    tmp_path = f"{path}.tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def make_loader(dataset, batch_size, workers, shuffle):
+    return DataLoader(dataset, batch_size=batch_size, shuffle=shuffle, num_workers=workers,
+                      persistent_workers=workers > 0, pin_memory=False, drop_last=False)
+
+
+def evaluate(model, loader, loss_fn):
+    model.eval()
+    total, count = 0.0, 0
+    with inference_context():
+        for batch in loader:
+            total += loss_fn(model(batch), batch).item() * len(batch)
+            count += len(batch)
+    return total / count if count else math.inf
+
+
+def train(store_path, output_dir, model_config, epochs=50, batch_size=256, learning_rate=1e-3, patience=5,
+          workers=2, threads=None, init_from=None, resume=False):
+    configure_torch(intra_threads=threads)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILE)
+    best_path = os.path.join(output_dir, BEST_WEIGHTS_FILE)
+
+    train_set = WindowDataset(store_path, 'train')
+    val_set = WindowDataset(store_path, 'val')
+    if len(train_set) == 0:
+        raise ValueError(f"No training windows in {store_path}")
+    model_config = dict(model_config, input_size=train_set.width, seq_len=train_set.seq_len)
+
+    model = LSTMAE(**model_config)
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+    loss_fn = nn.MSELoss()
+    state = {'epoch': 0, 'best_val_loss': math.inf, 'bad_epochs': 0, 'history': []}
+
+    if resume and os.path.exists(checkpoint_path):
+        checkpoint = torch.load(checkpoint_path, map_location='cpu')
+        model.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        state = checkpoint['state']
+        logger.info("Tiếp tục huấn luyện từ checkpoint", extra={'fields': {'path': checkpoint_path, 'epoch': state['epoch']}})
+    elif init_from:
+        # Fine-tune: bắt đầu từ trọng số có sẵn (cùng kiến trúc)
+        model.load_state_dict(torch.load(init_from, map_location='cpu'))
+        logger.info("Fine-tune từ trọng số %s", init_from)
+
+    train_loader = make_loader(train_set, batch_size, workers, shuffle=True)
+    val_loader = make_loader(val_set, batch_size, workers, shuffle=False) if len(val_set) else None
+
+    while state['epoch'] < epochs and state['bad_epochs'] < patience:
+        started = time.perf_counter()
+        model.train()
+        train_loss, seen = 0.0, 0
+        for batch in train_loader:
+            optimizer.zero_grad(set_to_none=True)
+            loss = loss_fn(model(batch), batch)
+            loss.backward()
+            optimizer.step()
+            train_loss += loss.item() * len(batch)
+            seen += len(batch)
+        train_loss /= seen
+        # Không có tập validation thì dùng loss train để dừng sớm
+        val_loss = evaluate(model, val_loader, loss_fn) if val_loader else train_loss
+
+        state['epoch'] += 1
+        state['history'].append({'epoch': state['epoch'], 'train_loss': train_loss, 'val_loss': val_loss,
+                                 'seconds': round(time.perf_counter() - started, 2)})
+        if val_loss < state['best_val_loss']:
+            state['best_val_loss'] = val_loss
+            state['bad_epochs'] = 0
+            save_atomic(model.state_dict(), best_path)
+        else:
+            state['bad_epochs'] += 1
+        save_atomic({'model': model.state_dict(), 'optimizer': optimizer.state_dict(), 'state': state,
+                     'config': model_config}, checkpoint_path)
+        logger.info("Epoch huấn luyện", extra={'fields': dict(state['history'][-1], bad_epochs=state['bad_epochs'])})
+
+    return {
+        'weights_path': best_path,
+        'config': model_config,
+        'epochs': state['epoch'],
+        'best_val_loss': state['best_val_loss'],
+        'stopped_early': state['bad_epochs'] >= patience,
+        'train_windows': len(train_set),
+        'val_windows': len(val_set),
+    }
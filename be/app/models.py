@@ -52,6 +52,30 @@ class AIModel:
         }
     
 class Prediction:
+    LABEL_NORMAL = "Bình thường"
+    LABEL_LEAK = "Rò rỉ"
+    DISPLAY_LABEL_ANOMALY = "Bất thường"
+
+    # Mã nhãn được ghi kèm mỗi prediction để truy vấn không phải so khớp chuỗi tiếng Việt
+    LABEL_CODE_NORMAL = "normal"
+    LABEL_CODE_LEAK = "leak"
+
+    NORMAL_LABELS = ['bình thường', 'binh thuong', 'normal']
+    LEAK_LABELS = ['rò rỉ', 'ro ri', 'leak', 'bất thường', 'bat thuong']
+
+    @staticmethod
+    def label_code(predicted_label):
+        label = (predicted_label or '').lower()
+        if label in Prediction.NORMAL_LABELS:
+            return Prediction.LABEL_CODE_NORMAL
+        if label in Prediction.LEAK_LABELS:
+            return Prediction.LABEL_CODE_LEAK
+        return None
+
+    @staticmethod
+    def label_variants(labels):
+        return sorted({variant for label in labels for variant in (label, label.capitalize(), label.upper())})
+
     @staticmethod
     def to_dict(prediction) -> dict:
         return {
@@ -72,5 +96,13 @@ class Alert:
             "id": alert.get("id"),
             "p_id": alert.get("p_id"),
             "time": alert.get("time"),
-            "level": alert.get("level")
+            "level": alert.get("level"),
+            "meter_id": alert.get("meter_id"),
+            "branch_id": alert.get("branch_id"),
+            "status": alert.get("status"),
+            "opened_time": alert.get("opened_time"),
+            "last_anomaly_time": alert.get("last_anomaly_time"),
+            "closed_time": alert.get("closed_time"),
+            "anomaly_count": alert.get("anomaly_count"),
+            "max_confidence": alert.get("max_confidence")
         }
\ No newline at end of file
@@ -0,0 +1,190 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from app.config import Config
+from app.logging_utils import get_logger
+from app.serialization import dumps_bytes, loads
+
+logger = get_logger(__name__)
+
+PROFILE_ENGINES = ('cprofile', 'torch')
+PROFILE_ID_PATTERN = re.compile(r'^[0-9T]+-[a-z_]+-[0-9a-f]{8}$')
+
+# Chỉ một profiler được chạy tại một thời điểm (cProfile/torch profiler không chạy lồng nhau giữa các luồng)
+_profile_lock = threading.Lock()
+# Yêu cầu profile từ header của request hiện tại: None hoặc tên engine
+_requested_engine = ContextVar('requested_profile_engine', default=None)
+
+
+def request_profiling(header_value):
+    # Gọi ở before_request: header "X-Profile: 1|cprofile|torch" bật profile cho các lần gọi trong request này
+    if not Config.PROFILE_ALLOW_HEADER or not header_value:
+        return None
+    value = header_value.strip().lower()
+    if value in ('0', 'false', 'off'):
+        return None
+    engine = value if value in PROFILE_ENGINES else Config.PROFILE_ENGINE
+    return _requested_engine.set(engine)
+
+
+def reset_profiling(token):
+    if token is not None:
+        _requested_engine.reset(token)
+
+
+def requested_engine():
+    return _requested_engine.get()
+
+
+def choose_engine():
+    engine = _requested_engine.get()
+    if engine is not None:
+        return engine, 'header'
+    if Config.PROFILE_SAMPLE_RATE > 0 and random.random() < Config.PROFILE_SAMPLE_RATE:
+        return Config.PROFILE_ENGINE, 'sample'
+    return None, None
+
+
+def new_profile_id(kind):
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{kind}-{uuid.uuid4().hex[:8]}"
+
+
+def profile_files(profile_id):
+    base = os.path.join(Config.PROFILE_DIR, profile_id)
+    return base + '.json', base + '.prof', base + '.trace.json'
+
+
+@contextmanager
+def profiled(kind, **metadata):
+    engine, trigger = choose_engine()
+    if engine is None:
+        yield
+        return
+    if not _profile_lock.acquire(blocking=False):
+        # Đang có profile khác chạy: bỏ qua thay vì chờ để không làm chậm request
+        yield
+        return
+
+    try:
+        profile_id = new_profile_id(kind)
+        started_at = datetime.now().isoformat()
+        started = time.perf_counter()
+        if engine == 'torch':
+            from torch.profiler import profile, ProfilerActivity
+            profiler = profile(activities=[ProfilerActivity.CPU], record_shapes=True)
+            profiler.__enter__()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            if engine == 'torch':
+                profiler.__exit__(None, None, None)
+            else:
+                profiler.disable()
+            try:
+                save_profile(profile_id, kind, engine, trigger, profiler, {
+                    'started_at': started_at,
+                    'duration_seconds': duration,
+                    'error': error,
+                    **metadata,
+                })
+            except Exception:
+                logger.exception("Không ghi được profile %s", profile_id)
+    finally:
+        _profile_lock.release()
+
+
+def save_profile(profile_id, kind, engine, trigger, profiler, metadata):
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    meta_path, prof_path, trace_path = profile_files(profile_id)
+    if engine == 'torch':
+        profiler.export_chrome_trace(trace_path)
+        data_file = os.path.basename(trace_path)
+    else:
+        profiler.dump_stats(prof_path)
+        data_file = os.path.basename(prof_path)
+
+    entry = {
+        'id': profile_id,
+        'kind': kind,
+        'engine': engine,
+        'trigger': trigger,
+        'pid': os.getpid(),
+        'file': data_file,
+        **metadata,
+    }
+    with open(meta_path, 'wb') as f:
+        f.write(dumps_bytes(entry))
+    logger.info("Đã ghi profile", extra={'fields': {'profile_id': profile_id, 'kind': kind,
+                                                     'duration_seconds': metadata['duration_seconds']}})
+    prune_profiles()
+
+
+def prune_profiles():
+    # Giữ tối đa PROFILE_MAX_FILES profile mới nhất
+    if Config.PROFILE_MAX_FILES <= 0:
+        return
+    profile_ids = sorted(name[:-len('.json')] for name in os.listdir(Config.PROFILE_DIR)
+                         if name.endswith('.json') and not name.endswith('.trace.json'))
+    for profile_id in profile_ids[:-Config.PROFILE_MAX_FILES]:
+        for path in profile_files(profile_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def list_profiles(kind=None, limit=100):
+    if not os.path.isdir(Config.PROFILE_DIR):
+        return []
+    names = sorted((name for name in os.listdir(Config.PROFILE_DIR)
+                    if name.endswith('.json') and not name.endswith('.trace.json')), reverse=True)
+    profiles = []
+    for name in names:
+        with open(os.path.join(Config.PROFILE_DIR, name), 'rb') as f:
+            entry = loads(f.read())
+        if kind and entry.get('kind') != kind:
+            continue
+        profiles.append(entry)
+        if len(profiles) >= limit:
+            break
+    return profiles
+
+
+def get_profile(profile_id):
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    meta_path = profile_files(profile_id)[0]
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'rb') as f:
+        return loads(f.read())
+
+
+def profile_data_path(entry):
+    return os.path.join(Config.PROFILE_DIR, entry['file'])
+
+
+def profile_summary(entry, sort='cumulative', limit=30):
+    # Bảng pstats dạng văn bản cho profile cProfile
+    if entry['engine'] != 'cprofile':
+        return None
+    buffer = io.StringIO()
+    stats = pstats.Stats(profile_data_path(entry), stream=buffer)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return buffer.getvalue()
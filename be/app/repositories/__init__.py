@@ -0,0 +1,19 @@
+from .meters import MeterRepository, WATER_METER_PROJECTION
+from .measurements import MeasurementRepository
+from .predictions import PredictionRepository, PREDICTION_PROJECTION
+from .thresholds import ThresholdRepository
+from .ai_models import AIModelRepository, AI_MODEL_PROJECTION
+from .alerts import AlertRepository, ALERT_PROJECTION
+
+meters = MeterRepository()
+measurements = MeasurementRepository()
+predictions = PredictionRepository()
+thresholds = ThresholdRepository()
+ai_models = AIModelRepository()
+alerts = AlertRepository()
+
+
+def seed_counters():
+    # Gọi sau khi nạp dữ liệu mang sẵn id (init_data) để id cấp sau đó không trùng
+    for repository in (meters, measurements, predictions, alerts, ai_models):
+        repository.seed_counter()
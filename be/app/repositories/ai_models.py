@@ -0,0 +1,21 @@
+from datetime import datetime
+from app.repositories.base import Repository
+
+AI_MODEL_PROJECTION = {'_id': 0}
+
+
+class AIModelRepository(Repository):
+    collection_name = 'ai_models'
+    id_field = 'model_id'
+    id_counter = 'model_id'
+
+    def get(self, model_id, projection=AI_MODEL_PROJECTION):
+        return self.find_one({'model_id': model_id}, projection)
+
+    def register(self, name, model_path, **details):
+        # model_id cấp từ bộ đếm nguyên tử; tệp trọng số và thông số huấn luyện lưu cùng bản ghi mô hình
+        model = dict(details, model_id=self.reserve_ids(1)[0], name=name, model_path=model_path,
+                     trained_date=datetime.utcnow().isoformat())
+        self.insert_one(model)
+        model.pop('_id', None)
+        return model
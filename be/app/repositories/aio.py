@@ -0,0 +1,143 @@
+from pymongo import ReturnDocument
+from app.database import amongo
+from app.metrics import DB_OPERATION_SECONDS
+from app.repositories.base import chunked, reserved_range, seeded_counters, IN_BATCH_SIZE
+from app.repositories.cache import meter_cache, project, cacheable
+from app.repositories.measurements import MeasurementRepository
+from app.repositories.meters import MeterRepository, WATER_METER_PROJECTION
+from app.repositories.predictions import PredictionRepository, PREDICTION_PROJECTION
+
+# Phiên bản async (motor) của các repository dùng bởi ứng dụng ASGI; truy vấn và projection dùng chung với bản đồng bộ
+
+
+class AsyncRepository:
+    collection_name = None
+    id_field = None
+    id_counter = None
+
+    @property
+    def collection(self):
+        return amongo.db[self.collection_name]
+
+    def timed(self, operation):
+        return DB_OPERATION_SECONDS.time(collection=self.collection_name, operation=operation)
+
+    async def find_one(self, query, projection=None, sort=None):
+        with self.timed('find_one'):
+            return await self.collection.find_one(query, projection, sort=sort)
+
+    async def find(self, query, projection=None, sort=None, skip=0, limit=0):
+        with self.timed('find'):
+            cursor = self.collection.find(query, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            return await cursor.skip(skip).limit(limit).to_list(length=None)
+
+    async def count(self, query):
+        with self.timed('count'):
+            return await self.collection.count_documents(query)
+
+    async def aggregate(self, pipeline, **kwargs):
+        with self.timed('aggregate'):
+            return await self.collection.aggregate(pipeline, **kwargs).to_list(length=None)
+
+    async def insert_one(self, document):
+        with self.timed('insert_one'):
+            return await self.collection.insert_one(document)
+
+    async def update_one(self, query, update, upsert=False):
+        with self.timed('update_one'):
+            return await self.collection.update_one(query, update, upsert=upsert)
+
+    async def bulk_write(self, operations, ordered=False):
+        with self.timed('bulk_write'):
+            return await self.collection.bulk_write(operations, ordered=ordered)
+
+    async def last_value(self, field):
+        document = await self.find_one({}, {'_id': 0, field: 1}, sort=[(field, -1)])
+        return document.get(field) if document else None
+
+    async def seed_counter(self):
+        last_id = await self.last_value(self.id_field) or 0
+        await amongo.db.counters.update_one({'_id': self.id_counter}, {'$max': {'seq': last_id}}, upsert=True)
+        seeded_counters.add(self.id_counter)
+
+    async def reserve_ids(self, count):
+        if self.id_counter not in seeded_counters:
+            await self.seed_counter()
+        with self.timed('reserve_ids'):
+            counter = await amongo.db.counters.find_one_and_update(
+                {'_id': self.id_counter},
+                {'$inc': {'seq': count}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        return reserved_range(counter, count)
+
+
+class AsyncMeterRepository(AsyncRepository):
+    collection_name = 'water_meters'
+    id_field = MeterRepository.id_field
+    id_counter = MeterRepository.id_counter
+
+    async def get(self, meter_id, projection=None):
+        # Dùng chung bộ đệm với repository đồng bộ trong cùng process
+        if not cacheable(projection, WATER_METER_PROJECTION):
+            return await self.find_one({'meter_id': meter_id}, projection)
+        meter = meter_cache.get(meter_id)
+        if meter is None:
+            meter = await self.find_one({'meter_id': meter_id}, WATER_METER_PROJECTION)
+            meter_cache.put(meter_id, meter)
+        return project(meter, projection)
+
+    async def insert_one(self, document):
+        result = await super().insert_one(document)
+        meter_cache.invalidate(document['meter_id'])
+        return result
+
+    async def page(self, branch_id=None, skip=0, limit=0, projection=None):
+        return await self.find(MeterRepository.branch_filter(branch_id), projection or WATER_METER_PROJECTION,
+                               sort=[('meter_id', 1)], skip=skip, limit=limit)
+
+    async def count_for_branch(self, branch_id=None):
+        return await self.count(MeterRepository.branch_filter(branch_id))
+
+
+class AsyncMeasurementRepository(AsyncRepository):
+    collection_name = 'meter_measurement_data'
+    id_field = MeasurementRepository.id_field
+    id_counter = MeasurementRepository.id_counter
+
+
+class AsyncPredictionRepository(AsyncRepository):
+    collection_name = 'predictions'
+
+    async def page(self, query, skip=0, limit=0, projection=PREDICTION_PROJECTION):
+        return await self.find(query, projection, sort=[('prediction_time', -1)], skip=skip, limit=limit)
+
+    async def page_projected(self, query, project_stage, skip=0, limit=0):
+        return await self.aggregate(PredictionRepository.page_pipeline(query, project_stage, skip, limit))
+
+    async def latest(self, meter_id):
+        return await self.find_one({'meter_id': meter_id}, {'_id': 0}, sort=[('prediction_time', -1)])
+
+    async def latest_for_meters(self, meter_ids):
+        latest = {}
+        for chunk in chunked(meter_ids, IN_BATCH_SIZE):
+            PredictionRepository.latest_by_meter(await self.aggregate(PredictionRepository.latest_pipeline(chunk)), latest)
+        return latest
+
+
+class AsyncThresholdRepository(AsyncRepository):
+    collection_name = 'water_meters'
+
+    async def set(self, meter_id, threshold):
+        result = await self.update_one({'meter_id': meter_id}, {'$set': {'threshold': float(threshold)}})
+        meter_cache.patch(meter_id, threshold=float(threshold))
+        return result
+
+
+meters = AsyncMeterRepository()
+measurements = AsyncMeasurementRepository()
+predictions = AsyncPredictionRepository()
+thresholds = AsyncThresholdRepository()
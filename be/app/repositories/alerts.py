@@ -0,0 +1,24 @@
+from app.repositories.base import Repository
+
+ALERT_PROJECTION = {'_id': 0}
+
+
+class AlertRepository(Repository):
+    collection_name = 'alerts'
+    id_field = 'id'
+    id_counter = 'alert_id'
+
+    def open_alerts(self, branch_id=None, level=None, projection=ALERT_PROJECTION):
+        # Chỉ duyệt phần chỉ mục (status, branch_id, time) của cảnh báo đang mở: chi phí theo số cảnh báo đang mở
+        query = {'status': 'open'}
+        if branch_id is not None:
+            query['branch_id'] = branch_id
+        if level:
+            query['level'] = level
+        return self.find(query, projection, sort=[('time', -1)])
+
+    def history(self, meter_id, skip=0, limit=0, projection=ALERT_PROJECTION):
+        return self.find({'meter_id': meter_id}, projection, sort=[('time', -1)], skip=skip, limit=limit)
+
+    def open_for_meters(self, meter_ids, projection=ALERT_PROJECTION):
+        return self.find_in('meter_id', meter_ids, projection, {'status': 'open'})
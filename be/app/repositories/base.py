@@ -0,0 +1,132 @@
+from pymongo import UpdateOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+from app.database import mongo
+from app.metrics import DB_OPERATION_SECONDS
+
+# Số giá trị tối đa trong một truy vấn $in và số thao tác trong một lần bulk_write
+IN_BATCH_SIZE = 1000
+BULK_WRITE_BATCH = 1000
+
+
+def chunked(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+# Bộ đếm id đã được seed trong process này
+seeded_counters = set()
+
+
+def reserved_range(counter, count):
+    first_id = counter['seq'] - count + 1
+    return list(range(first_id, counter['seq'] + 1))
+
+
+class Repository:
+    collection_name = None
+    # Trường id tăng dần và tên bộ đếm trong counters dùng bởi reserve_ids
+    id_field = None
+    id_counter = None
+
+    @property
+    def collection(self):
+        return mongo.db[self.collection_name]
+
+    def timed(self, operation):
+        return DB_OPERATION_SECONDS.time(collection=self.collection_name, operation=operation)
+
+    def find_one(self, query, projection=None, sort=None):
+        with self.timed('find_one'):
+            return self.collection.find_one(query, projection, sort=sort)
+
+    def find(self, query, projection=None, sort=None, skip=0, limit=0):
+        with self.timed('find'):
+            cursor = self.collection.find(query, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            return list(cursor.skip(skip).limit(limit))
+
+    def find_in(self, field, values, projection=None, query=None):
+        # Chia danh sách giá trị thành nhiều truy vấn $in để tránh tài liệu truy vấn quá lớn
+        documents = []
+        with self.timed('find_in'):
+            for chunk in chunked(values, IN_BATCH_SIZE):
+                documents.extend(self.collection.find(dict(query or {}, **{field: {'$in': chunk}}), projection))
+        return documents
+
+    def count(self, query):
+        with self.timed('count'):
+            return self.collection.count_documents(query)
+
+    def distinct(self, field, query=None):
+        with self.timed('distinct'):
+            return self.collection.distinct(field, query or {})
+
+    def aggregate(self, pipeline, **kwargs):
+        with self.timed('aggregate'):
+            return list(self.collection.aggregate(pipeline, **kwargs))
+
+    def insert_one(self, document):
+        with self.timed('insert_one'):
+            return self.collection.insert_one(document)
+
+    def insert_many(self, documents, ordered=False):
+        with self.timed('insert_many'):
+            return self.collection.insert_many(documents, ordered=ordered)
+
+    def update_one(self, query, update, upsert=False):
+        with self.timed('update_one'):
+            return self.collection.update_one(query, update, upsert=upsert)
+
+    def bulk_write(self, operations, ordered=False):
+        # Ghi theo lô BULK_WRITE_BATCH thao tác. Lỗi của các lô được gộp vào một BulkWriteError với chỉ số
+        # writeErrors tính theo toàn bộ operations; ordered=True thì dừng ở lô lỗi đầu tiên
+        written = 0
+        write_errors = []
+        with self.timed('bulk_write'):
+            for start, chunk in enumerate(chunked(operations, BULK_WRITE_BATCH)):
+                offset = start * BULK_WRITE_BATCH
+                try:
+                    result = self.collection.bulk_write(chunk, ordered=ordered)
+                    written += result.upserted_count + result.modified_count + result.inserted_count
+                except BulkWriteError as e:
+                    write_errors.extend(dict(error, index=error['index'] + offset)
+                                        for error in e.details.get('writeErrors', []))
+                    written += e.details.get('nUpserted', 0) + e.details.get('nModified', 0) + e.details.get('nInserted', 0)
+                    if ordered:
+                        break
+        if write_errors:
+            raise BulkWriteError({'writeErrors': write_errors, 'nWritten': written})
+        return written
+
+    def bulk_upsert(self, key_field, documents):
+        # $set toàn bộ trường của mỗi tài liệu, khớp theo key_field
+        return self.bulk_write([
+            UpdateOne({key_field: document[key_field]}, {'$set': document}, upsert=True)
+            for document in documents
+        ])
+
+    def last_value(self, field):
+        document = self.find_one({}, {'_id': 0, field: 1}, sort=[(field, -1)])
+        return document.get(field) if document else None
+
+    def seed_counter(self):
+        # Đưa bộ đếm lên ít nhất bằng id lớn nhất hiện có (dữ liệu seed/nhập thẳng không đi qua bộ đếm)
+        last_id = self.last_value(self.id_field) or 0
+        mongo.db.counters.update_one({'_id': self.id_counter}, {'$max': {'seq': last_id}}, upsert=True)
+        seeded_counters.add(self.id_counter)
+
+    def reserve_ids(self, count):
+        # Cấp count id liên tiếp bằng một $inc nguyên tử trên counters, an toàn giữa các luồng và process.
+        # Bộ đếm được seed một lần mỗi process (hoặc bởi ensure_indexes), sau đó mỗi lần cấp chỉ là một round trip
+        if self.id_counter not in seeded_counters:
+            self.seed_counter()
+        with self.timed('reserve_ids'):
+            counter = mongo.db.counters.find_one_and_update(
+                {'_id': self.id_counter},
+                {'$inc': {'seq': count}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        return reserved_range(counter, count)
@@ -0,0 +1,75 @@
+import threading
+import time
+from app.config import Config
+from app.metrics import CACHE_REQUESTS
+
+
+class TTLCache:
+    # Bộ đệm trong bộ nhớ của từng process: mục hết hạn sau ttl giây, vượt max_size thì bỏ mục cũ nhất.
+    # Giá trị trả ra là bản sao nên nơi gọi có thể sửa tự do. ttl <= 0 thì tắt bộ đệm.
+    def __init__(self, name, ttl, max_size):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self.entries[key]
+                entry = None
+        CACHE_REQUESTS.inc(cache=self.name, result='miss' if entry is None else 'hit')
+        return dict(entry[1]) if entry is not None else None
+
+    def put(self, key, value):
+        if self.ttl <= 0 or value is None:
+            return
+        with self.lock:
+            self.entries.pop(key, None)
+            while len(self.entries) >= self.max_size:
+                del self.entries[next(iter(self.entries))]
+            self.entries[key] = (time.monotonic() + self.ttl, dict(value))
+
+    def get_or_load(self, key, loader):
+        # Không lưu kết quả rỗng: bản ghi mới tạo ở process khác vẫn thấy được ngay
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.put(key, value)
+        return value
+
+    def patch(self, key, **fields):
+        # Ghi xuyên: cập nhật mục đang có (giữ hạn cũ) sau khi đã ghi vào MongoDB
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries[key] = (entry[0], dict(entry[1], **fields))
+
+    def invalidate(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Thông tin đồng hồ (tên, chi nhánh, ngưỡng) đọc trên mỗi request ghi dữ liệu đo/dự đoán. Process khác cập nhật
+# ngưỡng thì bản ở đây cũ tối đa METER_CACHE_TTL_SECONDS giây.
+meter_cache = TTLCache('meters', Config.METER_CACHE_TTL_SECONDS, Config.METER_CACHE_MAX_SIZE)
+
+
+def project(document, projection):
+    # Áp projection dạng {'field': 1} lên tài liệu lấy từ bộ đệm
+    if document is None or projection is None:
+        return document
+    return {field: document[field] for field, include in projection.items()
+            if include and field != '_id' and field in document}
+
+
+def cacheable(projection, cached_projection):
+    return projection is None or all(
+        field in cached_projection for field, include in projection.items() if include and field != '_id')
@@ -0,0 +1,69 @@
+import numpy as np
+from app.repositories.base import Repository
+
+FLOW_PROJECTION = {'_id': 0, 'instant_flow': 1}
+
+
+def feature_value(row, field):
+    value = row.get(field)
+    return np.nan if value is None else value
+
+
+def fill_missing(rows):
+    # rows theo thứ tự thời gian. Giá trị thiếu (NaN, vd. bản ghi không có áp suất) lấy theo giá trị có mặt gần nhất
+    # trước đó trong cùng cột, các điểm đầu cột lấy giá trị có mặt đầu tiên; cột không có giá trị nào là 0.
+    # Không điền 0 để min/max của scaler không bị kéo lệch
+    missing = np.isnan(rows)
+    if not missing.any():
+        return rows
+    rows = np.array(rows, dtype=np.float64)
+    positions = np.arange(len(rows))
+    for column in np.flatnonzero(missing.any(axis=0)):
+        present = ~missing[:, column]
+        if not present.any():
+            rows[:, column] = 0.0
+            continue
+        source = np.maximum.accumulate(np.where(present, positions, 0))
+        source[:np.argmax(present)] = np.argmax(present)
+        rows[:, column] = rows[source, column]
+    return rows
+
+
+class MeasurementRepository(Repository):
+    collection_name = 'meter_measurement_data'
+    id_field = 'id'
+    id_counter = 'measurement_id'
+
+    @staticmethod
+    def meter_query(meter_id, start_time=None, end_time=None):
+        query = {'meter_id': meter_id}
+        if start_time or end_time:
+            time_filter = {}
+            if start_time:
+                time_filter['$gte'] = start_time
+            if end_time:
+                time_filter['$lte'] = end_time
+            query['measurement_time'] = time_filter
+        return query
+
+    def recent(self, meter_id, limit, projection=FLOW_PROJECTION):
+        # Mới nhất trước, dùng chỉ mục (meter_id, measurement_time)
+        return self.find({'meter_id': meter_id}, projection, sort=[('measurement_time', -1)], limit=limit)
+
+    def history(self, meter_id, start_time=None, end_time=None, projection=FLOW_PROJECTION):
+        return self.find(self.meter_query(meter_id, start_time, end_time), projection, sort=[('measurement_time', 1)])
+
+    def feature_window(self, meter_id, limit, fields=('instant_flow',), start_time=None, end_time=None):
+        # Tối đa limit điểm gần nhất, mới nhất trước, dạng mảng (số điểm, len(fields)).
+        # Chỉ lấy các cột cần thiết và ghi thẳng từ cursor vào mảng cấp phát sẵn, không giữ list dict trung gian
+        window = np.empty((limit, len(fields)), dtype=np.float64)
+        count = 0
+        with self.timed('feature_window'):
+            cursor = self.collection.find(self.meter_query(meter_id, start_time, end_time),
+                                          {'_id': 0, **{field: 1 for field in fields}},
+                                          sort=[('measurement_time', -1)], limit=limit, batch_size=limit)
+            for row in cursor:
+                # Giá trị thiếu là NaN, được điền theo chính cửa sổ bởi fill_missing
+                window[count] = [feature_value(row, field) for field in fields]
+                count += 1
+        return window[:count]
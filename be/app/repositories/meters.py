@@ -0,0 +1,48 @@
+from app.repositories.base import Repository
+from app.repositories.cache import meter_cache, project, cacheable
+
+WATER_METER_PROJECTION = {
+    '_id': 0, 'meter_id': 1, 'branch_id': 1, 'meter_name': 1, 'installation_time': 1, 'threshold': 1
+}
+
+
+class MeterRepository(Repository):
+    collection_name = 'water_meters'
+    id_field = 'meter_id'
+    id_counter = 'meter_id'
+
+    def get(self, meter_id, projection=None):
+        if not cacheable(projection, WATER_METER_PROJECTION):
+            return self.find_one({'meter_id': meter_id}, projection)
+        return project(self.cached(meter_id), projection)
+
+    def cached(self, meter_id):
+        return meter_cache.get_or_load(meter_id, lambda: self.find_one({'meter_id': meter_id}, WATER_METER_PROJECTION))
+
+    def get_many(self, meter_ids, projection=None):
+        return {meter['meter_id']: meter for meter in self.find_in('meter_id', meter_ids, projection or WATER_METER_PROJECTION)}
+
+    def page(self, branch_id=None, skip=0, limit=0, projection=None):
+        return self.find(self.branch_filter(branch_id), projection or WATER_METER_PROJECTION,
+                         sort=[('meter_id', 1)], skip=skip, limit=limit)
+
+    def count_for_branch(self, branch_id=None):
+        return self.count(self.branch_filter(branch_id))
+
+    def ids_for_branch(self, branch_id):
+        return self.distinct('meter_id', {'branch_id': branch_id})
+
+    def insert_one(self, document):
+        result = super().insert_one(document)
+        meter_cache.invalidate(document['meter_id'])
+        return result
+
+    def insert_many(self, documents, ordered=False):
+        try:
+            return super().insert_many(documents, ordered=ordered)
+        finally:
+            meter_cache.invalidate(*(document['meter_id'] for document in documents))
+
+    @staticmethod
+    def branch_filter(branch_id):
+        return {'branch_id': branch_id} if branch_id else {}
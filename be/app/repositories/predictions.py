@@ -0,0 +1,53 @@
+from app.repositories.base import Repository, chunked, IN_BATCH_SIZE
+
+PREDICTION_PROJECTION = {
+    '_id': 0, 'p_id': 1, 'meter_id': 1, 'model_id': 1, 'prediction_time': 1,
+    'prediction_threshold': 1, 'predicted_label': 1, 'confidence': 1, 'recorded_instant_flow': 1
+}
+
+
+class PredictionRepository(Repository):
+    collection_name = 'predictions'
+    id_field = 'p_id'
+    id_counter = 'p_id'
+
+    def page(self, query, skip=0, limit=0, projection=PREDICTION_PROJECTION):
+        return self.find(query, projection, sort=[('prediction_time', -1)], skip=skip, limit=limit)
+
+    @staticmethod
+    def page_pipeline(query, project_stage, skip=0, limit=0):
+        # Phân trang với $project tính toán phía MongoDB (định dạng thời gian, nhãn hiển thị...)
+        pipeline = [{'$match': query}, {'$sort': {'prediction_time': -1}}, {'$skip': skip}]
+        if limit:
+            pipeline.append({'$limit': limit})
+        pipeline.append({'$project': project_stage})
+        return pipeline
+
+    @staticmethod
+    def latest_pipeline(meter_ids):
+        return [
+            {'$match': {'meter_id': {'$in': meter_ids}}},
+            {'$sort': {'meter_id': 1, 'prediction_time': -1}},
+            {'$group': {'_id': '$meter_id', 'prediction': {'$first': '$$ROOT'}}}
+        ]
+
+    @staticmethod
+    def latest_by_meter(groups, latest):
+        for doc in groups:
+            prediction = doc['prediction']
+            prediction.pop('_id', None)
+            latest[doc['_id']] = prediction
+        return latest
+
+    def page_projected(self, query, project_stage, skip=0, limit=0):
+        return self.aggregate(self.page_pipeline(query, project_stage, skip, limit))
+
+    def latest(self, meter_id):
+        return self.find_one({'meter_id': meter_id}, {'_id': 0}, sort=[('prediction_time', -1)])
+
+    def latest_for_meters(self, meter_ids):
+        # Một aggregate cho mỗi lô meter_id thay vì một truy vấn cho từng đồng hồ
+        latest = {}
+        for chunk in chunked(meter_ids, IN_BATCH_SIZE):
+            self.latest_by_meter(self.aggregate(self.latest_pipeline(chunk)), latest)
+        return latest
@@ -0,0 +1,34 @@
+from pymongo import UpdateOne
+from app.repositories.base import Repository
+from app.repositories.cache import meter_cache
+from app.repositories.meters import WATER_METER_PROJECTION
+
+
+class ThresholdRepository(Repository):
+    # Ngưỡng phát hiện bất thường được lưu trên chính tài liệu water_meters
+    collection_name = 'water_meters'
+
+    def get(self, meter_id):
+        meter = meter_cache.get_or_load(meter_id, lambda: self.find_one({'meter_id': meter_id}, WATER_METER_PROJECTION))
+        return float(meter['threshold']) if meter and meter.get('threshold') is not None else None
+
+    def get_many(self, meter_ids):
+        return {
+            meter['meter_id']: float(meter['threshold'])
+            for meter in self.find_in('meter_id', meter_ids, {'_id': 0, 'meter_id': 1, 'threshold': 1})
+            if meter.get('threshold') is not None
+        }
+
+    def set(self, meter_id, threshold):
+        result = self.update_one({'meter_id': meter_id}, {'$set': {'threshold': float(threshold)}})
+        meter_cache.patch(meter_id, threshold=float(threshold))
+        return result
+
+    def set_many(self, thresholds):
+        written = self.bulk_write([
+            UpdateOne({'meter_id': meter_id}, {'$set': {'threshold': float(threshold)}})
+            for meter_id, threshold in thresholds.items()
+        ])
+        for meter_id, threshold in thresholds.items():
+            meter_cache.patch(meter_id, threshold=float(threshold))
+        return written
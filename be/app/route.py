@@ -1,9 +1,18 @@
 from flask import Blueprint 
-from .routes import water_meter_bp, data_init_bp, prediction_bp
+from .routes import water_meter_bp, data_init_bp, prediction_bp, export_bp, rollup_bp, health_bp, retention_bp, metrics_bp, profile_bp, job_bp, shadow_bp, alert_bp
 
 main_bp = Blueprint('main', __name__)
 
 def register_blueprints(app):
     app.register_blueprint(water_meter_bp, url_prefix='/api/water-meters')
     app.register_blueprint(prediction_bp, url_prefix='/api/predictions')
-    app.register_blueprint(data_init_bp, url_prefix='/api/data-init')
\ No newline at end of file
+    app.register_blueprint(data_init_bp, url_prefix='/api/data-init')
+    app.register_blueprint(export_bp, url_prefix='/api/exports')
+    app.register_blueprint(rollup_bp, url_prefix='/api/rollups')
+    app.register_blueprint(health_bp, url_prefix='/api/health')
+    app.register_blueprint(retention_bp, url_prefix='/api/retention')
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(profile_bp, url_prefix='/api/profiles')
+    app.register_blueprint(job_bp, url_prefix='/api/prediction-jobs')
+    app.register_blueprint(shadow_bp, url_prefix='/api/shadow')
+    app.register_blueprint(alert_bp, url_prefix='/api/alerts')
\ No newline at end of file
@@ -1,3 +1,12 @@
 from .water_meter_route import water_meter_bp
 from .prediction_routes import prediction_bp
-from .init_data import data_init_bp
\ No newline at end of file
+from .init_data import data_init_bp
+from .export_routes import export_bp
+from .rollup_routes import rollup_bp
+from .health_routes import health_bp
+from .retention_routes import retention_bp
+from .metrics_routes import metrics_bp
+from .profile_routes import profile_bp
+from .job_routes import job_bp
+from .shadow_routes import shadow_bp
+from .alert_routes import alert_bp
\ No newline at end of file
@@ -0,0 +1,49 @@
+from flask import Blueprint, request, jsonify
+from flasgger import swag_from
+from app.models import Alert
+from app.repositories import alerts
+from app.services.alerts import LEVEL_WARNING, LEVEL_CRITICAL
+
+alert_bp = Blueprint('alerts', __name__)
+
+
+@alert_bp.route('/open', methods=['GET'])
+@swag_from({
+    'tags': ['Cảnh báo'],
+    'summary': 'Danh sách cảnh báo rò rỉ đang mở',
+    'parameters': [
+        {'name': 'branch_id', 'in': 'query', 'type': 'integer', 'description': 'Lọc theo chi nhánh'},
+        {'name': 'level', 'in': 'query', 'type': 'string', 'enum': [LEVEL_WARNING, LEVEL_CRITICAL]}
+    ],
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_open_alerts():
+    try:
+        data = alerts.open_alerts(request.args.get('branch_id', type=int), request.args.get('level'))
+        return jsonify({'data': [Alert.to_dict(alert) for alert in data], 'count': len(data)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@alert_bp.route('/meter/<int:meter_id>', methods=['GET'])
+@swag_from({
+    'tags': ['Cảnh báo'],
+    'summary': 'Lịch sử cảnh báo của một đồng hồ',
+    'parameters': [
+        {'name': 'meter_id', 'in': 'path', 'type': 'integer', 'required': True},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 50}
+    ],
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_meter_alerts(meter_id):
+    try:
+        limit = request.args.get('limit', default=50, type=int)
+        return jsonify({'data': [Alert.to_dict(alert) for alert in alerts.history(meter_id, limit=limit)]}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
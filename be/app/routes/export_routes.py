@@ -0,0 +1,237 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context, current_app
+from app.database import mongo
+from app.repositories import meters
+from app.serialization import dumps_bytes
+from app.services.datasets import DATASETS, dataset_projection, dataset_sort, parquet_schema, batch_to_table
+from flasgger import swag_from
+import csv
+import io
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+export_bp = Blueprint('export', __name__)
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+class ChunkBuffer:
+    # File-like sink cho ParquetWriter: gom bytes rồi trả ra sau mỗi row group
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def build_export_filter(dataset):
+    query_filter = {}
+
+    meter_ids = request.args.getlist('meter_id', type=int)
+    branch_id = request.args.get('branch_id', type=int)
+    if branch_id:
+        branch_meters = meters.ids_for_branch(branch_id)
+        meter_ids = [m for m in meter_ids if m in branch_meters] if meter_ids else branch_meters
+    if meter_ids or branch_id:
+        query_filter['meter_id'] = {'$in': meter_ids}
+
+    start_time = request.args.get('start_time')
+    end_time = request.args.get('end_time')
+    if start_time or end_time:
+        time_filter = {}
+        if start_time:
+            time_filter['$gte'] = start_time
+        if end_time:
+            time_filter['$lte'] = end_time
+        query_filter[dataset['time_field']] = time_filter
+
+    return query_filter
+
+
+def iter_export_batches(dataset, query_filter, batch_size):
+    cursor = (mongo.db[dataset['collection']]
+              .find(query_filter, dataset_projection(dataset))
+              .sort(dataset_sort(dataset))
+              .batch_size(batch_size))
+
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_ndjson(dataset, batches):
+    fields = dataset['fields']
+    for batch in batches:
+        yield b''.join(
+            dumps_bytes({field: doc.get(field) for field in fields}) + b'\n'
+            for doc in batch
+        )
+
+
+def generate_csv(dataset, batches):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=dataset['fields'], extrasaction='ignore')
+    writer.writeheader()
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def generate_parquet(dataset, batches):
+    schema = parquet_schema(dataset)
+    sink = ChunkBuffer()
+    with pq.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for batch in batches:
+            writer.write_table(batch_to_table(dataset, batch, schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+EXPORT_GENERATORS = {
+    'ndjson': generate_ndjson,
+    'csv': generate_csv,
+    'parquet': generate_parquet,
+}
+
+
+def stream_export(dataset_name):
+    dataset = DATASETS[dataset_name]
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format: {export_format}"}), 400
+    if export_format == 'parquet' and pa is None:
+        return jsonify({"error": "Parquet export requires pyarrow"}), 501
+
+    query_filter = build_export_filter(dataset)
+    batch_size = request.args.get('batch_size', current_app.config['EXPORT_BATCH_SIZE'], type=int)
+    batches = iter_export_batches(dataset, query_filter, max(batch_size, 1))
+    body = EXPORT_GENERATORS[export_format](dataset, batches)
+
+    filename = f"{dataset_name}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+EXPORT_PARAMETERS = [
+    {
+        'name': 'format',
+        'in': 'query',
+        'type': 'string',
+        'enum': list(EXPORT_FORMATS),
+        'default': 'ndjson',
+        'description': 'Định dạng xuất dữ liệu'
+    },
+    {
+        'name': 'meter_id',
+        'in': 'query',
+        'type': 'array',
+        'items': {'type': 'integer'},
+        'collectionFormat': 'multi',
+        'description': 'Lọc theo ID đồng hồ nước (có thể lặp lại)'
+    },
+    {
+        'name': 'branch_id',
+        'in': 'query',
+        'type': 'integer',
+        'description': 'Lọc theo ID chi nhánh'
+    },
+    {
+        'name': 'start_time',
+        'in': 'query',
+        'type': 'string',
+        'format': 'date-time',
+        'description': 'Thời gian bắt đầu (ISO 8601)'
+    },
+    {
+        'name': 'end_time',
+        'in': 'query',
+        'type': 'string',
+        'format': 'date-time',
+        'description': 'Thời gian kết thúc (ISO 8601)'
+    },
+    {
+        'name': 'batch_size',
+        'in': 'query',
+        'type': 'integer',
+        'description': 'Số bản ghi đọc mỗi lần từ MongoDB'
+    }
+]
+
+
+@export_bp.route('/measurements', methods=['GET'])
+@swag_from({
+    'tags': ['Xuất dữ liệu'],
+    'summary': 'Xuất dữ liệu đo dạng luồng',
+    'description': 'Xuất dữ liệu đo lường theo đồng hồ, chi nhánh và khoảng thời gian dưới dạng NDJSON, CSV hoặc Parquet. '
+                   'Dữ liệu được đọc theo lô từ cursor nên bộ nhớ không phụ thuộc vào kích thước xuất.',
+    'produces': list(EXPORT_FORMATS.values()),
+    'parameters': EXPORT_PARAMETERS,
+    'responses': {
+        200: {'description': 'Luồng dữ liệu xuất'},
+        400: {'description': 'Định dạng không hợp lệ'},
+        501: {'description': 'Thiếu thư viện pyarrow cho định dạng Parquet'}
+    }
+})
+def export_measurements():
+    try:
+        return stream_export('measurements')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@export_bp.route('/predictions', methods=['GET'])
+@swag_from({
+    'tags': ['Xuất dữ liệu'],
+    'summary': 'Xuất dữ liệu dự đoán dạng luồng',
+    'description': 'Xuất kết quả dự đoán theo đồng hồ, chi nhánh và khoảng thời gian dưới dạng NDJSON, CSV hoặc Parquet. '
+                   'Dữ liệu được đọc theo lô từ cursor nên bộ nhớ không phụ thuộc vào kích thước xuất.',
+    'produces': list(EXPORT_FORMATS.values()),
+    'parameters': EXPORT_PARAMETERS,
+    'responses': {
+        200: {'description': 'Luồng dữ liệu xuất'},
+        400: {'description': 'Định dạng không hợp lệ'},
+        501: {'description': 'Thiếu thư viện pyarrow cho định dạng Parquet'}
+    }
+})
+def export_predictions():
+    try:
+        return stream_export('predictions')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,205 @@
+from flask import Blueprint, request, jsonify
+from app.database import mongo
+from app.models import Branch, Company
+from datetime import datetime
+from flasgger import swag_from
+from app.services.meter_status import branch_health, combine_health, empty_health
+
+health_bp = Blueprint('health', __name__)
+
+HEALTH_WINDOW_PARAMETERS = [
+    {
+        'name': 'hours',
+        'in': 'query',
+        'type': 'integer',
+        'default': 24,
+        'description': 'Độ dài cửa sổ tính tỉ lệ bất thường và tổng lưu lượng (giờ)'
+    },
+    {
+        'name': 'end_time',
+        'in': 'query',
+        'type': 'string',
+        'format': 'date-time',
+        'description': 'Thời điểm kết thúc cửa sổ (ISO 8601, mặc định: hiện tại)'
+    }
+]
+
+HEALTH_ITEM_PROPERTIES = {
+    'meter_count': {'type': 'integer'},
+    'leaking_meter_count': {'type': 'integer'},
+    'total_flow': {'type': 'number'},
+    'prediction_count': {'type': 'integer'},
+    'anomaly_count': {'type': 'integer'},
+    'anomaly_rate': {'type': 'number'}
+}
+
+
+def parse_health_window():
+    end_time = request.args.get('end_time')
+    end = datetime.fromisoformat(end_time) if end_time else datetime.now()
+    hours = request.args.get('hours', 24, type=int)
+    return end, max(hours, 1)
+
+def branch_health_items(branches, health):
+    return [
+        dict(Branch.to_dict(branch), **health['branches'].get(branch['branch_id'], empty_health()))
+        for branch in branches
+    ]
+
+def company_health_items(companies, branches, health):
+    branches_by_company = {}
+    for branch in branches:
+        branches_by_company.setdefault(branch['company_id'], []).append(branch['branch_id'])
+    return [
+        dict(Company.to_dict(company),
+             branch_count=len(branches_by_company.get(company['company_id'], [])),
+             **combine_health(health['branches'].get(branch_id, empty_health())
+                              for branch_id in branches_by_company.get(company['company_id'], [])))
+        for company in companies
+    ]
+
+
+@health_bp.route('/branches', methods=['GET'])
+@swag_from({
+    'tags': ['Tổng quan'],
+    'summary': 'Tình trạng tổng hợp theo chi nhánh',
+    'description': 'Số đồng hồ đang rò rỉ, tỉ lệ bất thường gần đây và tổng lưu lượng của từng chi nhánh, '
+                   'tính từ bảng trạng thái đồng hồ và dữ liệu tổng hợp',
+    'parameters': [
+        {
+            'name': 'company_id',
+            'in': 'query',
+            'type': 'integer',
+            'description': 'Lọc theo ID công ty (tùy chọn)'
+        }
+    ] + HEALTH_WINDOW_PARAMETERS,
+    'responses': {
+        200: {
+            'description': 'Thành công',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'window': {'type': 'object'},
+                    'data': {
+                        'type': 'array',
+                        'items': {'type': 'object', 'properties': dict({
+                            'branch_id': {'type': 'integer'},
+                            'company_id': {'type': 'integer'},
+                            'name': {'type': 'string'}
+                        }, **HEALTH_ITEM_PROPERTIES)}
+                    }
+                }
+            }
+        },
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_branches_health():
+    try:
+        end, hours = parse_health_window()
+        company_id = request.args.get('company_id', type=int)
+        branch_filter = {'company_id': company_id} if company_id else {}
+        branches = list(mongo.db.branches.find(branch_filter, {'_id': 0}).sort('branch_id', 1))
+
+        health = branch_health(end, hours, [branch['branch_id'] for branch in branches])
+        return jsonify({
+            'window': health['window'],
+            'data': branch_health_items(branches, health)
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@health_bp.route('/branches/<int:branch_id>', methods=['GET'])
+@swag_from({
+    'tags': ['Tổng quan'],
+    'summary': 'Tình trạng tổng hợp của một chi nhánh',
+    'parameters': [
+        {
+            'name': 'branch_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True,
+            'description': 'ID của chi nhánh'
+        }
+    ] + HEALTH_WINDOW_PARAMETERS,
+    'responses': {
+        200: {'description': 'Thành công'},
+        404: {'description': 'Không tìm thấy chi nhánh'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_branch_health(branch_id):
+    try:
+        branch = mongo.db.branches.find_one({'branch_id': branch_id}, {'_id': 0})
+        if not branch:
+            return jsonify({"error": "Không tìm thấy chi nhánh"}), 404
+
+        end, hours = parse_health_window()
+        health = branch_health(end, hours, [branch_id])
+        return jsonify(dict(branch_health_items([branch], health)[0], window=health['window'])), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@health_bp.route('/companies', methods=['GET'])
+@swag_from({
+    'tags': ['Tổng quan'],
+    'summary': 'Tình trạng tổng hợp theo công ty',
+    'description': 'Cộng dồn tình trạng của các chi nhánh thuộc mỗi công ty',
+    'parameters': HEALTH_WINDOW_PARAMETERS,
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_companies_health():
+    try:
+        end, hours = parse_health_window()
+        companies = list(mongo.db.companies.find({}, {'_id': 0}).sort('company_id', 1))
+        branches = list(mongo.db.branches.find({}, {'_id': 0, 'branch_id': 1, 'company_id': 1}))
+
+        health = branch_health(end, hours, [branch['branch_id'] for branch in branches])
+        return jsonify({
+            'window': health['window'],
+            'data': company_health_items(companies, branches, health)
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@health_bp.route('/companies/<int:company_id>', methods=['GET'])
+@swag_from({
+    'tags': ['Tổng quan'],
+    'summary': 'Tình trạng tổng hợp của một công ty',
+    'parameters': [
+        {
+            'name': 'company_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True,
+            'description': 'ID của công ty'
+        }
+    ] + HEALTH_WINDOW_PARAMETERS,
+    'responses': {
+        200: {'description': 'Thành công'},
+        404: {'description': 'Không tìm thấy công ty'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_company_health(company_id):
+    try:
+        company = mongo.db.companies.find_one({'company_id': company_id}, {'_id': 0})
+        if not company:
+            return jsonify({"error": "Không tìm thấy công ty"}), 404
+
+        end, hours = parse_health_window()
+        branches = list(mongo.db.branches.find({'company_id': company_id}, {'_id': 0}).sort('branch_id', 1))
+        health = branch_health(end, hours, [branch['branch_id'] for branch in branches])
+        return jsonify(dict(
+            company_health_items([company], branches, health)[0],
+            window=health['window'],
+            branches=branch_health_items(branches, health)
+        )), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
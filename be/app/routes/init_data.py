@@ -1,5 +1,14 @@
 from flask import Blueprint, jsonify
-from app.database import mongo
+from app.config import Config
+from app.database import mongo, ensure_indexes
+from app.ml.config import MLConfig
+from app.models import Prediction
+from app.services.rollups import backfill_rollups
+from app.services.meter_status import backfill_meter_status
+from app.services.alerts import backfill_alerts
+from app.logging_utils import get_logger
+from app.repositories import measurements, predictions, thresholds, seed_counters, WATER_METER_PROJECTION
+from app.repositories.cache import meter_cache, project
 import csv
 import os
 from datetime import datetime
@@ -7,6 +16,7 @@ import pandas as pd
 from flasgger import swag_from
 
 data_init_bp = Blueprint('data_init', __name__)
+logger = get_logger(__name__)
 
 @data_init_bp.route('/init_data', methods=['POST']) 
 @swag_from({
@@ -25,6 +35,15 @@ data_init_bp = Blueprint('data_init', __name__)
                 }
             }
         },
+        403: {
+            'description': 'Endpoint disabled (DATA_INIT_ENDPOINT_ENABLED=false)',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'error': {'type': 'string'}
+                }
+            }
+        },
         404: {
             'description': 'File directory not found',
             'schema': {
@@ -36,9 +55,17 @@ data_init_bp = Blueprint('data_init', __name__)
         }
     }
 })
-def init_data(): 
+def init_data():
+    # Endpoint xoá toàn bộ dữ liệu chỉ bật khi DATA_INIT_ENDPOINT_ENABLED=true (môi trường phát triển)
+    if not Config.DATA_INIT_ENDPOINT_ENABLED:
+        return jsonify({"error": "Data initialization endpoint is disabled"}), 403
+    return seed_data()
+
+
+def seed_data(): 
     try: 
         clear_existing_data() 
+        ensure_indexes()
         data_folder = os.path.join(os.path.dirname(__file__), '..', '..', 'postdata') 
         companies_file = os.path.join(data_folder, 'companies.csv')
         if not os.path.exists(data_folder):
@@ -69,6 +96,12 @@ def init_data():
         predictions_file = os.path.join(data_folder, 'predictions.csv')
         if os.path.exists(predictions_file):
             results['predictions'] = load_predictions(predictions_file)
+
+        # Dữ liệu nạp từ CSV mang sẵn id
+        seed_counters()
+        results['rollups'] = backfill_rollups()
+        results['meter_status'] = backfill_meter_status()
+        results['alerts'] = backfill_alerts()
         
         return jsonify({
             "message": "Test data initialized successfully",
@@ -80,10 +113,13 @@ def init_data():
             
 def clear_existing_data():
     collections = ['companies', 'branches', 'water_meters', 'ai_models', 
-                  'meter_measurement_data', 'predictions']
+                  'meter_measurement_data', 'predictions', 'counters', 'prediction_jobs', 'prediction_dead_letters',
+                  'threshold_sketches', 'shadow_predictions', 'alerts', 'alert_state',
+                  'meter_rollups', 'branch_rollups', 'meter_status', 'retention_state']
     
     for collection in collections: 
         mongo.db[collection].delete_many({})
+    meter_cache.clear()
 
 def load_companies(file_path): 
     companies = []
@@ -183,6 +219,7 @@ def load_predictions(file_path):
                 'prediction_time': row['prediction_time'],
                 'prediction_threshold': float(row['prediction_threshold']),
                 'predicted_label': row['predicted_label'],
+                'label_code': Prediction.label_code(row['predicted_label']),
                 'confidence': float(row['confidence']),
                 'recorded_instant_flow': float(row['recorded_instant_flow'])
             }
@@ -199,54 +236,51 @@ def auto_generate_predictions():
         try:
             predictor.load_model()
         except Exception as e:
-            print(f"Warning: Could not load ML model for predictions: {e}")
+            logger.warning("Could not load ML model for predictions: %s", e)
             return 0
             
         meters = list(mongo.db.water_meters.find({}))
         
         if not meters:
-            print("No water meters found")
+            logger.info("No water meters found")
             return 0
             
         total_predictions = 0
         
         for meter in meters:
             meter_id = meter['meter_id']
+            # Ngưỡng trong predict_one đọc từ bộ đệm thay vì một truy vấn cho mỗi bản ghi đo
+            meter_cache.put(meter_id, project(meter, WATER_METER_PROJECTION))
             
-            last_measurements = list(
-                mongo.db.meter_measurement_data
-                .find({"meter_id": meter_id})
-                .sort("measurement_time", -1)
-                .limit(10)
+            last_measurements = measurements.recent(
+                meter_id, 10, {"_id": 0, "id": 1, "instant_flow": 1, "instant_pressure": 1, "measurement_time": 1}
             )
             
             if len(last_measurements) < 10:
-                print(f"Meter {meter_id}: Only {len(last_measurements)} measurements found, skipping")
+                logger.info("Meter %s: Only %s measurements found, skipping", meter_id, len(last_measurements))
                 continue
                 
             last_measurements.reverse()
             
-            last_prediction = mongo.db.predictions.find_one(sort=[("p_id", -1)])
-            next_p_id = (last_prediction.get("p_id", 0) + 1) if last_prediction else 1
+            next_p_id = predictions.reserve_ids(len(last_measurements))[0]
+            meter_threshold = meter.get('threshold', 0.015)
             
             predictions_to_insert = []
             
             for measurement in last_measurements:
                 try:
-                    meter_doc = mongo.db.water_meters.find_one({"meter_id": meter_id})
-                    meter_threshold = meter_doc.get('threshold', 0.015) if meter_doc else 0.015
-                    
                     is_anomaly, confidence, reconstruction_error, _ = predictor.predict_one(
-                        meter_id, measurement['instant_flow']
+                        meter_id, measurement['instant_flow'], measurement.get('instant_pressure')
                     )
                     
                     prediction = {
                         "p_id": next_p_id,
                         "meter_id": meter_id,
-                        "model_id": 1,  
+                        "model_id": MLConfig.MODEL_ID,
                         "prediction_time": measurement['measurement_time'],
                         "prediction_threshold": meter_threshold, 
-                        "predicted_label": "Rò rỉ" if is_anomaly else "Bình thường",
+                        "predicted_label": Prediction.LABEL_LEAK if is_anomaly else Prediction.LABEL_NORMAL,
+                        "label_code": Prediction.LABEL_CODE_LEAK if is_anomaly else Prediction.LABEL_CODE_NORMAL,
                         "confidence": confidence,
                         "recorded_instant_flow": measurement['instant_flow']
                     }
@@ -255,19 +289,19 @@ def auto_generate_predictions():
                     next_p_id += 1
                     
                 except Exception as e:
-                    print(f"Error predicting for meter {meter_id}, measurement {measurement['id']}: {e}")
+                    logger.exception("Error predicting for meter %s, measurement %s", meter_id, measurement['id'])
                     continue
             
             if predictions_to_insert:
-                mongo.db.predictions.insert_many(predictions_to_insert)
+                predictions.insert_many(predictions_to_insert)
                 total_predictions += len(predictions_to_insert)
-                print(f"Generated {len(predictions_to_insert)} predictions for meter {meter_id}")
+                logger.debug("Generated %s predictions for meter %s", len(predictions_to_insert), meter_id)
         
-        print(f"Auto-generated {total_predictions} predictions total")
+        logger.info("Auto-generated %s predictions total", total_predictions)
         return total_predictions
         
     except Exception as e:
-        print(f"Error in auto_generate_predictions: {e}")
+        logger.exception("Error in auto_generate_predictions")
         return 0
 
 def calculate_thresholds_for_all_meters():
@@ -277,38 +311,51 @@ def calculate_thresholds_for_all_meters():
         try:
             predictor.load_model()
         except Exception as e:
-            print(f"Warning: Could not load ML model for threshold calculation: {e}")
+            logger.warning("Could not load ML model for threshold calculation: %s", e)
             return 0
             
         meters = list(mongo.db.water_meters.find({}))
         
         if not meters:
-            print("No water meters found for threshold calculation")
+            logger.info("No water meters found for threshold calculation")
             return 0
             
-        updated_count = 0
+        new_thresholds = {}
         
         for meter in meters:
             meter_id = meter['meter_id']
             
             try:
-                threshold = predictor.calculate_threshold(meter_id, days_back=7, percentile=90)
-                
-                mongo.db.water_meters.update_one(
-                    {"meter_id": meter_id},
-                    {"$set": {"threshold": threshold}}
-                )
-                
-                updated_count += 1
-                print(f"Updated threshold for meter {meter_id}: {threshold:.6f}")
+                threshold = predictor.calculate_threshold(meter_id, days_back=7)
+                new_thresholds[meter_id] = threshold
+                logger.debug("Updated threshold for meter %s: %.6f", meter_id, threshold)
                 
             except Exception as e:
-                print(f"Error calculating threshold for meter {meter_id}: {e}")
+                logger.exception("Error calculating threshold for meter %s", meter_id)
                 continue
         
-        print(f"Successfully calculated thresholds for {updated_count} meters")
+        # Ghi tất cả ngưỡng bằng bulk_write thay vì một update_one cho mỗi đồng hồ
+        thresholds.set_many(new_thresholds)
+        updated_count = len(new_thresholds)
+        logger.info("Successfully calculated thresholds for %s meters", updated_count)
         return updated_count
         
     except Exception as e:
-        print(f"Error in calculate_thresholds_for_all_meters: {e}")
-        return 0
\ No newline at end of file
+        logger.exception("Error in calculate_thresholds_for_all_meters")
+        return 0
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Xoá toàn bộ dữ liệu và nạp lại dữ liệu mẫu từ thư mục postdata")
+    parser.add_argument('--yes', action='store_true', help='Xác nhận xoá dữ liệu hiện có')
+    args = parser.parse_args()
+    if not args.yes:
+        sys.exit("Seeding wipes every collection; re-run with --yes to confirm")
+
+    with create_app().app_context():
+        response, status = seed_data()
+        print(response.get_json())
+        sys.exit(0 if status == 200 else 1)
\ No newline at end of file
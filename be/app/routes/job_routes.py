@@ -0,0 +1,78 @@
+from flask import Blueprint, request, jsonify
+from flasgger import swag_from
+from app.services.prediction_jobs import job_stats, list_dead_letters, requeue_dead_letters
+
+job_bp = Blueprint('prediction_jobs', __name__)
+
+
+@job_bp.route('/stats', methods=['GET'])
+@swag_from({
+    'tags': ['Hàng đợi dự đoán'],
+    'summary': 'Số job dự đoán theo trạng thái',
+    'description': 'pending: chờ xử lý (delayed: đang chờ thử lại), leased: đang được worker xử lý, dead: đã hết số lần thử',
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_job_stats():
+    try:
+        return jsonify(job_stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@job_bp.route('/dead-letters', methods=['GET'])
+@swag_from({
+    'tags': ['Hàng đợi dự đoán'],
+    'summary': 'Danh sách job dự đoán thất bại',
+    'parameters': [
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 100}
+    ],
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_dead_letters():
+    try:
+        limit = request.args.get('limit', default=100, type=int)
+        return jsonify({'data': [
+            dict(job, measurement_id=job.pop('_id')) for job in list_dead_letters(limit)
+        ]}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@job_bp.route('/dead-letters/requeue', methods=['POST'])
+@swag_from({
+    'tags': ['Hàng đợi dự đoán'],
+    'summary': 'Đưa job thất bại trở lại hàng đợi',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': False,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'measurement_ids': {
+                        'type': 'array',
+                        'items': {'type': 'integer'},
+                        'description': 'Bỏ trống để đưa lại tất cả'
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def post_requeue_dead_letters():
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify({'requeued': requeue_dead_letters(data.get('measurement_ids'))}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,9 +1,9 @@
 from flask import Blueprint, request, jsonify
-from app.database import mongo
 from app.models import WaterMeter
+from app.repositories import meters, predictions, thresholds
 from datetime import datetime
 from flasgger import swag_from
-from app.ml.predict import predictor
+from app.ml.inference import inference
 import threading
 
 prediction_bp = Blueprint('prediction_routes', __name__)
@@ -29,6 +29,10 @@ prediction_bp = Blueprint('prediction_routes', __name__)
                     'flow_rate': {
                         'type': 'number',
                         'description': 'Lưu lượng cần dự đoán (L/h)'
+                    },
+                    'pressure': {
+                        'type': 'number',
+                        'description': 'Áp suất tại thời điểm đo (tuỳ chọn, dùng khi mô hình có đặc trưng instant_pressure)'
                     }
                 },
                 'required': ['meter_id', 'flow_rate']
@@ -68,12 +72,12 @@ def manual_prediction():
         meter_id = data['meter_id']
         flow_rate = data['flow_rate']
         
-        meter = mongo.db.water_meters.find_one({"meter_id": meter_id})
+        meter = meters.get(meter_id, {"_id": 0, "meter_id": 1})
         if not meter:
             return jsonify({"error": "Không tìm thấy đồng hồ nước"}), 404
         
-        is_anomaly, confidence, reconstruction_error, threshold = predictor.predict_one(
-            meter_id, flow_rate
+        is_anomaly, confidence, reconstruction_error, threshold = inference.predict_one(
+            meter_id, flow_rate, data.get('pressure')
         )
         
         predicted_label = "Rò rỉ" if is_anomaly else "Bình thường"
@@ -89,12 +93,9 @@ def manual_prediction():
             'message': 'Dự đoán thành công'
         }
         
-        print(f"Response data: {response_data}")  
-        
         return jsonify(response_data), 200
         
     except Exception as e:
-        print(f"Error in manual_prediction: {e}")  
         return jsonify({"error": str(e)}), 500
 
 
@@ -147,18 +148,15 @@ def manual_prediction():
 })
 def recalculate_threshold(meter_id):
     try:
-        meter = mongo.db.water_meters.find_one({"meter_id": meter_id})
+        meter = meters.get(meter_id, {"_id": 0, "meter_id": 1})
         if not meter:
             return jsonify({"error": "Không tìm thấy đồng hồ nước"}), 404
             
         data = request.get_json() or {}
         days_back = data.get('days_back', 7)
         
-        threshold = predictor.calculate_threshold(meter_id, days_back)
-        mongo.db.water_meters.update_one(
-                    {"meter_id": meter_id},
-                    {"$set": {"threshold": threshold}}
-                )
+        threshold = inference.calculate_threshold(meter_id, days_back)
+        thresholds.set(meter_id, threshold)
         return jsonify({
             'meter_id': meter_id,
             'threshold': threshold,
@@ -230,28 +228,17 @@ def get_all_predictions():
         if meter_id:
             query_filter['meter_id'] = meter_id
             
-        # Lấy predictions với limit
-        predictions = list(
-            mongo.db.predictions
-            .find(query_filter)
-            .sort("prediction_time", -1)
-            .limit(limit)
-        )
+        # Lấy predictions với limit, chỉ lấy các trường cần trả về (không có _id)
+        prediction_docs = predictions.page(query_filter, limit=limit)
         
         # Đếm tổng số
-        total_count = mongo.db.predictions.count_documents(query_filter)
-        
-        # Convert ObjectId thành string
-        for prediction in predictions:
-            if '_id' in prediction:
-                prediction['_id'] = str(prediction['_id'])
+        total_count = predictions.count(query_filter)
                 
         return jsonify({
-            'predictions': predictions,
+            'predictions': prediction_docs,
             'total_count': total_count,
-            'message': f'Lấy được {len(predictions)} predictions'
+            'message': f'Lấy được {len(prediction_docs)} predictions'
         }), 200
         
     except Exception as e:
-        print(f"Error in get_all_predictions: {e}")
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,99 @@
+from flask import Blueprint, request, jsonify, send_file
+from flasgger import swag_from
+from app.profiling import list_profiles, get_profile, profile_data_path, profile_summary
+
+profile_bp = Blueprint('profile', __name__)
+
+
+@profile_bp.route('', methods=['GET'])
+@swag_from({
+    'tags': ['Profiling'],
+    'summary': 'Danh sách các profile đã ghi',
+    'description': 'Profile được ghi khi request có header X-Profile (cần PROFILE_ALLOW_HEADER=true) '
+                   'hoặc theo tỉ lệ lấy mẫu PROFILE_SAMPLE_RATE.',
+    'parameters': [
+        {
+            'name': 'kind',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['predict', 'threshold'],
+            'description': 'Lọc theo loại lời gọi'
+        },
+        {
+            'name': 'limit',
+            'in': 'query',
+            'type': 'integer',
+            'default': 100,
+            'description': 'Số profile tối đa trả về'
+        }
+    ],
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_profiles():
+    try:
+        kind = request.args.get('kind')
+        limit = request.args.get('limit', default=100, type=int)
+        return jsonify({'data': list_profiles(kind=kind, limit=limit)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@profile_bp.route('/<profile_id>', methods=['GET'])
+@swag_from({
+    'tags': ['Profiling'],
+    'summary': 'Thông tin và tóm tắt một profile',
+    'description': 'Trả về metadata và bảng pstats (với profile cProfile).',
+    'parameters': [
+        {'name': 'profile_id', 'in': 'path', 'type': 'string', 'required': True},
+        {
+            'name': 'sort',
+            'in': 'query',
+            'type': 'string',
+            'default': 'cumulative',
+            'description': 'Khoá sắp xếp của pstats (cumulative, tottime, calls, ...)'
+        },
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 30}
+    ],
+    'responses': {
+        200: {'description': 'Thành công'},
+        404: {'description': 'Không tìm thấy profile'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_profile_detail(profile_id):
+    try:
+        entry = get_profile(profile_id)
+        if entry is None:
+            return jsonify({"error": "Không tìm thấy profile"}), 404
+        sort = request.args.get('sort', 'cumulative')
+        limit = request.args.get('limit', default=30, type=int)
+        return jsonify({**entry, 'summary': profile_summary(entry, sort=sort, limit=limit)}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@profile_bp.route('/<profile_id>/download', methods=['GET'])
+@swag_from({
+    'tags': ['Profiling'],
+    'summary': 'Tải tệp profile gốc',
+    'description': 'Tệp .prof (mở bằng snakeviz/pstats) hoặc .trace.json (mở bằng chrome://tracing, Perfetto).',
+    'parameters': [
+        {'name': 'profile_id', 'in': 'path', 'type': 'string', 'required': True}
+    ],
+    'responses': {
+        200: {'description': 'Tệp profile'},
+        404: {'description': 'Không tìm thấy profile'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def download_profile(profile_id):
+    try:
+        entry = get_profile(profile_id)
+        if entry is None:
+            return jsonify({"error": "Không tìm thấy profile"}), 404
+        return send_file(profile_data_path(entry), as_attachment=True, download_name=entry['file'])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,100 @@
+from flask import Blueprint, request, jsonify
+from flasgger import swag_from
+from app.services.datasets import DATASETS
+from app.services.retention import run_retention, list_archives, restore_archive, retention_policies
+
+retention_bp = Blueprint('retention', __name__)
+
+
+@retention_bp.route('/run', methods=['POST'])
+@swag_from({
+    'tags': ['Lưu trữ dữ liệu'],
+    'summary': 'Lưu trữ và xoá dữ liệu gốc quá hạn',
+    'description': 'Với mỗi bộ dữ liệu có cấu hình số ngày lưu giữ (> 0), ghi các tháng cũ ra tệp Parquet nén '
+                   'rồi xoá khỏi MongoDB. Dữ liệu được tổng hợp vào rollup trước khi xoá.',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': False,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'dry_run': {'type': 'boolean', 'default': False, 'description': 'Chỉ liệt kê, không ghi/xoá'}
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def run_retention_job():
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify({
+            'policies': retention_policies(),
+            'results': run_retention(dry_run=bool(data.get('dry_run', False)))
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@retention_bp.route('/archives', methods=['GET'])
+@swag_from({
+    'tags': ['Lưu trữ dữ liệu'],
+    'summary': 'Danh sách các tháng đã được lưu trữ',
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_archives():
+    try:
+        return jsonify({'data': list_archives()}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@retention_bp.route('/restore', methods=['POST'])
+@swag_from({
+    'tags': ['Lưu trữ dữ liệu'],
+    'summary': 'Khôi phục dữ liệu một tháng từ archive',
+    'description': 'Ghi lại dữ liệu từ tệp Parquet vào MongoDB. Dữ liệu khôi phục vẫn nằm ngoài thời hạn lưu giữ '
+                   'và sẽ bị lưu trữ lại ở lần chạy tiếp theo.',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': True,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'dataset': {'type': 'string', 'enum': list(DATASETS)},
+                    'month': {'type': 'string', 'description': 'Tháng cần khôi phục (YYYY-MM)'}
+                },
+                'required': ['dataset', 'month']
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Khôi phục thành công'},
+        400: {'description': 'Dữ liệu đầu vào không hợp lệ'},
+        404: {'description': 'Không tìm thấy archive'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def restore_archived_month():
+    try:
+        data = request.get_json(silent=True) or {}
+        if data.get('dataset') not in DATASETS or not data.get('month'):
+            return jsonify({"error": "Dữ liệu đầu vào không hợp lệ"}), 400
+        restored = restore_archive(data['dataset'], data['month'])
+        return jsonify({'dataset': data['dataset'], 'month': data['month'], 'restored': restored}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except FileNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,171 @@
+from flask import Blueprint, request, jsonify
+from app.repositories import meters
+from datetime import datetime, timedelta
+from flasgger import swag_from
+from app.services.rollups import RESOLUTIONS, get_rollup_series, backfill_rollups
+
+rollup_bp = Blueprint('rollups', __name__)
+
+ROLLUP_QUERY_PARAMETERS = [
+    {
+        'name': 'start_time',
+        'in': 'query',
+        'type': 'string',
+        'format': 'date-time',
+        'description': 'Thời gian bắt đầu (ISO 8601, mặc định: 7 ngày trước end_time)'
+    },
+    {
+        'name': 'end_time',
+        'in': 'query',
+        'type': 'string',
+        'format': 'date-time',
+        'description': 'Thời gian kết thúc (ISO 8601, mặc định: hiện tại)'
+    },
+    {
+        'name': 'resolution',
+        'in': 'query',
+        'type': 'string',
+        'enum': list(RESOLUTIONS),
+        'description': 'Độ phân giải; mặc định chọn theo độ dài khoảng thời gian'
+    }
+]
+
+ROLLUP_RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'resolution': {'type': 'string'},
+        'data': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'bucket': {'type': 'string', 'format': 'date-time'},
+                    'flow_min': {'type': 'number'},
+                    'flow_max': {'type': 'number'},
+                    'flow_mean': {'type': 'number'},
+                    'flow_count': {'type': 'integer'},
+                    'anomaly_count': {'type': 'integer'},
+                    'prediction_count': {'type': 'integer'},
+                    'anomaly_rate': {'type': 'number'}
+                }
+            }
+        }
+    }
+}
+
+
+def parse_rollup_range():
+    end_time = request.args.get('end_time')
+    start_time = request.args.get('start_time')
+    end = datetime.fromisoformat(end_time) if end_time else datetime.now()
+    start = datetime.fromisoformat(start_time) if start_time else end - timedelta(days=7)
+    resolution = request.args.get('resolution')
+    if resolution and resolution not in RESOLUTIONS:
+        raise ValueError(f"Unsupported resolution: {resolution}")
+    return start, end, resolution
+
+
+def rollup_response(scope, scope_id, extra):
+    try:
+        start, end, resolution = parse_rollup_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    resolution, points = get_rollup_series(scope, scope_id, start, end, resolution)
+    return jsonify(dict({
+        'resolution': resolution,
+        'start_time': start.isoformat(),
+        'end_time': end.isoformat(),
+        'data': points
+    }, **extra)), 200
+
+
+@rollup_bp.route('/meters/<int:meter_id>', methods=['GET'])
+@swag_from({
+    'tags': ['Tổng hợp'],
+    'summary': 'Lưu lượng và tỉ lệ bất thường theo thời gian của một đồng hồ',
+    'description': 'Đọc dữ liệu tổng hợp theo giờ/ngày/tháng thay vì dữ liệu đo gốc',
+    'parameters': [
+        {
+            'name': 'meter_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True,
+            'description': 'ID của đồng hồ nước'
+        }
+    ] + ROLLUP_QUERY_PARAMETERS,
+    'responses': {
+        200: {'description': 'Thành công', 'schema': ROLLUP_RESPONSE_SCHEMA},
+        400: {'description': 'Tham số không hợp lệ'},
+        404: {'description': 'Không tìm thấy đồng hồ nước'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_meter_rollups(meter_id):
+    try:
+        meter = meters.get(meter_id, {"_id": 0, "meter_id": 1})
+        if not meter:
+            return jsonify({"error": "Không tìm thấy đồng hồ nước"}), 404
+        return rollup_response('meter', meter_id, {'meter_id': meter_id})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@rollup_bp.route('/branches/<int:branch_id>', methods=['GET'])
+@swag_from({
+    'tags': ['Tổng hợp'],
+    'summary': 'Lưu lượng và tỉ lệ bất thường theo thời gian của một chi nhánh',
+    'description': 'Đọc dữ liệu tổng hợp theo giờ/ngày/tháng của tất cả đồng hồ trong chi nhánh',
+    'parameters': [
+        {
+            'name': 'branch_id',
+            'in': 'path',
+            'type': 'integer',
+            'required': True,
+            'description': 'ID của chi nhánh'
+        }
+    ] + ROLLUP_QUERY_PARAMETERS,
+    'responses': {
+        200: {'description': 'Thành công', 'schema': ROLLUP_RESPONSE_SCHEMA},
+        400: {'description': 'Tham số không hợp lệ'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_branch_rollups(branch_id):
+    try:
+        return rollup_response('branch', branch_id, {'branch_id': branch_id})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@rollup_bp.route('/backfill', methods=['POST'])
+@swag_from({
+    'tags': ['Tổng hợp'],
+    'summary': 'Tính lại dữ liệu tổng hợp từ dữ liệu gốc',
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': False,
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'since': {
+                        'type': 'string',
+                        'format': 'date-time',
+                        'description': 'Chỉ tính lại từ thời điểm này (làm tròn về đầu tháng); bỏ trống để tính lại toàn bộ'
+                    }
+                }
+            }
+        }
+    ],
+    'responses': {
+        200: {'description': 'Tính lại thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def run_rollup_backfill():
+    try:
+        data = request.get_json(silent=True) or {}
+        return jsonify(backfill_rollups(data.get('since'))), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
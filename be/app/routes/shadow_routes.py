@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify
+from flasgger import swag_from
+from app.services.shadow import shadow_report
+
+shadow_bp = Blueprint('shadow', __name__)
+
+
+@shadow_bp.route('/report', methods=['GET'])
+@swag_from({
+    'tags': ['Shadow mô hình'],
+    'summary': 'So sánh mô hình ứng viên với mô hình chính',
+    'description': 'Tỷ lệ đồng thuận, số cảnh báo của mỗi bên, độ trễ p50/p95/p99 và các đồng hồ bất đồng nhiều nhất',
+    'parameters': [
+        {'name': 'model_id', 'in': 'query', 'type': 'integer', 'description': 'Mặc định SHADOW_MODEL_ID'},
+        {'name': 'start_time', 'in': 'query', 'type': 'string', 'format': 'date-time'},
+        {'name': 'end_time', 'in': 'query', 'type': 'string', 'format': 'date-time'},
+        {'name': 'top', 'in': 'query', 'type': 'integer', 'default': 10}
+    ],
+    'responses': {
+        200: {'description': 'Thành công'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def get_shadow_report():
+    try:
+        return jsonify(shadow_report(
+            request.args.get('model_id', type=int),
+            request.args.get('start_time'),
+            request.args.get('end_time'),
+            request.args.get('top', default=10, type=int),
+        )), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,46 +1,65 @@
 from flask import Blueprint, request, jsonify
 from app.database import mongo
-from app.models import WaterMeter
+from app.models import WaterMeter, Prediction
 from datetime import datetime
 from flasgger import swag_from
-from app.ml.predict import predictor
-import threading
+from app.ml.inference import inference
+from app.services import rollups
+from app.services.prediction_jobs import enqueue_prediction
+from app.repositories import meters, measurements, predictions
+from app.logging_utils import get_logger
+from pymongo.errors import BulkWriteError
+import csv
+import io
 
 water_meter_bp = Blueprint('water_meter', __name__)
-
+logger = get_logger(__name__)
+
+DEFAULT_METER_THRESHOLD = 0.015
+BULK_METER_FIELDS = ('branch_id', 'meter_name', 'installation_time')
+PREDICTION_DISPLAY_TIME_FORMAT = '%H:%M %d/%m/%Y'
+
+# Định dạng thời gian, nhãn hiển thị và confidence (%) ngay trong MongoDB thay vì lặp từng dòng bằng Python.
+# Các bản ghi cũ chưa có label_code được so khớp theo danh sách nhãn.
+PREDICTION_DETAIL_PROJECTION = {
+    '_id': 0,
+    'prediction_time': {'$switch': {
+        'branches': [
+            {'case': {'$eq': [{'$type': '$prediction_time'}, 'string']},
+             'then': {'$dateToString': {
+                 'format': PREDICTION_DISPLAY_TIME_FORMAT,
+                 'date': {'$dateFromString': {'dateString': '$prediction_time', 'onError': None}},
+                 'onNull': '$prediction_time'
+             }}},
+            {'case': {'$eq': [{'$type': '$prediction_time'}, 'date']},
+             'then': {'$dateToString': {'format': PREDICTION_DISPLAY_TIME_FORMAT, 'date': '$prediction_time'}}}
+        ],
+        'default': {'$toString': {'$ifNull': ['$prediction_time', '']}}
+    }},
+    'recorded_instant_flow': {'$ifNull': ['$recorded_instant_flow', 0]},
+    'predicted_label': {'$switch': {
+        'branches': [
+            {'case': {'$or': [
+                {'$eq': ['$label_code', Prediction.LABEL_CODE_NORMAL]},
+                {'$in': ['$predicted_label', Prediction.label_variants(Prediction.NORMAL_LABELS)]}
+            ]}, 'then': Prediction.LABEL_NORMAL},
+            {'case': {'$or': [
+                {'$eq': ['$label_code', Prediction.LABEL_CODE_LEAK]},
+                {'$in': ['$predicted_label', Prediction.label_variants(Prediction.LEAK_LABELS)]}
+            ]}, 'then': Prediction.DISPLAY_LABEL_ANOMALY}
+        ],
+        'default': {'$ifNull': ['$predicted_label', '']}
+    }},
+    'confidence': {'$multiply': [{'$ifNull': ['$confidence', 0]}, 100]},
+}
 def get_next_meter_id(): 
-    last_meter = mongo.db.water_meters.find_one(sort=[("meter_id", -1)])
-    return last_meter["meter_id"] + 1 if last_meter else 1
+    return meters.reserve_ids(1)[0]
 
-def get_next_prediction_id():
-    last_prediction = mongo.db.predictions.find_one(sort=[("p_id", -1)])
-    return last_prediction["p_id"] + 1 if last_prediction else 1
-
-def process_prediction_async(meter_id, flow_rate, measurement_time):
-    try:
-        is_anomaly, confidence, reconstruction_error, threshold = predictor.predict_one(
-            meter_id, flow_rate
-        )
-        
-        predicted_label = "Rò rỉ" if is_anomaly else "Bình thường"
-        
-        new_prediction = {
-            'p_id': get_next_prediction_id(),
-            'meter_id': meter_id,
-            'model_id': 1,  
-            'prediction_time': measurement_time,
-            'prediction_threshold': threshold,
-            'predicted_label': predicted_label,
-            'confidence': confidence,
-            'recorded_instant_flow': flow_rate
-        }
-        
-        mongo.db.predictions.insert_one(new_prediction)
-        
-        print(f"Prediction đã lưu: Meter {meter_id}, Label: {predicted_label}, Confidence: {confidence:.3f}")
-        
-    except Exception as e:
-        print(f"Lỗi trong quá trình prediction: {e}") 
+def meter_status_label(latest_prediction):
+    if not latest_prediction:
+        return "BÌNH THƯỜNG"
+    label = (latest_prediction.get("predicted_label") or "").lower()
+    return "BÌNH THƯỜNG" if label in Prediction.NORMAL_LABELS else "RÒ RỈ"
 
 
 @water_meter_bp.route('/water_meters', methods=['POST'])
@@ -106,10 +125,10 @@ def create_water_meter():
             'branch_id': data['branch_id'],
             'meter_name': data['meter_name'],
             'installation_time': data.get('installation_time', datetime.utcnow().isoformat()),
-            'threshold': predictor.calculate_threshold(meter_id) 
+            'threshold': inference.calculate_threshold(meter_id) 
         }
 
-        result = mongo.db.water_meters.insert_one(new_meter)
+        result = meters.insert_one(new_meter)
 
         if result.inserted_id:
             new_meter['_id'] = str(result.inserted_id)
@@ -121,6 +140,150 @@ def create_water_meter():
             return jsonify({"error": "Failed to create water meter"}), 500
     except Exception as e: 
         return jsonify({"error": str(e)}), 500
+
+
+def read_bulk_meter_rows():
+    upload = request.files.get('file')
+    if upload is not None:
+        return list(csv.DictReader(io.StringIO(upload.read().decode('utf-8-sig'))))
+    if request.mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('meters')
+    return data if isinstance(data, list) else None
+
+def validate_bulk_meter_row(row):
+    if not isinstance(row, dict):
+        return None, "Invalid row"
+    # Ô CSV trống là chuỗi rỗng; giá trị 0 (vd. branch_id) vẫn hợp lệ
+    missing = [field for field in BULK_METER_FIELDS if row.get(field) is None or str(row[field]).strip() == '']
+    if missing:
+        return None, f"Missing required fields: {', '.join(missing)}"
+    try:
+        branch_id = int(row['branch_id'])
+    except (TypeError, ValueError):
+        return None, "branch_id must be an integer"
+    return {
+        'branch_id': branch_id,
+        'meter_name': str(row['meter_name']).strip(),
+        'installation_time': str(row['installation_time']).strip(),
+    }, None
+
+
+@water_meter_bp.route('/water_meters/bulk', methods=['POST'])
+@swag_from({
+    'tags': ['Đồng hồ nước'],
+    'summary': 'Tạo mới nhiều đồng hồ nước cùng lúc',
+    'description': 'Nhận một mảng JSON (hoặc {"meters": [...]}) hoặc tệp CSV với các cột branch_id, meter_name, installation_time. '
+                   'Cấp một khối meter_id trong một thao tác, kiểm tra branch_id bằng một truy vấn và ghi bằng insert_many. '
+                   'Trả về kết quả cho từng dòng.',
+    'consumes': ['application/json', 'text/csv', 'multipart/form-data'],
+    'parameters': [
+        {
+            'name': 'body',
+            'in': 'body',
+            'required': False,
+            'description': 'Danh sách đồng hồ nước cần tạo',
+            'schema': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'branch_id': {'type': 'integer'},
+                        'meter_name': {'type': 'string'},
+                        'installation_time': {'type': 'string', 'format': 'date-time'}
+                    },
+                    'required': ['branch_id', 'meter_name', 'installation_time']
+                }
+            }
+        }
+    ],
+    'responses': {
+        201: {'description': 'Mọi dòng đều được tạo (cùng dạng kết quả với 207)'},
+        207: {
+            'description': 'Một phần các dòng được tạo: kết quả cho từng dòng',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'created': {'type': 'integer'},
+                    'failed': {'type': 'integer'},
+                    'results': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'properties': {
+                                'row': {'type': 'integer'},
+                                'status': {'type': 'string', 'enum': ['created', 'error']},
+                                'meter_id': {'type': 'integer'},
+                                'error': {'type': 'string'}
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'Dữ liệu đầu vào không hợp lệ hoặc không dòng nào được tạo (kèm kết quả cho từng dòng)'},
+        500: {'description': 'Lỗi server nội bộ'}
+    }
+})
+def create_water_meters_bulk():
+    try:
+        rows = read_bulk_meter_rows()
+        if not rows:
+            return jsonify({"error": "Invalid input data"}), 400
+
+        results = [None] * len(rows)
+        valid = []
+        for index, row in enumerate(rows):
+            meter, error = validate_bulk_meter_row(row)
+            if error:
+                results[index] = {'row': index, 'status': 'error', 'error': error}
+            else:
+                valid.append((index, meter))
+
+        branch_ids = list({meter['branch_id'] for _, meter in valid})
+        known_branches = set(mongo.db.branches.distinct('branch_id', {'branch_id': {'$in': branch_ids}})) if branch_ids else set()
+
+        to_insert = []
+        for index, meter in valid:
+            if meter['branch_id'] not in known_branches:
+                results[index] = {'row': index, 'status': 'error', 'error': f"Branch {meter['branch_id']} not found"}
+            else:
+                to_insert.append((index, meter))
+
+        if to_insert:
+            meter_ids = meters.reserve_ids(len(to_insert))
+            documents = []
+            for (index, meter), meter_id in zip(to_insert, meter_ids):
+                meter['meter_id'] = meter_id
+                meter['threshold'] = DEFAULT_METER_THRESHOLD
+                documents.append(meter)
+                results[index] = {'row': index, 'status': 'created', 'meter_id': meter_id}
+
+            try:
+                meters.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                for write_error in e.details.get('writeErrors', []):
+                    index = to_insert[write_error['index']][0]
+                    results[index] = {'row': index, 'status': 'error', 'error': write_error.get('errmsg', 'Write failed')}
+
+        created = sum(1 for result in results if result['status'] == 'created')
+        # 201: mọi dòng được tạo, 207: một phần, 400: không dòng nào
+        if created == len(results):
+            status = 201
+        elif created:
+            status = 207
+        else:
+            status = 400
+        return jsonify({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }), status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
     
 
 @water_meter_bp.route('/water_meters', methods=['GET'])
@@ -160,15 +323,12 @@ def get_all_water_meters():
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 10, type=int)
 
-        query_filter = {}
-        if branch_id: 
-            query_filter['branch_id'] = branch_id
         skip = (page - 1) * limit
 
-        meters = list(mongo.db.water_meters.find(query_filter).skip(skip).limit(limit))
-        total_count = mongo.db.water_meters.count_documents(query_filter)
+        meter_docs = meters.page(branch_id, skip=skip, limit=limit)
+        total_count = meters.count_for_branch(branch_id)
 
-        meters_data = [WaterMeter.to_dict(meter) for meter in meters]
+        meters_data = [WaterMeter.to_dict(meter) for meter in meter_docs]
         return jsonify({
             'data': meters_data,
             'total_count': total_count,
@@ -256,7 +416,7 @@ def get_all_water_meters():
 })
 def get_water_meter_details_predictions(meter_id): 
     try: 
-        meter = mongo.db.water_meters.find_one({"meter_id": meter_id})
+        meter = meters.get(meter_id, {"_id": 0, "meter_name": 1})
         if not meter: 
             return jsonify({"error": "Water meter not found"}), 404
         page = request.args.get('page', 1, type=int)
@@ -275,40 +435,8 @@ def get_water_meter_details_predictions(meter_id):
             query_filter["prediction_time"] = time_filter
 
         skip = (page - 1) * limit
-        predictions = list(mongo.db.predictions.find(query_filter)
-                           .sort("prediction_time", -1)
-                           .skip(skip)
-                           .limit(limit))
-        total_count = mongo.db.predictions.count_documents(query_filter)
-        predictions_data = []
-        for pred in predictions:
-            prediction_time = pred.get('prediction_time', '')
-            if isinstance(prediction_time, str):
-                try:
-                    from datetime import datetime
-                    dt = datetime.fromisoformat(prediction_time.replace('Z', '+00:00'))
-                    formatted_time = dt.strftime('%H:%M %d/%m/%Y')
-                except:
-                    formatted_time = prediction_time
-            else:
-                formatted_time = str(prediction_time)
-
-            confidence = pred.get('confidence', 0) * 100
-
-            predicted_label = pred.get('predicted_label', '')
-            if predicted_label.lower() in ['bình thường', 'binh thuong', 'normal']:
-                display_label = 'Bình thường'
-            elif predicted_label.lower() in ['rò rỉ', 'ro ri', 'leak', 'bất thường', 'bat thuong']:
-                display_label = 'Bất thường'
-            else:
-                display_label = predicted_label
-
-            predictions_data.append({
-                'prediction_time': formatted_time,
-                'recorded_instant_flow': pred.get('recorded_instant_flow', 0),
-                'predicted_label': display_label,
-                'confidence': confidence,
-            })
+        predictions_data = predictions.page_projected(query_filter, PREDICTION_DETAIL_PROJECTION, skip=skip, limit=limit)
+        total_count = predictions.count(query_filter)
 
         return jsonify({
             'data': predictions_data,
@@ -357,30 +485,14 @@ def get_water_meter_details_predictions(meter_id):
 })
 def get_water_meter_status(meter_id):
     try:
-        meter = mongo.db.water_meters.find_one({"meter_id": meter_id})
+        meter = meters.get(meter_id)
         if not meter:
             return jsonify({"error": "Không tìm thấy đồng hồ nước"}), 404
 
-        latest_predictions = list(mongo.db.predictions.find({"meter_id": meter_id})
-                                 .sort("prediction_time", -1)
-                                 .limit(1))
-        
-        if not latest_predictions:
-            return jsonify({
-                "meter_id": meter_id,
-                "meter_name": meter.get("meter_name"),
-                "status": "BÌNH THƯỜNG",
-            }), 200
-
-        all_normal = all(pred.get("predicted_label", "").lower() in ["bình thường", "binh thuong", "normal"] 
-                        for pred in latest_predictions)
-        
-        status = "BÌNH THƯỜNG" if all_normal else "RÒ RỈ"
-
         return jsonify({
             "meter_id": meter_id,
             "meter_name": meter.get("meter_name"),
-            "status": status,
+            "status": meter_status_label(predictions.latest(meter_id)),
         }), 200
 
     except Exception as e:
@@ -428,40 +540,15 @@ def get_all_water_meters_status():
     try:
         branch_id = request.args.get('branch_id', type=int)
         
-        query_filter = {}
-        if branch_id:
-            query_filter['branch_id'] = branch_id
-            
-        meters = list(mongo.db.water_meters.find(query_filter))
-        
-        result = []
-        for meter in meters:
-            meter_id = meter['meter_id']
-            
-            latest_predictions = list(mongo.db.predictions.find({"meter_id": meter_id})
-                                     .sort("prediction_time", -1)
-                                     .limit(1))
-            
-            if not latest_predictions:
-                result.append({
-                    "meter_id": meter_id,
-                    "meter_name": meter.get("meter_name"),
-                    "branch_id": meter.get("branch_id"),
-                    "status": "BÌNH THƯỜNG",
-                })
-                continue
-            
-            all_normal = all(pred.get("predicted_label", "").lower() in ["bình thường", "binh thuong", "normal"] 
-                            for pred in latest_predictions)
-            
-            status = "BÌNH THƯỜNG" if all_normal else "RÒ RỈ"
-            
-            result.append({
-                "meter_id": meter_id,
-                "meter_name": meter.get("meter_name"),
-                "branch_id": meter.get("branch_id"),
-                "status": status,
-            })
+        meter_docs = meters.page(branch_id)
+        latest = predictions.latest_for_meters([meter['meter_id'] for meter in meter_docs])
+
+        result = [{
+            "meter_id": meter['meter_id'],
+            "meter_name": meter.get("meter_name"),
+            "branch_id": meter.get("branch_id"),
+            "status": meter_status_label(latest.get(meter['meter_id'])),
+        } for meter in meter_docs]
         
         return jsonify({"data": result}), 200
         
@@ -527,7 +614,7 @@ def get_all_water_meters_status():
 })
 def create_measurement_with_prediction(meter_id):
     try:
-        meter = mongo.db.water_meters.find_one({"meter_id": meter_id})
+        meter = meters.get(meter_id)
         if not meter:
             return jsonify({"error": "Không tìm thấy đồng hồ nước"}), 404
             
@@ -538,26 +625,27 @@ def create_measurement_with_prediction(meter_id):
         if 'instant_flow' not in data or 'measurement_time' not in data:
             return jsonify({"error": "Thiếu trường bắt buộc"}), 400
         
-        last_measurement = mongo.db.meter_measurement_data.find_one(sort=[("id", -1)])
-        new_id = last_measurement["id"] + 1 if last_measurement else 1
+        new_id = measurements.reserve_ids(1)[0]
         
         new_measurement = {
             'id': new_id,
             'meter_id': meter_id,
             'instant_flow': float(data['instant_flow']),
             'measurement_time': data['measurement_time'],
-            'instant_pressure': float(data.get('instant_pressure', 0))
+            'instant_pressure': float(data['instant_pressure']) if data.get('instant_pressure') is not None else None
         }
         
-        result = mongo.db.meter_measurement_data.insert_one(new_measurement)
+        result = measurements.insert_one(new_measurement)
         
         if result.inserted_id:
-            thread = threading.Thread(
-                target=process_prediction_async,
-                args=(meter_id, data['instant_flow'], data['measurement_time'])
-            )
-            thread.daemon = True
-            thread.start()
+            try:
+                rollups.record_measurement(meter_id, meter.get('branch_id'), new_measurement['measurement_time'], new_measurement['instant_flow'])
+            except Exception:
+                logger.exception("Lỗi khi cập nhật rollup cho đồng hồ %s", meter_id)
+
+            # Dự đoán được xếp vào hàng đợi bền vững và do các worker xử lý
+            enqueue_prediction(new_id, meter_id, meter.get('branch_id'), data['instant_flow'], data['measurement_time'],
+                               new_measurement['instant_pressure'])
             
             return jsonify({
                 'message': 'Ghi dữ liệu đo thành công',
@@ -0,0 +1,62 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask.json.provider import JSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from bson import ObjectId, Decimal128
+except ImportError:
+    ObjectId = None
+    Decimal128 = None
+
+
+def default_encoder(obj):
+    if ObjectId is not None and isinstance(obj, ObjectId):
+        return str(obj)
+    if Decimal128 is not None and isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj):
+        return orjson.dumps(obj, default=default_encoder, option=ORJSON_OPTIONS)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps_bytes(obj):
+        return json.dumps(obj, default=default_encoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(data):
+        return json.loads(data)
+
+
+class FastJSONProvider(JSONProvider):
+    # Thay thế provider mặc định của Flask: jsonify() dùng orjson (nếu có) và hiểu kiểu BSON
+    mimetype = 'application/json'
+
+    def dumps(self, obj, **kwargs):
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
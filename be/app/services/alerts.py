@@ -0,0 +1,256 @@
+from collections import defaultdict
+from datetime import datetime
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.config import Config
+from app.database import mongo
+from app.logging_utils import get_logger
+from app.metrics import ALERTS_TOTAL
+from app.models import Prediction
+from app.repositories import alerts
+from app.services.rollups import to_time_string
+
+logger = get_logger(__name__)
+
+ALERT_OPEN = "open"
+ALERT_CLOSED = "closed"
+LEVEL_WARNING = "warning"
+LEVEL_CRITICAL = "critical"
+LEVEL_RANK = {LEVEL_WARNING: 1, LEVEL_CRITICAL: 2}
+ALERT_WRITE_BATCH = 1000
+DUPLICATE_KEY = 11000
+
+# Trạng thái cảnh báo của mỗi đồng hồ nằm trong alert_state (chuỗi bất thường/bình thường liên tiếp, cảnh báo đang mở).
+# Một lô prediction được áp lên trạng thái trong bộ nhớ rồi ghi một lần: cảnh báo được ghi trước (chỉ $set giá trị
+# tuyệt đối nên ghi lại không sai), alert_state ghi sau kèm điều kiện version và chỉ cho đồng hồ có cảnh báo ghi thành
+# công. Đồng hồ bị process khác cập nhật trước (lỗi trùng khoá) được đọc lại và tính lại.
+OPEN_ALERT_PROJECTION = {'_id': 0, 'id': 1, 'meter_id': 1, 'level': 1, 'max_confidence': 1, 'anomaly_count': 1}
+
+
+def alert_level(anomaly_streak, confidence):
+    if confidence >= Config.ALERT_CRITICAL_CONFIDENCE or anomaly_streak >= Config.ALERT_CRITICAL_AFTER:
+        return LEVEL_CRITICAL
+    return LEVEL_WARNING
+
+
+def is_leak(prediction):
+    label_code = prediction.get('label_code') or Prediction.label_code(prediction.get('predicted_label'))
+    return label_code == Prediction.LABEL_CODE_LEAK
+
+
+def new_state(meter_id, branch_id):
+    return {'meter_id': meter_id, 'branch_id': branch_id, 'version': 0, 'last_time': None, 'streak_start': None,
+            'anomaly_streak': 0, 'normal_streak': 0, 'open_alert': None}
+
+
+def open_alert_state(alert):
+    if alert is None:
+        return None
+    return {'id': alert['id'], 'level': alert['level'], 'max_confidence': alert['max_confidence'],
+            'anomaly_count': alert.get('anomaly_count', 0)}
+
+
+def alert_change(changes, alert_id, meter_id):
+    return changes.setdefault(alert_id, {'meter_id': meter_id, 'new': None, 'set': {}, 'events': []})
+
+
+def apply_prediction(state, prediction, changes, allocate_id):
+    # Trả về False nếu prediction cũ hơn trạng thái đang lưu (đến trễ): không ảnh hưởng chuỗi liên tiếp
+    prediction_time = to_time_string(prediction['prediction_time'])
+    if state['last_time'] is not None and prediction_time <= state['last_time']:
+        return False
+    state['last_time'] = prediction_time
+    confidence = float(prediction.get('confidence') or 0.0)
+    alert = state['open_alert']
+
+    if is_leak(prediction):
+        state['anomaly_streak'] += 1
+        state['normal_streak'] = 0
+        if state['anomaly_streak'] == 1:
+            state['streak_start'] = prediction_time
+        if alert is None:
+            if state['anomaly_streak'] < Config.ALERT_OPEN_AFTER and confidence < Config.ALERT_CRITICAL_CONFIDENCE:
+                return True
+            # Các prediction bất thường trước khi mở cảnh báo cũng thuộc cảnh báo này
+            alert = {'id': allocate_id(), 'level': alert_level(state['anomaly_streak'], confidence),
+                     'max_confidence': confidence, 'anomaly_count': state['anomaly_streak']}
+            state['open_alert'] = alert
+            change = alert_change(changes, alert['id'], state['meter_id'])
+            change['new'] = {
+                'id': alert['id'],
+                'p_id': prediction.get('p_id'),
+                'meter_id': state['meter_id'],
+                'branch_id': state['branch_id'],
+                'time': state['streak_start'],
+                'opened_time': prediction_time,
+                'status': ALERT_OPEN,
+            }
+            change['events'].append('opened')
+        else:
+            change = alert_change(changes, alert['id'], state['meter_id'])
+            alert['anomaly_count'] += 1
+            alert['max_confidence'] = max(alert['max_confidence'], confidence)
+            level = alert_level(state['anomaly_streak'], alert['max_confidence'])
+            if LEVEL_RANK[level] > LEVEL_RANK[alert['level']]:
+                alert['level'] = level
+                change['events'].append('escalated')
+        change['set'].update(level=alert['level'], max_confidence=alert['max_confidence'],
+                             anomaly_count=alert['anomaly_count'], last_anomaly_time=prediction_time)
+    else:
+        state['normal_streak'] += 1
+        state['anomaly_streak'] = 0
+        if alert is not None and state['normal_streak'] >= Config.ALERT_CLOSE_AFTER:
+            change = alert_change(changes, alert['id'], state['meter_id'])
+            change['set'].update(status=ALERT_CLOSED, closed_time=prediction_time)
+            change['events'].append('closed')
+            state['open_alert'] = None
+    return True
+
+
+def alert_ops(changes, now):
+    ops = []
+    for alert_id, change in changes.items():
+        if change['new'] is not None:
+            ops.append(InsertOne(dict(change['new'], **change['set'], updated_at=now)))
+        else:
+            ops.append(UpdateOne({'meter_id': change['meter_id'], 'id': alert_id},
+                                 {'$set': dict(change['set'], updated_at=now)}))
+    return ops
+
+
+def count_events(changes):
+    for change in changes.values():
+        for event in change['events']:
+            ALERTS_TOTAL.inc(event=event)
+
+
+def write_alerts(changes, now):
+    # Trả về các meter_id có thao tác ghi cảnh báo bị lỗi, vd. trùng chỉ mục meter_id_open khi process khác
+    # vừa mở cảnh báo cho cùng đồng hồ. Chỉ số lỗi của Repository.bulk_write tính theo toàn bộ danh sách thao tác
+    meter_ids = [change['meter_id'] for change in changes.values()]
+    failed = set()
+    try:
+        alerts.bulk_write(alert_ops(changes, now))
+    except BulkWriteError as e:
+        failed.update(meter_ids[error['index']] for error in e.details.get('writeErrors', []))
+    if failed:
+        logger.warning("Ghi cảnh báo lỗi cho %s đồng hồ, sẽ tính lại", len(failed))
+    return failed
+
+
+def write_states(state_ops):
+    # Trả về các meter_id bị process khác cập nhật trước (upsert gặp trùng khoá meter_id)
+    if not state_ops:
+        return set()
+    try:
+        mongo.db.alert_state.bulk_write([op for _, op in state_ops], ordered=False)
+        return set()
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        if any(error['code'] != DUPLICATE_KEY for error in errors):
+            raise
+        return {state_ops[error['index']][0] for error in errors}
+
+
+class AlertIds:
+    # Cấp id cảnh báo từ bộ đếm nguyên tử theo khối block id; id còn thừa của khối bị bỏ trống
+    def __init__(self, block=1):
+        self.block = block
+        self.ids = []
+
+    def __call__(self):
+        if not self.ids:
+            self.ids = alerts.reserve_ids(self.block)
+        return self.ids.pop(0)
+
+
+def record_alerts(new_predictions):
+    # new_predictions: các prediction vừa ghi (kèm branch_id), có thể thuộc nhiều đồng hồ
+    by_meter = defaultdict(list)
+    for prediction in new_predictions:
+        by_meter[prediction['meter_id']].append(prediction)
+    for meter_predictions in by_meter.values():
+        meter_predictions.sort(key=lambda prediction: to_time_string(prediction['prediction_time']))
+
+    allocate_id = AlertIds()
+    pending = set(by_meter)
+    for _ in range(Config.ALERT_STATE_RETRIES):
+        states = {state['meter_id']: state for state in
+                  mongo.db.alert_state.find({'meter_id': {'$in': list(pending)}}, {'_id': 0})}
+        open_alerts = {alert['meter_id']: alert for alert in alerts.open_for_meters(pending, OPEN_ALERT_PROJECTION)}
+        meter_changes, state_ops = {}, {}
+        for meter_id in pending:
+            meter_predictions = by_meter[meter_id]
+            state = states.get(meter_id) or new_state(meter_id, meter_predictions[0].get('branch_id'))
+            # Cảnh báo luôn được ghi trước alert_state nên tài liệu cảnh báo đang mở là nguồn đúng
+            state['open_alert'] = open_alert_state(open_alerts.get(meter_id))
+            version = state['version']
+            changes = {}
+            applied = [apply_prediction(state, prediction, changes, allocate_id) for prediction in meter_predictions]
+            if not any(applied):
+                continue
+            state['version'] = version + 1
+            meter_changes[meter_id] = changes
+            state_ops[meter_id] = UpdateOne({'meter_id': meter_id, 'version': version}, {'$set': state}, upsert=True)
+
+        now = datetime.utcnow().isoformat()
+        all_changes = {}
+        for changes in meter_changes.values():
+            all_changes.update(changes)
+        failed = write_alerts(all_changes, now)
+        pending = failed | write_states([(meter_id, op) for meter_id, op in state_ops.items() if meter_id not in failed])
+        for meter_id, changes in meter_changes.items():
+            if meter_id not in pending:
+                count_events(changes)
+        if not pending:
+            return
+    logger.warning("Không cập nhật được trạng thái cảnh báo sau %s lần thử", Config.ALERT_STATE_RETRIES,
+                   extra={'fields': {'meter_ids': sorted(pending)}})
+
+
+def backfill_alerts():
+    # Dựng lại toàn bộ cảnh báo và alert_state từ lịch sử predictions, theo từng đồng hồ
+    mongo.db.alerts.delete_many({})
+    mongo.db.alert_state.delete_many({})
+    meter_branches = {
+        meter['meter_id']: meter.get('branch_id')
+        for meter in mongo.db.water_meters.find({}, {'_id': 0, 'meter_id': 1, 'branch_id': 1})
+    }
+    cursor = mongo.db.predictions.find(
+        {}, {'_id': 0, 'p_id': 1, 'meter_id': 1, 'prediction_time': 1, 'label_code': 1, 'predicted_label': 1,
+             'confidence': 1},
+        sort=[('meter_id', 1), ('prediction_time', 1)]
+    )
+    allocate_id = AlertIds(ALERT_WRITE_BATCH)
+    now = datetime.utcnow().isoformat()
+    state, changes = None, {}
+    alert_batch, state_batch = [], []
+
+    def finish_meter():
+        alert_batch.extend(alert_ops(changes, now))
+        state_batch.append(InsertOne(dict(state, version=1)))
+
+    for prediction in cursor:
+        if state is None or prediction['meter_id'] != state['meter_id']:
+            if state is not None:
+                finish_meter()
+            state, changes = new_state(prediction['meter_id'], meter_branches.get(prediction['meter_id'])), {}
+            if len(alert_batch) >= ALERT_WRITE_BATCH or len(state_batch) >= ALERT_WRITE_BATCH:
+                alerts.bulk_write(alert_batch)
+                mongo.db.alert_state.bulk_write(state_batch, ordered=False)
+                alert_batch, state_batch = [], []
+        apply_prediction(state, prediction, changes, allocate_id)
+    if state is not None:
+        finish_meter()
+    if alert_batch:
+        alerts.bulk_write(alert_batch)
+    if state_batch:
+        mongo.db.alert_state.bulk_write(state_batch, ordered=False)
+    return alerts.count({})
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    with create_app().app_context():
+        print(backfill_alerts())
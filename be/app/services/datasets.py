@@ -0,0 +1,39 @@
+# Mô tả các bộ dữ liệu dạng chuỗi thời gian dùng chung cho xuất dữ liệu và lưu trữ (archive)
+DATASETS = {
+    'measurements': {
+        'collection': 'meter_measurement_data',
+        'time_field': 'measurement_time',
+        'sort_key': 'id',
+        'fields': ['id', 'meter_id', 'measurement_time', 'instant_flow', 'instant_pressure'],
+        'types': ['int64', 'int64', 'string', 'float64', 'float64'],
+    },
+    'predictions': {
+        'collection': 'predictions',
+        'time_field': 'prediction_time',
+        'sort_key': 'p_id',
+        'fields': ['p_id', 'meter_id', 'measurement_id', 'model_id', 'prediction_time', 'prediction_threshold',
+                   'predicted_label', 'label_code', 'confidence', 'recorded_instant_flow'],
+        'types': ['int64', 'int64', 'int64', 'int64', 'string', 'float64', 'string', 'string', 'float64', 'float64'],
+        # Trường chỉ có trên một phần tài liệu (chỉ mục unique partial theo $exists): khôi phục không ghi giá trị null
+        'sparse_fields': ['measurement_id'],
+    },
+}
+
+
+def dataset_projection(dataset):
+    projection = {field: 1 for field in dataset['fields']}
+    projection['_id'] = 0
+    return projection
+
+def dataset_sort(dataset):
+    # Khớp chỉ mục (time_field, sort_key): lọc theo khoảng thời gian và sắp xếp không cần sort trong bộ nhớ
+    return [(dataset['time_field'], 1), (dataset['sort_key'], 1)]
+
+def parquet_schema(dataset):
+    import pyarrow as pa
+    return pa.schema([(field, field_type) for field, field_type in zip(dataset['fields'], dataset['types'])])
+
+def batch_to_table(dataset, batch, schema):
+    import pyarrow as pa
+    columns = {field: [doc.get(field) for doc in batch] for field in dataset['fields']}
+    return pa.Table.from_pydict(columns, schema=schema)
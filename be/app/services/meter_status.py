@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.database import mongo
+from app.services.rollups import anomaly_expression, bucket_start, choose_resolution, to_time_string
+
+STATUS_NORMAL = "normal"
+STATUS_LEAK = "leak"
+STATUS_WRITE_BATCH = 1000
+
+
+def record_prediction_status(meter_id, branch_id, prediction_time, is_anomaly):
+    # Chỉ ghi đè khi prediction mới hơn trạng thái đang lưu; upsert trùng meter_id nghĩa là đã có bản mới hơn
+    prediction_time = to_time_string(prediction_time)
+    try:
+        mongo.db.meter_status.update_one(
+            {'meter_id': meter_id,
+             '$or': [{'last_prediction_time': {'$lte': prediction_time}},
+                     {'last_prediction_time': {'$exists': False}}]},
+            {'$set': {
+                'branch_id': branch_id,
+                'status': STATUS_LEAK if is_anomaly else STATUS_NORMAL,
+                'is_leak': bool(is_anomaly),
+                'last_prediction_time': prediction_time,
+                'updated_at': datetime.utcnow().isoformat()
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        pass
+
+def backfill_meter_status():
+    meter_branches = {
+        meter['meter_id']: meter.get('branch_id')
+        for meter in mongo.db.water_meters.find({}, {'_id': 0, 'meter_id': 1, 'branch_id': 1})
+    }
+    latest = mongo.db.predictions.aggregate([
+        {'$sort': {'meter_id': 1, 'prediction_time': -1}},
+        {'$group': {
+            '_id': '$meter_id',
+            'last_prediction_time': {'$first': '$prediction_time'},
+            'is_leak': {'$first': anomaly_expression()}
+        }}
+    ], allowDiskUse=True)
+    latest = {doc['_id']: doc for doc in latest}
+
+    now = datetime.utcnow().isoformat()
+    ops = []
+    for meter_id, branch_id in meter_branches.items():
+        doc = latest.get(meter_id, {})
+        is_leak = bool(doc.get('is_leak', False))
+        status = {
+            'meter_id': meter_id,
+            'branch_id': branch_id,
+            'status': STATUS_LEAK if is_leak else STATUS_NORMAL,
+            'is_leak': is_leak,
+            'updated_at': now
+        }
+        if doc.get('last_prediction_time') is not None:
+            status['last_prediction_time'] = doc['last_prediction_time']
+        ops.append(UpdateOne({'meter_id': meter_id}, {'$set': status}, upsert=True))
+        if len(ops) >= STATUS_WRITE_BATCH:
+            mongo.db.meter_status.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        mongo.db.meter_status.bulk_write(ops, ordered=False)
+    mongo.db.meter_status.delete_many({'meter_id': {'$nin': list(meter_branches)}})
+    return len(meter_branches)
+
+
+def empty_health():
+    return {
+        'meter_count': 0,
+        'leaking_meter_count': 0,
+        'total_flow': 0.0,
+        'prediction_count': 0,
+        'anomaly_count': 0,
+        'anomaly_rate': None
+    }
+
+def branch_health(end, hours, branch_ids=None):
+    # Ghép số đồng hồ (water_meters), số đồng hồ đang rò rỉ (meter_status)
+    # và lưu lượng/tỉ lệ bất thường gần đây (branch_rollups) theo từng chi nhánh
+    branch_filter = {'branch_id': {'$in': branch_ids}} if branch_ids is not None else {}
+    start = end - timedelta(hours=hours)
+    resolution = choose_resolution(start, end)
+
+    health = {}
+    for doc in mongo.db.water_meters.aggregate([
+        {'$match': branch_filter},
+        {'$group': {'_id': '$branch_id', 'meter_count': {'$sum': 1}}}
+    ]):
+        health.setdefault(doc['_id'], empty_health())['meter_count'] = doc['meter_count']
+
+    for doc in mongo.db.meter_status.aggregate([
+        {'$match': dict(branch_filter, is_leak=True)},
+        {'$group': {'_id': '$branch_id', 'leaking_meter_count': {'$sum': 1}}}
+    ]):
+        health.setdefault(doc['_id'], empty_health())['leaking_meter_count'] = doc['leaking_meter_count']
+
+    for doc in mongo.db.branch_rollups.aggregate([
+        {'$match': dict(branch_filter,
+                        resolution=resolution,
+                        bucket={'$gte': bucket_start(start, resolution), '$lte': to_time_string(end)})},
+        {'$group': {
+            '_id': '$branch_id',
+            'total_flow': {'$sum': '$flow_sum'},
+            'prediction_count': {'$sum': '$prediction_count'},
+            'anomaly_count': {'$sum': '$anomaly_count'}
+        }}
+    ]):
+        entry = health.setdefault(doc['_id'], empty_health())
+        entry['total_flow'] = doc['total_flow']
+        entry['prediction_count'] = doc['prediction_count']
+        entry['anomaly_count'] = doc['anomaly_count']
+
+    for entry in health.values():
+        if entry['prediction_count']:
+            entry['anomaly_rate'] = entry['anomaly_count'] / entry['prediction_count']
+
+    return {
+        'window': {'start_time': start.isoformat(), 'end_time': end.isoformat(), 'resolution': resolution},
+        'branches': health
+    }
+
+def combine_health(entries):
+    combined = empty_health()
+    for entry in entries:
+        for field in ('meter_count', 'leaking_meter_count', 'total_flow', 'prediction_count', 'anomaly_count'):
+            combined[field] += entry[field]
+    if combined['prediction_count']:
+        combined['anomaly_rate'] = combined['anomaly_count'] / combined['prediction_count']
+    return combined
@@ -0,0 +1,325 @@
+import argparse
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.config import Config
+from app.database import mongo, ensure_indexes
+from app.logging_utils import get_logger
+from app.metrics import PREDICTION_STAGE_SECONDS, PREDICTION_BACKLOG, PREDICTION_JOBS_TOTAL
+from app.ml.config import MLConfig
+from app.ml.inference import inference, PredictionFailure
+from app.models import Prediction
+from app.repositories import predictions
+from app.services import rollups, meter_status
+from app.services.alerts import record_alerts
+from app.services.threshold_sketches import record_error
+from app.services.shadow import submit_shadow, start_shadow_worker, stop_shadow_worker
+
+logger = get_logger(__name__)
+
+# Hàng đợi bền vững cho việc dự đoán sau khi ghi dữ liệu đo. _id của job là id của bản ghi đo nên enqueue
+# nhiều lần cho cùng một bản ghi chỉ tạo một job; prediction cũng được khoá theo measurement_id.
+JOB_PENDING = "pending"
+JOB_LEASED = "leased"
+JOB_DEAD = "dead"
+
+_wake = threading.Event()
+_workers = []
+_workers_pid = None
+_workers_lock = threading.Lock()
+
+
+def new_prediction_job(measurement_id, meter_id, branch_id, flow_rate, measurement_time, pressure=None):
+    now = datetime.utcnow()
+    return {
+        '_id': measurement_id,
+        'meter_id': meter_id,
+        'branch_id': branch_id,
+        'flow_rate': float(flow_rate),
+        'pressure': float(pressure) if pressure is not None else None,
+        'measurement_time': measurement_time,
+        'status': JOB_PENDING,
+        'attempts': 0,
+        'available_at': now,
+        'created_at': now,
+    }
+
+
+def enqueue_prediction(measurement_id, meter_id, branch_id, flow_rate, measurement_time, pressure=None):
+    try:
+        mongo.db.prediction_jobs.insert_one(
+            new_prediction_job(measurement_id, meter_id, branch_id, flow_rate, measurement_time, pressure))
+    except DuplicateKeyError:
+        return False
+    notify_workers()
+    return True
+
+
+def notify_workers():
+    _wake.set()
+
+
+def lease_jobs(worker_id, limit):
+    # Lấy job đến hạn hoặc job có lease đã hết hạn (worker trước đó chết giữa chừng); mỗi lần lease tính một lần thử
+    leased = []
+    while len(leased) < limit:
+        now = datetime.utcnow()
+        job = mongo.db.prediction_jobs.find_one_and_update(
+            {'$or': [
+                {'status': JOB_PENDING, 'available_at': {'$lte': now}},
+                {'status': JOB_LEASED, 'lease_expires_at': {'$lte': now}},
+            ]},
+            {'$set': {
+                'status': JOB_LEASED,
+                'lease_owner': worker_id,
+                'lease_expires_at': now + timedelta(seconds=Config.PREDICTION_JOB_LEASE_SECONDS),
+            }, '$inc': {'attempts': 1}},
+            sort=[('available_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if job is None:
+            break
+        leased.append(job)
+    return leased
+
+
+def complete_job(job, worker_id):
+    mongo.db.prediction_jobs.delete_one({'_id': job['_id'], 'lease_owner': worker_id})
+    PREDICTION_JOBS_TOTAL.inc(outcome='done')
+
+
+def retry_delay(attempts):
+    delay = min(Config.PREDICTION_JOB_BACKOFF_SECONDS * 2 ** (attempts - 1), Config.PREDICTION_JOB_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def fail_job(job, worker_id, error):
+    if job['attempts'] >= Config.PREDICTION_JOB_MAX_ATTEMPTS:
+        dead = dict(job, status=JOB_DEAD, last_error=error, failed_at=datetime.utcnow())
+        dead.pop('lease_owner', None)
+        dead.pop('lease_expires_at', None)
+        mongo.db.prediction_dead_letters.replace_one({'_id': job['_id']}, dead, upsert=True)
+        mongo.db.prediction_jobs.delete_one({'_id': job['_id'], 'lease_owner': worker_id})
+        PREDICTION_JOBS_TOTAL.inc(outcome='dead')
+        logger.error("Job dự đoán chuyển sang dead letter", extra={'fields': {
+            'measurement_id': job['_id'], 'meter_id': job['meter_id'], 'attempts': job['attempts'], 'error': error
+        }})
+        return
+
+    mongo.db.prediction_jobs.update_one(
+        {'_id': job['_id'], 'lease_owner': worker_id},
+        {'$set': {
+            'status': JOB_PENDING,
+            'available_at': datetime.utcnow() + timedelta(seconds=retry_delay(job['attempts'])),
+            'last_error': error,
+        }, '$unset': {'lease_owner': '', 'lease_expires_at': ''}}
+    )
+    PREDICTION_JOBS_TOTAL.inc(outcome='retry')
+
+
+# Cập nhật đi kèm mỗi prediction mới. Rollup và sketch là $inc nên mỗi cái chỉ được chạy một lần cho một bản ghi đo:
+# prediction được ghi kèm danh sách pending_effects, xoá đi khi xong; lỗi giữa chừng thì chỉ giữ lại phần chưa chạy
+# để lần chạy lại của job làm tiếp
+PREDICTION_EFFECTS = ('status', 'sketch', 'rollup')
+
+
+def prediction_effects(job, is_anomaly, reconstruction_error):
+    def sketch():
+        # Sai số 0 là kết quả dự phòng (thiếu dữ liệu), không đưa vào phân bố sai số
+        if reconstruction_error > 0:
+            record_error(job['meter_id'], reconstruction_error)
+
+    return {
+        'status': lambda: meter_status.record_prediction_status(
+            job['meter_id'], job.get('branch_id'), job['measurement_time'], is_anomaly),
+        'sketch': sketch,
+        'rollup': lambda: rollups.record_prediction(
+            job['meter_id'], job.get('branch_id'), job['measurement_time'], is_anomaly),
+    }
+
+
+def apply_effects(job, effects, pending):
+    done = []
+    try:
+        for name in pending:
+            effects[name]()
+            done.append(name)
+    finally:
+        remaining = [name for name in pending if name not in done]
+        predictions.update_one({'measurement_id': job['_id']},
+                               {'$set': {'pending_effects': remaining}} if remaining
+                               else {'$unset': {'pending_effects': ''}})
+
+
+def write_prediction(job, result, p_id):
+    is_anomaly, confidence, reconstruction_error, threshold = result
+    predicted_label = Prediction.LABEL_LEAK if is_anomaly else Prediction.LABEL_NORMAL
+    new_prediction = {
+        'p_id': p_id,
+        'meter_id': job['meter_id'],
+        'measurement_id': job['_id'],
+        'model_id': MLConfig.MODEL_ID,
+        'prediction_time': job['measurement_time'],
+        'prediction_threshold': threshold,
+        'predicted_label': predicted_label,
+        'label_code': Prediction.LABEL_CODE_LEAK if is_anomaly else Prediction.LABEL_CODE_NORMAL,
+        'confidence': confidence,
+        'recorded_instant_flow': job['flow_rate'],
+        'pending_effects': list(PREDICTION_EFFECTS),
+    }
+
+    with PREDICTION_STAGE_SECONDS.time(stage='write'):
+        result = predictions.update_one({'measurement_id': job['_id']}, {'$setOnInsert': new_prediction}, upsert=True)
+        if result.upserted_id is None:
+            # Job chạy lại sau khi đã ghi prediction: chỉ chạy các cập nhật còn thiếu, theo prediction đã lưu
+            new_prediction = predictions.find_one({'measurement_id': job['_id']}, {'_id': 0})
+            if not new_prediction.get('pending_effects'):
+                return None
+            is_anomaly = new_prediction['label_code'] == Prediction.LABEL_CODE_LEAK
+        apply_effects(job, prediction_effects(job, is_anomaly, reconstruction_error), new_prediction['pending_effects'])
+    new_prediction.pop('pending_effects')
+    return new_prediction
+
+
+def process_jobs(jobs, worker_id):
+    try:
+        started = time.perf_counter()
+        results, windows, scoring_seconds = inference.predict_with_windows(
+            [(job['meter_id'], job['flow_rate'], job.get('pressure')) for job in jobs])
+        # Có cửa sổ (suy luận cục bộ): shadow so sánh thời gian chấm điểm; không có thì so sánh thời gian cả lô
+        seconds = scoring_seconds if windows is not None else time.perf_counter() - started
+        seconds_per_item = seconds / len(jobs)
+        # Cấp p_id cho cả lô trong một lần $inc; id của job đã có prediction sẽ bị bỏ trống
+        p_ids = predictions.reserve_ids(len(jobs))
+    except Exception as e:
+        logger.exception("Lỗi khi dự đoán lô %s job", len(jobs))
+        for job in jobs:
+            fail_job(job, worker_id, repr(e))
+        return
+
+    written = []
+    for index, (job, result, p_id) in enumerate(zip(jobs, results, p_ids)):
+        if isinstance(result, PredictionFailure):
+            # Không chấm điểm được (vd. MongoDB hoặc mô hình lỗi): thử lại job thay vì ghi kết quả dự phòng
+            fail_job(job, worker_id, result.error)
+            continue
+        try:
+            prediction = write_prediction(job, result, p_id)
+            if prediction is not None:
+                written.append((job, result, prediction, windows[index] if windows is not None else None))
+            complete_job(job, worker_id)
+        except Exception as e:
+            logger.exception("Lỗi khi ghi prediction cho bản ghi đo %s", job['_id'])
+            fail_job(job, worker_id, repr(e))
+    if not written:
+        return
+    # Cảnh báo cho cả lô trong một lần ghi; job đã hoàn tất nên lỗi ở đây chỉ được ghi log
+    try:
+        with PREDICTION_STAGE_SECONDS.time(stage='alerts'):
+            record_alerts([dict(prediction, branch_id=job.get('branch_id')) for job, _, prediction, _ in written])
+    except Exception:
+        logger.exception("Lỗi khi cập nhật cảnh báo cho lô %s prediction", len(written))
+    # Sau khi prediction chính đã ghi xong; chỉ đưa vào hàng đợi, không chờ mô hình ứng viên
+    submit_shadow([(job, result, window) for job, result, _, window in written], seconds_per_item)
+
+
+def update_backlog():
+    PREDICTION_BACKLOG.set(mongo.db.prediction_jobs.count_documents({}))
+
+
+def worker_loop(worker_id, stop):
+    while not stop.is_set():
+        try:
+            jobs = lease_jobs(worker_id, Config.PREDICTION_JOB_BATCH_SIZE)
+            if jobs:
+                process_jobs(jobs, worker_id)
+                continue
+            update_backlog()
+        except Exception:
+            logger.exception("Lỗi trong vòng lặp worker %s", worker_id)
+        # Không có việc: chờ enqueue trong cùng process đánh thức hoặc tới kỳ poll tiếp theo
+        _wake.wait(Config.PREDICTION_JOB_POLL_SECONDS)
+        _wake.clear()
+
+
+def start_prediction_workers(threads=None):
+    # Gọi lại sau fork (gunicorn) sẽ tạo luồng mới cho process con
+    global _workers_pid
+    threads = Config.PREDICTION_WORKER_THREADS if threads is None else threads
+    with _workers_lock:
+        if _workers_pid == os.getpid() or threads <= 0:
+            return _workers
+        ensure_indexes()
+        _workers.clear()
+        _workers_pid = os.getpid()
+        for index in range(threads):
+            stop = threading.Event()
+            worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+            thread = threading.Thread(target=worker_loop, args=(worker_id, stop), name=f"prediction-worker-{index}", daemon=True)
+            thread.start()
+            _workers.append((thread, stop))
+        start_shadow_worker()
+    return _workers
+
+
+def stop_prediction_workers(timeout=5):
+    global _workers_pid
+    with _workers_lock:
+        for _, stop in _workers:
+            stop.set()
+        _wake.set()
+        for thread, _ in _workers:
+            thread.join(timeout)
+        _workers.clear()
+        _workers_pid = None
+        stop_shadow_worker()
+
+
+def job_stats():
+    now = datetime.utcnow()
+    return {
+        'pending': mongo.db.prediction_jobs.count_documents({'status': JOB_PENDING}),
+        'delayed': mongo.db.prediction_jobs.count_documents({'status': JOB_PENDING, 'available_at': {'$gt': now}}),
+        'leased': mongo.db.prediction_jobs.count_documents({'status': JOB_LEASED}),
+        'dead': mongo.db.prediction_dead_letters.count_documents({}),
+    }
+
+
+def list_dead_letters(limit=100):
+    return list(mongo.db.prediction_dead_letters.find({}).sort('failed_at', -1).limit(limit))
+
+
+def requeue_dead_letters(measurement_ids=None):
+    query = {'_id': {'$in': measurement_ids}} if measurement_ids else {}
+    requeued = 0
+    for dead in mongo.db.prediction_dead_letters.find(query):
+        job = new_prediction_job(dead['_id'], dead['meter_id'], dead.get('branch_id'),
+                                 dead['flow_rate'], dead['measurement_time'], dead.get('pressure'))
+        mongo.db.prediction_jobs.replace_one({'_id': job['_id']}, job, upsert=True)
+        mongo.db.prediction_dead_letters.delete_one({'_id': dead['_id']})
+        requeued += 1
+    if requeued:
+        notify_workers()
+    return requeued
+
+
+if __name__ == "__main__":
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description="Chạy worker xử lý hàng đợi dự đoán (prediction_jobs)")
+    parser.add_argument('--threads', type=int, default=Config.PREDICTION_WORKER_THREADS)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        start_prediction_workers(max(args.threads, 1))
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            stop_prediction_workers()
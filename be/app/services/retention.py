@@ -0,0 +1,202 @@
+import os
+import re
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+from app.database import mongo
+from app.config import Config
+from app.services.datasets import DATASETS, dataset_projection, dataset_sort, parquet_schema, batch_to_table
+from app.services.rollups import bucket_start, backfill_rollups
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+RETENTION_BATCH_SIZE = 5000
+# Trường đếm số dòng gốc của mỗi bộ dữ liệu trên rollup
+ROLLUP_COUNTERS = {'measurements': 'flow_count', 'predictions': 'prediction_count'}
+# Tên thư mục archive của một tháng; tháng nhận từ người dùng phải khớp đúng mẫu này (không cho đường dẫn lạ)
+MONTH_PATTERN = re.compile(r'\d{4}-\d{2}')
+
+
+def retention_policies():
+    return {
+        'measurements': Config.MEASUREMENT_RETENTION_DAYS,
+        'predictions': Config.PREDICTION_RETENTION_DAYS,
+    }
+
+def retention_cutoff(days, now=None):
+    # Làm tròn về đầu tháng: chỉ xoá trọn tháng để rollup của các tháng đã xoá không bao giờ phải tính lại
+    now = now or datetime.now()
+    return bucket_start(now - timedelta(days=days), 'monthly')
+
+def next_month(month_start):
+    month = datetime.fromisoformat(month_start)
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1).isoformat()
+
+
+def archive_dir(dataset_name, month):
+    # month: YYYY-MM hoặc thời điểm đầu tháng dạng ISO
+    if not MONTH_PATTERN.fullmatch(month[:7]):
+        raise ValueError(f"Invalid month: {month}")
+    return os.path.join(Config.ARCHIVE_DIR, dataset_name, month[:7])
+
+def months_before(dataset, cutoff):
+    time_field = dataset['time_field']
+    return sorted(doc['_id'] for doc in mongo.db[dataset['collection']].aggregate([
+        {'$match': {time_field: {'$lt': cutoff}}},
+        {'$group': {'_id': {'$concat': [{'$substrBytes': [f'${time_field}', 0, 7]}, '-01T00:00:00']}}}
+    ]))
+
+def rollups_cover_month(dataset_name, month):
+    # Mọi đồng hồ có dữ liệu gốc trong tháng phải có rollup tháng đếm đủ số dòng đó: ghi rollup lúc ingest lỗi
+    # chỉ được ghi log, nên một đồng hồ có thể thiếu rollup dù các đồng hồ khác đã có
+    dataset = DATASETS[dataset_name]
+    counter = ROLLUP_COUNTERS[dataset_name]
+    raw_counts = {doc['_id']: doc['count'] for doc in mongo.db[dataset['collection']].aggregate([
+        {'$match': {dataset['time_field']: {'$gte': month, '$lt': next_month(month)}}},
+        {'$group': {'_id': '$meter_id', 'count': {'$sum': 1}}}
+    ])}
+    rolled_counts = {doc['meter_id']: doc.get(counter, 0) for doc in mongo.db.meter_rollups.find(
+        {'resolution': 'monthly', 'bucket': month, 'meter_id': {'$in': list(raw_counts)}},
+        {'_id': 0, 'meter_id': 1, counter: 1}
+    )}
+    return all(rolled_counts.get(meter_id, 0) >= count for meter_id, count in raw_counts.items())
+
+def ensure_compacted(dataset_name, month):
+    if not rollups_cover_month(dataset_name, month):
+        backfill_rollups(since=month)
+
+def archive_month(dataset_name, month):
+    # Ghi toàn bộ dữ liệu của một tháng ra một tệp Parquet nén, trả về (số dòng, bộ lọc đúng các dòng đã lưu).
+    # Chỉ lấy dòng có khoá không lớn hơn khoá lớn nhất lúc bắt đầu: dòng đến muộn được lưu ở lần chạy sau
+    dataset = DATASETS[dataset_name]
+    collection = mongo.db[dataset['collection']]
+    last = collection.find_one({}, {'_id': 0, dataset['sort_key']: 1}, sort=[(dataset['sort_key'], -1)])
+    month_filter = {dataset['time_field']: {'$gte': month, '$lt': next_month(month)}}
+    if last is None:
+        return 0, month_filter
+    month_filter[dataset['sort_key']] = {'$lte': last[dataset['sort_key']]}
+    cursor = (collection
+              .find(month_filter, dataset_projection(dataset))
+              .sort(dataset_sort(dataset))
+              .batch_size(RETENTION_BATCH_SIZE))
+
+    target_dir = archive_dir(dataset_name, month)
+    os.makedirs(target_dir, exist_ok=True)
+    path = os.path.join(target_dir, f"part-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.parquet")
+    tmp_path = path + '.tmp'
+
+    schema = parquet_schema(dataset)
+    rows = 0
+    with pq.ParquetWriter(tmp_path, schema, compression=Config.ARCHIVE_COMPRESSION) as writer:
+        batch = []
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= RETENTION_BATCH_SIZE:
+                writer.write_table(batch_to_table(dataset, batch, schema))
+                rows += len(batch)
+                batch = []
+        if batch:
+            writer.write_table(batch_to_table(dataset, batch, schema))
+            rows += len(batch)
+
+    if rows:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+    return rows, month_filter
+
+def apply_retention(dataset_name, days, now=None, dry_run=False):
+    dataset = DATASETS[dataset_name]
+    cutoff = retention_cutoff(days, now)
+    months = months_before(dataset, cutoff)
+    result = {'cutoff': cutoff, 'months': [month[:7] for month in months], 'archived': 0, 'deleted': 0}
+    if dry_run or not months:
+        return result
+
+    for month in months:
+        ensure_compacted(dataset_name, month)
+        rows, month_filter = archive_month(dataset_name, month)
+        if not rows:
+            continue
+        # Chỉ xoá những dòng đã nằm trong tệp archive; dòng đến muộn sẽ được lưu ở lần chạy sau
+        deleted = mongo.db[dataset['collection']].delete_many(month_filter).deleted_count
+        result['archived'] += rows
+        result['deleted'] += deleted
+
+    mongo.db.retention_state.update_one(
+        {'_id': dataset_name},
+        {'$max': {'pruned_before': cutoff}, '$set': {'last_run': datetime.utcnow().isoformat()}},
+        upsert=True
+    )
+    return result
+
+def run_retention(now=None, dry_run=False):
+    if pq is None:
+        raise RuntimeError("Archiving requires pyarrow")
+    results = {}
+    for dataset_name, days in retention_policies().items():
+        if days > 0:
+            results[dataset_name] = apply_retention(dataset_name, days, now, dry_run)
+    return results
+
+
+def list_archives():
+    archives = []
+    for dataset_name in DATASETS:
+        dataset_root = os.path.join(Config.ARCHIVE_DIR, dataset_name)
+        if not os.path.isdir(dataset_root):
+            continue
+        for month in sorted(os.listdir(dataset_root)):
+            files = [name for name in os.listdir(os.path.join(dataset_root, month)) if name.endswith('.parquet')]
+            archives.append({
+                'dataset': dataset_name,
+                'month': month,
+                'files': len(files),
+                'size_bytes': sum(os.path.getsize(os.path.join(dataset_root, month, name)) for name in files)
+            })
+    return archives
+
+def restored_row(dataset, row):
+    sparse_fields = dataset.get('sparse_fields', ())
+    return {field: value for field, value in row.items() if value is not None or field not in sparse_fields}
+
+def restore_archive(dataset_name, month):
+    # Đưa dữ liệu của một tháng từ archive trở lại MongoDB (ghi đè theo khoá, chạy lại nhiều lần không bị trùng)
+    if pq is None:
+        raise RuntimeError("Restoring archives requires pyarrow")
+    if not MONTH_PATTERN.fullmatch(month):
+        raise ValueError(f"Invalid month, expected YYYY-MM: {month}")
+    dataset = DATASETS[dataset_name]
+    target_dir = archive_dir(dataset_name, month)
+    if not os.path.isdir(target_dir):
+        raise FileNotFoundError(f"No archive for {dataset_name} {month}")
+
+    restored = 0
+    for name in sorted(os.listdir(target_dir)):
+        if not name.endswith('.parquet'):
+            continue
+        for record_batch in pq.ParquetFile(os.path.join(target_dir, name)).iter_batches(batch_size=RETENTION_BATCH_SIZE):
+            ops = [ReplaceOne({dataset['sort_key']: row[dataset['sort_key']]}, restored_row(dataset, row), upsert=True)
+                   for row in record_batch.to_pylist()]
+            if ops:
+                mongo.db[dataset['collection']].bulk_write(ops, ordered=False)
+                restored += len(ops)
+    return restored
+
+
+if __name__ == "__main__":
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Archive and prune raw measurements/predictions past their retention period')
+    parser.add_argument('--dry-run', action='store_true', help='Chỉ liệt kê các tháng sẽ bị lưu trữ và xoá')
+    parser.add_argument('--restore', nargs=2, metavar=('DATASET', 'MONTH'), help='Khôi phục một tháng (vd: measurements 2025-01)')
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        if args.restore:
+            print(restore_archive(*args.restore))
+        else:
+            print(run_retention(dry_run=args.dry_run))
@@ -0,0 +1,217 @@
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from app.database import mongo
+from app.config import Config
+from app.models import Prediction
+
+# Độ dài tiền tố chuỗi ISO 8601 giữ lại cho mỗi độ phân giải và phần đuôi để tạo thời điểm đầu bucket
+RESOLUTIONS = {
+    'hourly': (13, ':00:00'),
+    'daily': (10, 'T00:00:00'),
+    'monthly': (7, '-01T00:00:00'),
+}
+SCOPES = {
+    'meter': ('meter_rollups', 'meter_id'),
+    'branch': ('branch_rollups', 'branch_id'),
+}
+ROLLUP_WRITE_BATCH = 1000
+
+
+def to_time_string(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def bucket_start(time_value, resolution):
+    length, suffix = RESOLUTIONS[resolution]
+    return to_time_string(time_value)[:length] + suffix
+
+def bucket_expression(time_field, resolution):
+    length, suffix = RESOLUTIONS[resolution]
+    return {'$concat': [{'$substrBytes': [f'${time_field}', 0, length]}, suffix]}
+
+def anomaly_expression():
+    return {'$or': [
+        {'$eq': ['$label_code', Prediction.LABEL_CODE_LEAK]},
+        {'$in': ['$predicted_label', Prediction.label_variants(Prediction.LEAK_LABELS)]}
+    ]}
+
+def choose_resolution(start, end):
+    span = end - start
+    if span <= timedelta(days=Config.ROLLUP_HOURLY_MAX_DAYS):
+        return 'hourly'
+    if span <= timedelta(days=Config.ROLLUP_DAILY_MAX_DAYS):
+        return 'daily'
+    return 'monthly'
+
+
+def rollup_update_ops(key_field, key_value, time_value, update):
+    return [
+        UpdateOne({key_field: key_value, 'resolution': resolution, 'bucket': bucket_start(time_value, resolution)},
+                  update, upsert=True)
+        for resolution in RESOLUTIONS
+    ]
+
+def apply_rollup_update(meter_id, branch_id, time_value, update):
+    mongo.db.meter_rollups.bulk_write(rollup_update_ops('meter_id', meter_id, time_value, update), ordered=False)
+    if branch_id is not None:
+        mongo.db.branch_rollups.bulk_write(rollup_update_ops('branch_id', branch_id, time_value, update), ordered=False)
+
+def measurement_update(instant_flow):
+    flow = float(instant_flow)
+    return {
+        '$min': {'flow_min': flow},
+        '$max': {'flow_max': flow},
+        '$inc': {'flow_sum': flow, 'flow_count': 1}
+    }
+
+def record_measurement(meter_id, branch_id, measurement_time, instant_flow):
+    apply_rollup_update(meter_id, branch_id, measurement_time, measurement_update(instant_flow))
+
+def record_prediction(meter_id, branch_id, prediction_time, is_anomaly):
+    apply_rollup_update(meter_id, branch_id, prediction_time, {
+        '$inc': {'prediction_count': 1, 'anomaly_count': 1 if is_anomaly else 0}
+    })
+
+
+def merge_branch_bucket(branch_buckets, key, values):
+    bucket = branch_buckets.setdefault(key, {})
+    for field, value in values.items():
+        if value is None:
+            continue
+        if field == 'flow_min':
+            bucket[field] = min(bucket.get(field, value), value)
+        elif field == 'flow_max':
+            bucket[field] = max(bucket.get(field, value), value)
+        else:
+            bucket[field] = bucket.get(field, 0) + value
+
+def flush_ops(collection, ops):
+    if ops:
+        mongo.db[collection].bulk_write(ops, ordered=False)
+    return []
+
+def pruned_before(dataset_name):
+    state = mongo.db.retention_state.find_one({'_id': dataset_name})
+    return state.get('pruned_before') if state else None
+
+def backfill_rollups(since=None):
+    # Tính lại toàn bộ rollup từ dữ liệu gốc. Khi có since, mốc được làm tròn về đầu tháng
+    # để mọi bucket (giờ/ngày/tháng) được tính lại trọn vẹn và dữ liệu đã rollup trước đó được giữ nguyên.
+    # Mỗi nguồn (đo, dự đoán) có mốc riêng: không tính lại các tháng đã bị xoá dữ liệu gốc của chính nguồn đó
+    # theo chính sách lưu trữ, và chỉ ghi đè các trường rollup của nguồn đó
+    meter_branches = {
+        meter['meter_id']: meter.get('branch_id')
+        for meter in mongo.db.water_meters.find({}, {'_id': 0, 'meter_id': 1, 'branch_id': 1})
+    }
+
+    written = 0
+    branch_written = 0
+    source_since = {}
+    sources = [
+        ('measurements', 'meter_measurement_data', 'measurement_time', {
+            'flow_min': {'$min': '$instant_flow'},
+            'flow_max': {'$max': '$instant_flow'},
+            'flow_sum': {'$sum': '$instant_flow'},
+            'flow_count': {'$sum': 1}
+        }),
+        ('predictions', 'predictions', 'prediction_time', {
+            'anomaly_count': {'$sum': {'$cond': [anomaly_expression(), 1, 0]}},
+            'prediction_count': {'$sum': 1}
+        }),
+    ]
+    for dataset_name, source, time_field, accumulators in sources:
+        source_start = since
+        watermark = pruned_before(dataset_name)
+        if watermark and (not source_start or to_time_string(source_start) < watermark):
+            source_start = watermark
+        since_bucket = bucket_start(source_start, 'monthly') if source_start else None
+        source_since[dataset_name] = since_bucket
+
+        bucket_filter = {'bucket': {'$gte': since_bucket}} if since_bucket else {}
+        for collection, _ in SCOPES.values():
+            mongo.db[collection].update_many(bucket_filter, {'$unset': {field: '' for field in accumulators}})
+
+        branch_buckets = {}
+        match = {time_field: {'$gte': since_bucket}} if since_bucket else {}
+        for resolution in RESOLUTIONS:
+            pipeline = [
+                {'$match': match},
+                {'$group': dict({'_id': {'meter_id': '$meter_id', 'bucket': bucket_expression(time_field, resolution)}}, **accumulators)}
+            ]
+            ops = []
+            for group in mongo.db[source].aggregate(pipeline, allowDiskUse=True):
+                meter_id = group['_id']['meter_id']
+                bucket = group['_id']['bucket']
+                values = {field: group[field] for field in accumulators}
+                ops.append(UpdateOne(
+                    {'meter_id': meter_id, 'resolution': resolution, 'bucket': bucket},
+                    {'$set': values},
+                    upsert=True
+                ))
+                branch_id = meter_branches.get(meter_id)
+                if branch_id is not None:
+                    merge_branch_bucket(branch_buckets, (branch_id, resolution, bucket), values)
+                written += 1
+                if len(ops) >= ROLLUP_WRITE_BATCH:
+                    ops = flush_ops('meter_rollups', ops)
+            flush_ops('meter_rollups', ops)
+
+        ops = []
+        for (branch_id, resolution, bucket), values in branch_buckets.items():
+            ops.append(UpdateOne(
+                {'branch_id': branch_id, 'resolution': resolution, 'bucket': bucket},
+                {'$set': values},
+                upsert=True
+            ))
+            if len(ops) >= ROLLUP_WRITE_BATCH:
+                ops = flush_ops('branch_rollups', ops)
+        flush_ops('branch_rollups', ops)
+        branch_written += len(branch_buckets)
+
+    # Bucket không còn trường nào của cả hai nguồn
+    empty = {'flow_count': {'$exists': False}, 'prediction_count': {'$exists': False}}
+    if all(source_since.values()):
+        empty['bucket'] = {'$gte': min(source_since.values())}
+    for collection, _ in SCOPES.values():
+        mongo.db[collection].delete_many(empty)
+
+    return {'meter_buckets': written, 'branch_buckets': branch_written,
+            'since': bucket_start(since, 'monthly') if since else None, 'sources': source_since}
+
+
+def format_rollup_point(doc):
+    flow_count = doc.get('flow_count', 0)
+    prediction_count = doc.get('prediction_count', 0)
+    return {
+        'bucket': doc['bucket'],
+        'flow_min': doc.get('flow_min'),
+        'flow_max': doc.get('flow_max'),
+        'flow_mean': doc.get('flow_sum', 0.0) / flow_count if flow_count else None,
+        'flow_count': flow_count,
+        'anomaly_count': doc.get('anomaly_count', 0),
+        'prediction_count': prediction_count,
+        'anomaly_rate': doc.get('anomaly_count', 0) / prediction_count if prediction_count else None
+    }
+
+def get_rollup_series(scope, scope_id, start, end, resolution=None):
+    collection, key_field = SCOPES[scope]
+    resolution = resolution or choose_resolution(start, end)
+    docs = (mongo.db[collection]
+            .find({key_field: scope_id,
+                   'resolution': resolution,
+                   'bucket': {'$gte': bucket_start(start, resolution), '$lte': to_time_string(end)}},
+                  {'_id': 0, 'bucket': 1, 'flow_min': 1, 'flow_max': 1, 'flow_sum': 1, 'flow_count': 1,
+                   'anomaly_count': 1, 'prediction_count': 1})
+            .sort('bucket', 1))
+    return resolution, [format_rollup_point(doc) for doc in docs]
+
+
+if __name__ == "__main__":
+    import argparse
+    from app import create_app
+
+    parser = argparse.ArgumentParser(description='Backfill meter/branch rollups from raw measurements and predictions')
+    parser.add_argument('--since', help='Chỉ tính lại từ thời điểm này (ISO 8601, làm tròn về đầu tháng)')
+    args = parser.parse_args()
+
+    with create_app().app_context():
+        print(backfill_rollups(args.since))
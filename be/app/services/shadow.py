@@ -0,0 +1,213 @@
+import os
+import queue
+import random
+import threading
+from datetime import datetime
+import numpy as np
+from pymongo.errors import BulkWriteError
+from app.database import mongo
+from app.logging_utils import get_logger
+from app.metrics import SHADOW_PREDICTIONS_TOTAL
+from app.ml.config import MLConfig
+from app.ml.inference import PredictionFailure
+
+logger = get_logger(__name__)
+
+LATENCY_SAMPLE_SIZE = 10000
+
+# Shadow: sau khi mô hình chính đã ghi prediction, một phần bản ghi (SHADOW_SAMPLE_RATE) được đưa vào hàng đợi có giới hạn
+# và do một luồng riêng chấm điểm bằng mô hình ứng viên (SHADOW_MODEL_ID). Hàng đợi đầy thì bỏ mẫu, không chặn
+# đường dự đoán chính. Kết quả hai mô hình được lưu cạnh nhau trong shadow_predictions để so sánh offline.
+# Không chạy khi INFERENCE_MODE=remote (process API không nạp torch).
+_queue = queue.Queue(maxsize=MLConfig.SHADOW_QUEUE_SIZE)
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def shadow_enabled():
+    return MLConfig.SHADOW_MODEL_ID > 0 and MLConfig.SHADOW_SAMPLE_RATE > 0
+
+
+def shadow_running():
+    # Luồng không còn sau fork: chỉ tính luồng được tạo trong chính process này
+    return _worker is not None and _worker[2] == os.getpid()
+
+
+def submit_shadow(items, seconds_per_item):
+    # items: (job, kết quả mô hình chính, cửa sổ đầu vào của mô hình chính hoặc None)
+    if not shadow_running():
+        return
+    for job, result, window in items:
+        if random.random() >= MLConfig.SHADOW_SAMPLE_RATE:
+            continue
+        try:
+            _queue.put_nowait((job, result, window, seconds_per_item))
+        except queue.Full:
+            SHADOW_PREDICTIONS_TOTAL.inc(outcome='dropped')
+
+
+def result_fields(result, latency):
+    is_anomaly, confidence, reconstruction_error, threshold = result
+    return {
+        'is_anomaly': bool(is_anomaly),
+        'confidence': float(confidence),
+        'reconstruction_error': float(reconstruction_error),
+        'threshold': float(threshold),
+        'latency_ms': latency * 1000,
+    }
+
+
+def score_batch(candidate, items):
+    # Tải trước để mô hình chưa đăng ký báo lỗi cho cả lô, thay vì ghi kết quả dự phòng cho từng bản ghi
+    if candidate.model is None:
+        candidate.load_model()
+    # Dùng lại cửa sổ của mô hình chính khi cùng đặc trưng/seq_len (không đọc lại MongoDB), cả lô một lượt forward.
+    # Độ trễ hai bên cùng cách đo như process_jobs: thời gian chấm điểm của lô chia đều cho số bản ghi
+    candidate_results, _, scoring_seconds = candidate.predict_windows(
+        [(job['meter_id'], job['flow_rate'], job.get('pressure')) for job, _, _, _ in items],
+        [window for _, _, window, _ in items])
+    candidate_seconds = scoring_seconds / len(items)
+    documents, failed = [], 0
+    for (job, primary_result, _, primary_seconds), candidate_result in zip(items, candidate_results):
+        if isinstance(candidate_result, PredictionFailure):
+            failed += 1
+            continue
+        primary = result_fields(primary_result, primary_seconds)
+        shadow = result_fields(candidate_result, candidate_seconds)
+        documents.append({
+            'measurement_id': job['_id'],
+            'meter_id': job['meter_id'],
+            'measurement_time': job['measurement_time'],
+            'flow_rate': job['flow_rate'],
+            'primary_model_id': MLConfig.MODEL_ID,
+            'candidate_model_id': candidate.model_id,
+            'primary': primary,
+            'candidate': shadow,
+            'agree': primary['is_anomaly'] == shadow['is_anomaly'],
+            'created_at': datetime.utcnow(),
+        })
+    if failed:
+        SHADOW_PREDICTIONS_TOTAL.inc(failed, outcome='error')
+    if not documents:
+        return
+    try:
+        mongo.db.shadow_predictions.insert_many(documents, ordered=False)
+    except BulkWriteError:
+        # Bản ghi đo đã được chấm bởi ứng viên này (job chạy lại): bỏ qua bản trùng
+        pass
+    SHADOW_PREDICTIONS_TOTAL.inc(len(documents), outcome='recorded')
+
+
+def shadow_loop(stop):
+    from app.ml.predict import ShadowPredictor
+
+    candidate = ShadowPredictor(MLConfig.SHADOW_MODEL_ID)
+    while not stop.is_set():
+        try:
+            items = [_queue.get(timeout=1)]
+        except queue.Empty:
+            continue
+        while len(items) < MLConfig.SHADOW_BATCH_SIZE:
+            try:
+                items.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            score_batch(candidate, items)
+        except Exception:
+            SHADOW_PREDICTIONS_TOTAL.inc(len(items), outcome='error')
+            logger.exception("Lỗi khi chấm điểm shadow với mô hình %s", MLConfig.SHADOW_MODEL_ID)
+
+
+def start_shadow_worker():
+    global _worker
+    with _worker_lock:
+        if not shadow_enabled() or shadow_running():
+            return _worker
+        if MLConfig.INFERENCE_MODE == 'remote':
+            # Mô hình ứng viên sẽ phải nạp torch trong chính process API/worker, trái với mục đích của chế độ remote
+            logger.warning("Shadow không chạy khi INFERENCE_MODE=remote: bỏ qua SHADOW_MODEL_ID", extra={'fields': {
+                'candidate_model_id': MLConfig.SHADOW_MODEL_ID}})
+            return None
+        stop = threading.Event()
+        thread = threading.Thread(target=shadow_loop, args=(stop,), name="shadow-worker", daemon=True)
+        thread.start()
+        _worker = (thread, stop, os.getpid())
+        logger.info("Bật shadow cho mô hình ứng viên", extra={'fields': {
+            'candidate_model_id': MLConfig.SHADOW_MODEL_ID, 'sample_rate': MLConfig.SHADOW_SAMPLE_RATE
+        }})
+        return _worker
+
+
+def stop_shadow_worker(timeout=5):
+    global _worker
+    with _worker_lock:
+        if not shadow_running():
+            return
+        thread, stop, _ = _worker
+        stop.set()
+        thread.join(timeout)
+        _worker = None
+
+
+def flag_sum(condition):
+    return {'$sum': {'$cond': [condition, 1, 0]}}
+
+
+def shadow_report(candidate_model_id=None, start_time=None, end_time=None, top_meters=10):
+    candidate_model_id = candidate_model_id or MLConfig.SHADOW_MODEL_ID
+    match = {'candidate_model_id': candidate_model_id}
+    if start_time or end_time:
+        match['measurement_time'] = {}
+        if start_time:
+            match['measurement_time']['$gte'] = start_time
+        if end_time:
+            match['measurement_time']['$lte'] = end_time
+
+    summary = list(mongo.db.shadow_predictions.aggregate([
+        {'$match': match},
+        {'$group': {
+            '_id': None,
+            'count': {'$sum': 1},
+            'agree': flag_sum('$agree'),
+            'primary_anomalies': flag_sum('$primary.is_anomaly'),
+            'candidate_anomalies': flag_sum('$candidate.is_anomaly'),
+            'both_anomalies': flag_sum({'$and': ['$primary.is_anomaly', '$candidate.is_anomaly']}),
+            'primary_mean_error': {'$avg': '$primary.reconstruction_error'},
+            'candidate_mean_error': {'$avg': '$candidate.reconstruction_error'},
+        }}
+    ]))
+    if not summary or not summary[0]['count']:
+        return {'candidate_model_id': candidate_model_id, 'count': 0}
+    report = summary[0]
+    report.pop('_id')
+    report['candidate_model_id'] = candidate_model_id
+    report['agreement_rate'] = report['agree'] / report['count']
+    # Cảnh báo chỉ một bên đưa ra: mô hình ứng viên bỏ sót (primary_only) hoặc báo thêm (candidate_only)
+    report['primary_only'] = report['primary_anomalies'] - report['both_anomalies']
+    report['candidate_only'] = report['candidate_anomalies'] - report['both_anomalies']
+
+    # Phân vị độ trễ tính trên tối đa LATENCY_SAMPLE_SIZE bản ghi mới nhất (theo chỉ mục candidate_model_id,
+    # measurement_time), không kéo toàn bộ shadow_predictions về Python
+    latencies = list(mongo.db.shadow_predictions
+                     .find(match, {'_id': 0, 'primary.latency_ms': 1, 'candidate.latency_ms': 1})
+                     .sort('measurement_time', -1)
+                     .limit(LATENCY_SAMPLE_SIZE))
+    report['latency_sample'] = len(latencies)
+    for side in ('primary', 'candidate'):
+        values = np.array([doc[side]['latency_ms'] for doc in latencies])
+        report[f'{side}_latency_ms'] = {
+            'p50': float(np.percentile(values, 50)),
+            'p95': float(np.percentile(values, 95)),
+            'p99': float(np.percentile(values, 99)),
+        }
+
+    report['meters'] = list(mongo.db.shadow_predictions.aggregate([
+        {'$match': match},
+        {'$group': {'_id': '$meter_id', 'count': {'$sum': 1}, 'disagreements': {'$sum': {'$cond': ['$agree', 0, 1]}}}},
+        {'$match': {'disagreements': {'$gt': 0}}},
+        {'$sort': {'disagreements': -1}},
+        {'$limit': top_meters},
+        {'$project': {'_id': 0, 'meter_id': '$_id', 'count': 1, 'disagreements': 1}},
+    ]))
+    return report
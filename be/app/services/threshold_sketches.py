@@ -0,0 +1,162 @@
+import math
+import time
+import numpy as np
+from pymongo.errors import DuplicateKeyError
+from app.database import mongo
+from app.logging_utils import get_logger
+from app.ml.config import MLConfig
+
+logger = get_logger(__name__)
+
+# Sketch phân vị của sai số tái tạo cho mỗi đồng hồ (kiểu DDSketch): bucket theo thang log nên phân vị có sai số
+# tương đối ≤ THRESHOLD_SKETCH_ACCURACY, lưu gọn dạng {chỉ số bucket: trọng số} trong collection threshold_sketches.
+# Suy giảm theo thời gian dùng forward decay: điểm mới có trọng số 2^((t - landmark) / half_life), phân vị không đổi khi
+# mọi trọng số cùng nhân một hằng số nên mỗi lần cập nhật chỉ là một $inc, không phải nhân lại các bucket cũ.
+MIN_VALUE = 1e-9
+# Khi trọng số điểm mới vượt 2^MAX_EXPONENT thì chia lại toàn bộ bucket và dời landmark
+MAX_EXPONENT = 60
+MAX_ATTEMPTS = 3
+
+# meter_id -> landmark của sketch đang lưu, tránh đọc lại tài liệu trước mỗi lần $inc
+_landmarks = {}
+
+
+class ErrorSketch:
+    def __init__(self, accuracy, half_life_seconds=0):
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.half_life = half_life_seconds
+
+    def bucket(self, value):
+        if value <= MIN_VALUE:
+            return None
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def bucket_value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def weight(self, landmark, now):
+        if not self.half_life:
+            return 1.0
+        return 2.0 ** ((now - landmark) / self.half_life)
+
+    def needs_rescale(self, landmark, now):
+        return bool(self.half_life) and (now - landmark) / self.half_life > MAX_EXPONENT
+
+    def count(self, doc, now):
+        # Số điểm hiệu dụng (đã suy giảm) quy về thời điểm now
+        total = doc.get('zero', 0.0) + sum(doc.get('buckets', {}).values())
+        return total / self.weight(doc['landmark'], now)
+
+    def quantile(self, doc, q):
+        buckets = doc.get('buckets', {})
+        zero = doc.get('zero', 0.0)
+        total = zero + sum(buckets.values())
+        if total <= 0:
+            return None
+        rank = q * total
+        if rank <= zero:
+            return 0.0
+        cumulative = zero
+        indices = sorted(int(index) for index in buckets)
+        for index in indices:
+            cumulative += buckets[str(index)]
+            if cumulative >= rank:
+                return self.bucket_value(index)
+        return self.bucket_value(indices[-1])
+
+    def histogram(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > MIN_VALUE]
+        indices, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64), return_counts=True)
+        buckets = {str(int(index)): float(count) for index, count in zip(indices, counts)}
+        return buckets, float(len(values) - len(positive))
+
+
+def current_sketch():
+    return ErrorSketch(MLConfig.THRESHOLD_SKETCH_ACCURACY, MLConfig.THRESHOLD_SKETCH_HALF_LIFE_HOURS * 3600)
+
+
+def load_landmark(meter_id, sketch, now):
+    doc = mongo.db.threshold_sketches.find_one({'_id': meter_id}, {'landmark': 1, 'accuracy': 1})
+    if doc is None:
+        return now
+    if doc.get('accuracy') != sketch.accuracy:
+        # Đổi độ chính xác thì chỉ số bucket cũ không còn ý nghĩa: bắt đầu lại sketch
+        mongo.db.threshold_sketches.delete_one({'_id': meter_id, 'accuracy': doc.get('accuracy')})
+        return now
+    return doc['landmark']
+
+
+def rescale(meter_id, sketch, now):
+    doc = mongo.db.threshold_sketches.find_one({'_id': meter_id})
+    if doc is None:
+        return
+    factor = sketch.weight(doc['landmark'], now)
+    buckets = {index: weight / factor for index, weight in doc.get('buckets', {}).items() if weight / factor > 1e-12}
+    # Ghi có điều kiện theo version: có $inc chen vào giữa thì bỏ, lần record sau sẽ thử lại
+    mongo.db.threshold_sketches.update_one(
+        {'_id': meter_id, 'version': doc.get('version', 0)},
+        {'$set': {'buckets': buckets, 'zero': doc.get('zero', 0.0) / factor, 'landmark': now},
+         '$inc': {'version': 1}}
+    )
+
+
+def record_error(meter_id, value, now=None):
+    now = time.time() if now is None else now
+    sketch = current_sketch()
+    index = sketch.bucket(value)
+    field = 'zero' if index is None else f'buckets.{index}'
+    for _ in range(MAX_ATTEMPTS):
+        landmark = _landmarks.get(meter_id)
+        if landmark is None:
+            landmark = load_landmark(meter_id, sketch, now)
+        if sketch.needs_rescale(landmark, now):
+            rescale(meter_id, sketch, now)
+            _landmarks.pop(meter_id, None)
+            continue
+        try:
+            # Lọc theo landmark: sketch đã bị dời landmark/seed lại thì upsert trùng _id, đọc lại landmark rồi thử lại
+            mongo.db.threshold_sketches.update_one(
+                {'_id': meter_id, 'landmark': landmark, 'accuracy': sketch.accuracy},
+                {'$inc': {field: sketch.weight(landmark, now), 'version': 1},
+                 '$set': {'updated_at': now}},
+                upsert=True
+            )
+            _landmarks[meter_id] = landmark
+            return True
+        except DuplicateKeyError:
+            _landmarks.pop(meter_id, None)
+    logger.warning("Không cập nhật được sketch ngưỡng cho đồng hồ %s", meter_id)
+    return False
+
+
+def seed_sketch(meter_id, values, now=None):
+    # Thay sketch bằng phân bố sai số vừa tính lại từ lịch sử
+    now = time.time() if now is None else now
+    sketch = current_sketch()
+    buckets, zero = sketch.histogram(values)
+    doc = mongo.db.threshold_sketches.find_one({'_id': meter_id}, {'version': 1})
+    mongo.db.threshold_sketches.replace_one({'_id': meter_id}, {
+        '_id': meter_id,
+        'accuracy': sketch.accuracy,
+        'landmark': now,
+        'buckets': buckets,
+        'zero': zero,
+        'version': (doc or {}).get('version', 0) + 1,
+        'updated_at': now,
+    }, upsert=True)
+    _landmarks.pop(meter_id, None)
+
+
+def sketch_threshold(meter_id, percentile, now=None):
+    # None khi chưa có sketch hoặc còn quá ít điểm: nơi gọi tính lại từ lịch sử
+    now = time.time() if now is None else now
+    sketch = current_sketch()
+    doc = mongo.db.threshold_sketches.find_one({'_id': meter_id})
+    if doc is None or doc.get('accuracy') != sketch.accuracy:
+        return None
+    if sketch.count(doc, now) < MLConfig.THRESHOLD_SKETCH_MIN_COUNT:
+        return None
+    return sketch.quantile(doc, percentile / 100.0)
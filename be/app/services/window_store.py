@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+import numpy as np
+from app.config import Config
+from app.database import mongo
+from app.logging_utils import get_logger
+from app.repositories import meters
+from app.repositories.measurements import feature_value
+from app.services.rollups import to_time_string
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = get_logger(__name__)
+
+# Bộ đệm cục bộ các chuỗi đo của từng đồng hồ cho việc tính ngưỡng/chấm điểm lại hàng loạt:
+#   <meter_id>.f32  giá trị đặc trưng float32 (số điểm x số đặc trưng), theo thứ tự thời gian
+#   <meter_id>.t64  thời điểm đo (giây kể từ epoch UTC, int64)
+#   <meter_id>.json số điểm hợp lệ, danh sách đặc trưng và mốc high-water (measurement_time lớn nhất đã đọc)
+# Giá trị thiếu được lưu là NaN. Thời điểm có múi giờ được quy về UTC để so sánh được với thời điểm không kèm múi giờ.
+# Mỗi lần refresh chỉ đọc các bản ghi mới hơn mốc high-water (dùng chỉ mục meter_id, measurement_time); tệp được đọc
+# qua memmap nên không sao chép. Bản ghi đến trễ với thời điểm cũ hơn mốc sẽ không được thêm: dùng --rebuild.
+REFRESH_BATCH_SIZE = 10000
+
+
+def time_seconds(value):
+    # Giây kể từ epoch (UTC) của một thời điểm (chuỗi ISO hoặc datetime), chuẩn hoá qua to_time_string như rollups
+    moment = datetime.fromisoformat(to_time_string(value))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(np.datetime64(moment, 's').astype(np.int64))
+
+
+def meter_paths(meter_id):
+    base = os.path.join(Config.WINDOW_STORE_DIR, str(meter_id))
+    return f"{base}.f32", f"{base}.t64", f"{base}.json"
+
+
+def load_meta(meta_path):
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def write_meta(meta_path, meta):
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(meta, file)
+    os.replace(tmp_path, meta_path)
+
+
+class MeterLock:
+    # Khoá theo tệp để nhiều process (worker gunicorn, inference server) không cùng ghi một đồng hồ
+    def __init__(self, meta_path):
+        self.path = f"{meta_path}.lock"
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def refresh_meter(meter_id, features, rebuild=False):
+    os.makedirs(Config.WINDOW_STORE_DIR, exist_ok=True)
+    values_path, times_path, meta_path = meter_paths(meter_id)
+    with MeterLock(meta_path):
+        meta = load_meta(meta_path)
+        if rebuild or meta is None or meta['features'] != list(features):
+            meta = {'features': list(features), 'rows': 0, 'high_water': None, 'high_water_ids': []}
+
+        query = {'meter_id': meter_id}
+        if meta['high_water'] is not None:
+            # $gte kèm danh sách id tại mốc: không bỏ sót bản ghi có cùng measurement_time ghi sau lần refresh trước
+            query['measurement_time'] = {'$gte': meta['high_water']}
+        cursor = mongo.db.meter_measurement_data.find(
+            query, {'_id': 0, 'id': 1, 'measurement_time': 1, **{feature: 1 for feature in features}},
+            sort=[('measurement_time', 1)], batch_size=REFRESH_BATCH_SIZE
+        )
+        seen = set(meta['high_water_ids'])
+        values, times = [], []
+        high_water, high_water_ids = meta['high_water'], list(meta['high_water_ids'])
+        for doc in cursor:
+            if doc.get('id') in seen:
+                continue
+            values.append([feature_value(doc, feature) for feature in features])
+            times.append(time_seconds(doc['measurement_time']))
+            if doc['measurement_time'] != high_water:
+                high_water, high_water_ids = doc['measurement_time'], []
+            high_water_ids.append(doc.get('id'))
+        if not values and meta['rows']:
+            return 0
+
+        width = len(features)
+        # MongoDB sắp theo chuỗi measurement_time: thời điểm khác múi giờ có thể lệch thứ tự sau khi quy về UTC
+        times = np.asarray(times, dtype=np.int64)
+        order = np.argsort(times, kind='stable')
+        rows = np.asarray(values, dtype=np.float32).reshape(-1, width)[order]
+        # Cắt phần đuôi do lần ghi trước bị ngắt (dữ liệu đã ghi nhưng chưa cập nhật meta) rồi nối thêm
+        for path, data, item_size in ((values_path, rows, 4 * width), (times_path, times[order], 8)):
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as file:
+                file.truncate(meta['rows'] * item_size)
+                file.seek(meta['rows'] * item_size)
+                file.write(data.tobytes())
+
+        meta = dict(meta, rows=meta['rows'] + len(values), high_water=high_water, high_water_ids=high_water_ids)
+        write_meta(meta_path, meta)
+        return len(values)
+
+
+def open_meter(meter_id, features):
+    # (giá trị, thời điểm) dạng memmap chỉ đọc, theo thứ tự thời gian; None nếu chưa có trong bộ đệm
+    values_path, times_path, meta_path = meter_paths(meter_id)
+    meta = load_meta(meta_path)
+    if meta is None or meta['features'] != list(features) or meta['rows'] == 0:
+        return None
+    rows, width = meta['rows'], len(features)
+    values = np.memmap(values_path, dtype=np.float32, mode='r', shape=(rows, width))
+    times = np.memmap(times_path, dtype=np.int64, mode='r', shape=(rows,))
+    return values, times
+
+
+def feature_window(meter_id, limit, features=('instant_flow',), start_time=None, end_time=None, refresh=True):
+    # Cùng kết quả với MeasurementRepository.feature_window (mới nhất trước) nhưng đọc từ bộ đệm cục bộ
+    if refresh:
+        refresh_meter(meter_id, features)
+    opened = open_meter(meter_id, features)
+    if opened is None:
+        return np.empty((0, len(features)), dtype=np.float32)
+    values, times = opened
+    start = np.searchsorted(times, time_seconds(start_time), 'left') if start_time else 0
+    end = np.searchsorted(times, time_seconds(end_time), 'right') if end_time else len(times)
+    start = max(start, end - limit)
+    return values[start:end][::-1]
+
+
+def refresh_all(features, meter_ids=None, rebuild=False):
+    meter_ids = meter_ids or meters.distinct('meter_id')
+    added = 0
+    for meter_id in meter_ids:
+        added += refresh_meter(meter_id, features, rebuild)
+    logger.info("Đã cập nhật bộ đệm chuỗi đo", extra={'fields': {'meters': len(meter_ids), 'rows_added': added}})
+    return {'meters': len(meter_ids), 'rows_added': added}
+
+
+if __name__ == "__main__":
+    from app import create_app
+    from app.ml.config import MLConfig
+
+    parser = argparse.ArgumentParser(description="Cập nhật bộ đệm chuỗi đo cục bộ (WINDOW_STORE_DIR) từ meter_measurement_data")
+    parser.add_argument('--meters', type=int, nargs='+', help='Chỉ cập nhật các đồng hồ này')
+    parser.add_argument('--rebuild', action='store_true', help='Đọc lại toàn bộ thay vì chỉ phần mới')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(refresh_all(MLConfig.LSTM_AE_FEATURES, args.meters, args.rebuild))
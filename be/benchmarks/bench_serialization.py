@@ -0,0 +1,91 @@
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+from app.serialization import dumps_bytes, orjson
+
+PREDICTION_FIELDS = ['p_id', 'meter_id', 'model_id', 'prediction_time', 'prediction_threshold',
+                     'predicted_label', 'confidence', 'recorded_instant_flow']
+
+
+def make_prediction_page(size, with_id):
+    start = datetime(2025, 1, 1)
+    page = []
+    for i in range(size):
+        doc = {
+            'p_id': i + 1,
+            'meter_id': random.randint(1, 500),
+            'model_id': 1,
+            'prediction_time': (start + timedelta(hours=i)).isoformat(),
+            'prediction_threshold': 0.015,
+            'predicted_label': 'Rò rỉ' if random.random() < 0.05 else 'Bình thường',
+            'confidence': random.uniform(0.6, 0.95),
+            'recorded_instant_flow': random.uniform(50, 300),
+        }
+        if with_id:
+            doc['_id'] = ObjectId() if ObjectId is not None else f'{i:024x}'
+        page.append(doc)
+    return page
+
+
+def legacy_response(page):
+    # Cách cũ: vòng lặp đổi _id thành chuỗi rồi json.dumps như provider mặc định của Flask
+    docs = [dict(doc) for doc in page]
+    for doc in docs:
+        if '_id' in doc:
+            doc['_id'] = str(doc['_id'])
+    return json.dumps({'predictions': docs, 'total_count': len(docs)}, default=str, sort_keys=True).encode('utf-8')
+
+
+def fast_response(page):
+    # Cách mới: tài liệu đã được projection (không có _id), mã hoá trực tiếp
+    return dumps_bytes({'predictions': page, 'total_count': len(page)})
+
+
+def measure(func, page, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(page)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'median_ms': timings[len(timings) // 2] * 1000,
+        'min_ms': timings[0] * 1000,
+        'docs_per_s': len(page) / timings[len(timings) // 2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON serialization of prediction pages')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Ghi kết quả dạng JSON ra tệp')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = []
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'page size':>10} {'legacy ms':>12} {'fast ms':>12} {'speedup':>9}")
+    for size in args.sizes:
+        legacy = measure(legacy_response, make_prediction_page(size, with_id=True), args.repeat)
+        fast = measure(fast_response, make_prediction_page(size, with_id=False), args.repeat)
+        speedup = legacy['median_ms'] / fast['median_ms']
+        print(f"{size:>10} {legacy['median_ms']:>12.3f} {fast['median_ms']:>12.3f} {speedup:>8.1f}x")
+        results.append({'page_size': size, 'legacy': legacy, 'fast': fast, 'speedup': speedup})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'benchmark': 'serialization', 'results': results}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+from app.ml.config import MLConfig
+
+
+def worker(index, workers, intra, inter, affinity, inference_mode, batch_size, duration, barrier, results):
+    import torch
+    from app.ml.predict import LSTMAE
+    from app.ml.runtime import configure_torch, inference_context
+
+    configured = configure_torch(intra_threads=intra, inter_threads=inter, affinity=affinity,
+                                 worker_index=index, workers=workers)
+    model = LSTMAE(**MLConfig.LSTM_AE_CONFIG)
+    if os.path.exists(MLConfig.LSTM_AE_MODEL_PATH):
+        model.load_state_dict(torch.load(MLConfig.LSTM_AE_MODEL_PATH, map_location='cpu'))
+    model.eval()
+    batch = torch.rand(batch_size, MLConfig.LSTM_AE_CONFIG['seq_len'], MLConfig.LSTM_AE_CONFIG['input_size'])
+
+    with inference_context(inference_mode):
+        model(batch)
+    # Các worker bắt đầu đo cùng lúc để thấy được tranh chấp CPU giữa các process
+    barrier.wait()
+    windows = 0
+    started = time.perf_counter()
+    with inference_context(inference_mode):
+        while time.perf_counter() - started < duration:
+            model(batch)
+            windows += batch_size
+    results.put({'windows': windows, 'seconds': time.perf_counter() - started,
+                 'intra': configured['intra_op_threads'], 'cpus': configured['cpus']})
+
+
+def run_config(context, workers, intra, inter, affinity, inference_mode, batch_size, duration):
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(index, workers, intra, inter, affinity, inference_mode,
+                                                      batch_size, duration, barrier, results))
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    stats = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    throughput = sum(s['windows'] / s['seconds'] for s in stats)
+    return {
+        'workers': workers,
+        'intra_op_threads': intra,
+        'effective_intra_op_threads': stats[0]['intra'],
+        'inter_op_threads': inter,
+        'affinity': affinity or 'none',
+        'inference_mode': inference_mode,
+        'batch_size': batch_size,
+        'windows_per_s': round(throughput, 1),
+        'windows_per_s_per_worker': round(throughput / workers, 1),
+    }
+
+
+def main():
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    parser = argparse.ArgumentParser(description='Sweep torch intra/inter-op threads, inference_mode and CPU affinity '
+                                                 'for several concurrent inference processes')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--intra', type=int, nargs='+', default=[0, 1, 2], help='0 = mặc định của torch')
+    parser.add_argument('--inter', type=int, nargs='+', default=[0, 1])
+    parser.add_argument('--affinity', nargs='+', default=['', 'auto'], help='"" (không ghim) và/hoặc "auto"')
+    parser.add_argument('--modes', nargs='+', choices=['inference_mode', 'no_grad'], default=['inference_mode', 'no_grad'])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[1, 16])
+    parser.add_argument('--duration', type=float, default=3.0, help='Số giây đo cho mỗi cấu hình')
+    parser.add_argument('--output', help='Ghi kết quả dạng JSON ra tệp')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    print(f"cpus: {cpus}")
+    print(f"{'workers':>7} {'intra':>5} {'inter':>5} {'affinity':>8} {'mode':>14} {'batch':>5} {'win/s':>10} {'win/s/w':>9}")
+    for workers, intra, inter, affinity, mode, batch_size in itertools.product(
+            args.workers, args.intra, args.inter, args.affinity, args.modes, args.batch_size):
+        # Tổng số luồng vượt quá số lõi chỉ làm chậm; bỏ qua để sweep không kéo dài vô ích
+        if intra and workers * intra > cpus * 2:
+            continue
+        result = run_config(context, workers, intra, inter, affinity, mode == 'inference_mode', batch_size, args.duration)
+        results.append(result)
+        print(f"{workers:>7} {result['effective_intra_op_threads']:>5} {inter:>5} {result['affinity']:>8} {mode:>14} "
+              f"{batch_size:>5} {result['windows_per_s']:>10.1f} {result['windows_per_s_per_worker']:>9.1f}")
+
+    recommendations = {}
+    for workers, batch_size in itertools.product(args.workers, args.batch_size):
+        candidates = [r for r in results if r['workers'] == workers and r['batch_size'] == batch_size]
+        if not candidates:
+            continue
+        best = max(candidates, key=lambda r: r['windows_per_s'])
+        recommendations[f'workers={workers},batch={batch_size}'] = best
+        print(f"\nworkers={workers} batch={batch_size}: TORCH_INTRA_OP_THREADS={best['intra_op_threads']} "
+              f"TORCH_INTER_OP_THREADS={best['inter_op_threads']} "
+              f"TORCH_CPU_AFFINITY={'' if best['affinity'] == 'none' else best['affinity']} "
+              f"TORCH_INFERENCE_MODE={'true' if best['inference_mode'] else 'false'} "
+              f"({best['windows_per_s']} windows/s)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({'benchmark': 'torch_threads', 'cpus': cpus, 'results': results,
+                       'recommendations': recommendations}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
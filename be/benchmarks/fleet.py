@@ -0,0 +1,50 @@
+from datetime import datetime
+import numpy as np
+
+from datagen import fleet_layout, generate_chunk
+
+
+def generate_fleet(n_meters=50, hours=24 * 14, leak_rate=0.02, seed=0, start=datetime(2025, 1, 1),
+                   meters_per_branch=25, branches_per_company=4, mean_leak_hours=24.0):
+    # leak_rate là tỉ lệ giờ bị rò rỉ mong muốn; quy đổi ra số đợt rò rỉ mỗi ngày cho datagen
+    meter_ids, branch_ids, company_ids = fleet_layout(n_meters, meters_per_branch, branches_per_company)
+    chunk = generate_chunk(meter_ids, start=start, hours=hours, seed=seed,
+                           leak_rate_per_day=leak_rate * 24.0 / mean_leak_hours, mean_leak_hours=mean_leak_hours)
+    return {
+        'times': chunk['times'],
+        'meter_ids': meter_ids,
+        'branch_ids': branch_ids,
+        'company_ids': company_ids,
+        'flow': chunk['flow'],
+        'pressure': chunk['pressure'],
+        'leak': chunk['is_leak'],
+    }
+
+
+def fleet_documents(fleet):
+    companies = [{'company_id': int(c), 'name': f'Company {c}', 'address': ''} for c in np.unique(fleet['company_ids'])]
+    branches = [{'branch_id': b + 1, 'company_id': int(c), 'name': f'Branch {b + 1}', 'address': ''}
+                for b, c in enumerate(fleet['company_ids'])]
+    meters = [{'meter_id': int(m), 'branch_id': int(b), 'meter_name': f'Meter {m}',
+               'installation_time': str(fleet['times'][0]), 'threshold': 0.015}
+              for m, b in zip(fleet['meter_ids'], fleet['branch_ids'])]
+    return companies, branches, meters
+
+
+def iter_measurement_batches(fleet, batch_size=10000):
+    times = fleet['times'].tolist()
+    hours = len(times)
+    next_id = 1
+    batch = []
+    for row, meter_id in enumerate(fleet['meter_ids'].tolist()):
+        flows = fleet['flow'][row].tolist()
+        pressures = fleet['pressure'][row].tolist()
+        for i in range(hours):
+            batch.append({'id': next_id, 'meter_id': meter_id, 'instant_flow': flows[i],
+                          'measurement_time': times[i], 'instant_pressure': pressures[i]})
+            next_id += 1
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+import numpy as np
+
+from benchmarks.fleet import generate_fleet, fleet_documents, iter_measurement_batches
+
+FLEET_COLLECTIONS = ['companies', 'branches', 'water_meters', 'meter_measurement_data', 'predictions',
+                     'counters', 'meter_rollups', 'branch_rollups', 'meter_status']
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KB, macOS trả về byte
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def summarize(latencies, wall_time, errors=0):
+    result = {'count': len(latencies), 'errors': errors, 'peak_rss_mb': round(peak_rss_mb(), 1)}
+    if latencies:
+        values = np.array(latencies) * 1000
+        result.update({
+            'p50_ms': round(float(np.percentile(values, 50)), 3),
+            'p95_ms': round(float(np.percentile(values, 95)), 3),
+            'p99_ms': round(float(np.percentile(values, 99)), 3),
+            'mean_ms': round(float(values.mean()), 3),
+            'throughput_per_s': round(len(latencies) / wall_time, 2) if wall_time else None,
+        })
+    return result
+
+def timed_loop(call, iterations):
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        try:
+            if call(i) is False:
+                errors += 1
+        except Exception as e:
+            errors += 1
+            print(f"  error: {e}", file=sys.stderr)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+def create_benchmark_app(mongo_uri):
+    if mongo_uri:
+        os.environ['MONGO_URI'] = mongo_uri
+    from app import create_app
+    from app.database import mongo
+
+    app = create_app()
+    if not mongo_uri:
+        import mongomock
+        client = mongomock.MongoClient()
+        mongo.cx = client
+        mongo.db = client['benchmark']
+    return app
+
+def load_fleet(app, fleet):
+    from app.database import mongo, ensure_indexes
+
+    with app.app_context():
+        for collection in FLEET_COLLECTIONS:
+            mongo.db[collection].delete_many({})
+        ensure_indexes()
+        companies, branches, meters = fleet_documents(fleet)
+        mongo.db.companies.insert_many(companies)
+        mongo.db.branches.insert_many(branches)
+        mongo.db.water_meters.insert_many(meters)
+        rows = 0
+        for batch in iter_measurement_batches(fleet):
+            mongo.db.meter_measurement_data.insert_many(batch)
+            rows += len(batch)
+    return rows
+
+
+def http_benchmarks(fleet):
+    meter_ids = fleet['meter_ids'].tolist()
+    branch_ids = sorted(set(fleet['branch_ids'].tolist()))
+    last_time = str(fleet['times'][-1])
+    first_day = str(fleet['times'][0])[:10]
+    return {
+        'GET water_meters': ('GET', lambda i: '/api/water-meters/water_meters?limit=50', None),
+        'GET water_meters/status': ('GET', lambda i: f'/api/water-meters/water_meters/status?branch_id={branch_ids[i % len(branch_ids)]}', None),
+        'GET water_meters/<id>/status': ('GET', lambda i: f'/api/water-meters/water_meters/{meter_ids[i % len(meter_ids)]}/status', None),
+        'GET water_meters/<id>/predictions': ('GET', lambda i: f'/api/water-meters/water_meters/{meter_ids[i % len(meter_ids)]}/predictions?limit=50&start_date={first_day}', None),
+        'GET predictions': ('GET', lambda i: '/api/predictions/predictions?limit=500', None),
+        'GET rollups/meters/<id>': ('GET', lambda i: f'/api/rollups/meters/{meter_ids[i % len(meter_ids)]}?end_time={last_time}&resolution=daily', None),
+        'GET health/branches': ('GET', lambda i: f'/api/health/branches?end_time={last_time}', None),
+        'POST water_meters/<id>/measurements': ('POST', lambda i: f'/api/water-meters/water_meters/{meter_ids[i % len(meter_ids)]}/measurements',
+                                                 lambda i: {'instant_flow': 120.0 + i % 7, 'measurement_time': last_time, 'instant_pressure': 2.5}),
+    }
+
+def run_http_benchmark(client, method, url_for, body_for, iterations):
+    def call(i):
+        response = client.open(url_for(i), method=method, json=body_for(i) if body_for else None)
+        return response.status_code < 400
+    return timed_loop(call, iterations)
+
+
+def run_suite(args):
+    random.seed(args.seed)
+    fleet_started = time.perf_counter()
+    fleet = generate_fleet(args.meters, args.hours, args.leak_rate, args.seed)
+    results = {'fleet_generate': {'seconds': round(time.perf_counter() - fleet_started, 3),
+                                  'rows': int(fleet['flow'].size), 'peak_rss_mb': round(peak_rss_mb(), 1)}}
+
+    app = create_benchmark_app(args.mongo_uri)
+    load_started = time.perf_counter()
+    rows = load_fleet(app, fleet)
+    results['fleet_load'] = {'seconds': round(time.perf_counter() - load_started, 3), 'rows': rows,
+                             'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+    meter_ids = fleet['meter_ids'].tolist()
+    selected = set(args.only or [])
+
+    def enabled(name):
+        return not selected or name in selected
+
+    with app.app_context():
+        from app.ml.predict import predictor
+
+        load_started = time.perf_counter()
+        predictor.load_model()
+        results['model_load'] = {'seconds': round(time.perf_counter() - load_started, 3), 'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+        if enabled('predict_one'):
+            print('predict_one...', file=sys.stderr)
+            results['predict_one'] = timed_loop(
+                lambda i: predictor.predict_one(random.choice(meter_ids), random.uniform(80.0, 200.0)),
+                args.iterations)
+
+        if enabled('calculate_threshold'):
+            print('calculate_threshold...', file=sys.stderr)
+            results['calculate_threshold'] = timed_loop(
+                lambda i: predictor.calculate_threshold(meter_ids[i % len(meter_ids)]),
+                max(1, args.iterations // 10))
+
+    client = app.test_client()
+    for name, (method, url_for, body_for) in http_benchmarks(fleet).items():
+        if enabled('http') or enabled(name):
+            print(f'{name}...', file=sys.stderr)
+            results[name] = run_http_benchmark(client, method, url_for, body_for, args.iterations)
+
+    if enabled('init_data'):
+        # Chạy cuối cùng vì init_data xoá và nạp lại toàn bộ dữ liệu mẫu trong postdata/
+        print('init_data...', file=sys.stderr)
+        from app.config import Config
+        Config.DATA_INIT_ENDPOINT_ENABLED = True
+        results['init_data'] = run_http_benchmark(client, 'POST', lambda i: '/api/data-init/init_data', None, 1)
+
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return None
+
+def compare(baseline_path, current):
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = json.load(file)['results']
+    print(f"{'benchmark':<40} {'metric':<18} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s', 'seconds', 'peak_rss_mb'):
+            before = baseline[name].get(metric)
+            after = result.get(metric)
+            if before is None or after is None:
+                continue
+            change = f"{(after - before) / before * 100:+.1f}%" if before else 'n/a'
+            print(f"{name:<40} {metric:<18} {before:>12.3f} {after:>12.3f} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark inference, threshold, data init and HTTP endpoints on a synthetic fleet')
+    parser.add_argument('--meters', type=int, default=20)
+    parser.add_argument('--hours', type=int, default=24 * 14)
+    parser.add_argument('--leak-rate', type=float, default=0.02)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mongo-uri', help='MongoDB dùng cho benchmark (mặc định: mongomock trong bộ nhớ). Dữ liệu sẽ bị xoá!')
+    parser.add_argument('--only', nargs='+', help='Chỉ chạy các benchmark này (vd: predict_one http init_data)')
+    parser.add_argument('--output', help='Ghi kết quả JSON ra tệp')
+    parser.add_argument('--compare', help='So sánh với một tệp kết quả trước đó')
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': 'mongodb' if args.mongo_uri else 'mongomock',
+            'params': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'mongo_uri')},
+        },
+        'results': results,
+    }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+from .generator import fleet_layout, generate_chunk, iter_fleet_chunks
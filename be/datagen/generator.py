@@ -0,0 +1,98 @@
+from datetime import datetime
+import numpy as np
+
+
+def fleet_layout(n_meters, meters_per_branch=25, branches_per_company=4):
+    meter_ids = np.arange(1, n_meters + 1)
+    branch_ids = (meter_ids - 1) // meters_per_branch + 1
+    n_branches = int(branch_ids.max()) if n_meters else 0
+    company_ids = (np.arange(1, n_branches + 1) - 1) // branches_per_company + 1
+    return meter_ids, branch_ids, company_ids
+
+
+def time_axis(start, hours):
+    times = np.datetime64(start, 'h') + np.arange(hours) * np.timedelta64(1, 'h')
+    hour_of_day = (times - times.astype('datetime64[D]')).astype(int)
+    # 1970-01-01 là thứ Năm: +3 để thứ Hai = 0
+    day_of_week = (times.astype('datetime64[D]').astype(int) + 3) % 7
+    return times, hour_of_day, day_of_week
+
+def diurnal_profile(hour_of_day, day_of_week):
+    # Cao điểm sáng/tối, thấp về đêm; cuối tuần cao điểm sáng muộn và thấp hơn
+    weekend = day_of_week >= 5
+    morning_peak = np.where(weekend, 9, 7)
+    profile = (1.0
+               + np.where(weekend, 0.20, 0.35) * np.exp(-((hour_of_day - morning_peak) ** 2) / 3.0)
+               + 0.25 * np.exp(-((hour_of_day - 19) ** 2) / 4.0)
+               - 0.35 * np.exp(-((hour_of_day - 3) ** 2) / 6.0))
+    return profile * np.where(weekend, 0.9, 1.0)
+
+def leak_episodes(rng, n_meters, hours, base_flow, leak_rate_per_day, mean_leak_hours):
+    episodes_per_meter = rng.poisson(leak_rate_per_day * hours / 24.0, size=n_meters)
+    meter_index = np.repeat(np.arange(n_meters), episodes_per_meter)
+    total = meter_index.size
+    starts = rng.integers(0, max(hours, 1), size=total)
+    ends = np.minimum(starts + rng.geometric(1.0 / max(mean_leak_hours, 1.0), size=total), hours)
+    magnitudes = rng.uniform(0.3, 1.0, size=total) * base_flow[meter_index, 0]
+
+    # Mảng hiệu: cộng tại điểm bắt đầu, trừ tại điểm kết thúc rồi cumsum theo thời gian
+    flow_diff = np.zeros((n_meters, hours + 1))
+    np.add.at(flow_diff, (meter_index, starts), magnitudes)
+    np.add.at(flow_diff, (meter_index, ends), -magnitudes)
+    active_diff = np.zeros((n_meters, hours + 1), dtype=np.int32)
+    np.add.at(active_diff, (meter_index, starts), 1)
+    np.add.at(active_diff, (meter_index, ends), -1)
+
+    leak_flow = np.cumsum(flow_diff, axis=1)[:, :hours]
+    is_leak = np.cumsum(active_diff, axis=1)[:, :hours] > 0
+    return leak_flow, is_leak, {'meter_index': meter_index, 'start': starts, 'end': ends, 'magnitude': magnitudes}
+
+
+def generate_chunk(meter_ids, start=datetime(2025, 1, 1), hours=24 * 7, seed=0,
+                   leak_rate_per_day=0.02, mean_leak_hours=24.0):
+    # Sinh lưu lượng, áp suất và nhãn rò rỉ cho một nhóm đồng hồ chỉ bằng các phép toán mảng NumPy.
+    # Cùng seed và cùng cách chia nhóm đồng hồ cho ra cùng dữ liệu.
+    meter_ids = np.asarray(meter_ids)
+    n_meters = meter_ids.size
+    rng = np.random.default_rng([seed, int(meter_ids[0]) if n_meters else 0])
+
+    times, hour_of_day, day_of_week = time_axis(start, hours)
+    profile = diurnal_profile(hour_of_day, day_of_week)[np.newaxis, :]
+
+    base_flow = rng.lognormal(np.log(120.0), 0.3, size=(n_meters, 1))
+    amplitude = rng.uniform(0.6, 1.2, size=(n_meters, 1))
+    seasonal_phase = rng.uniform(0.0, 2 * np.pi, size=(n_meters, 1))
+    seasonal = 0.05 * np.sin(2 * np.pi * np.arange(hours)[np.newaxis, :] / (24 * 30) + seasonal_phase)
+    normal_flow = base_flow * (1.0 + amplitude * (profile - 1.0) + seasonal)
+    normal_flow += rng.normal(0.0, 0.04, size=(n_meters, hours)) * base_flow
+
+    leak_flow, is_leak, episodes = leak_episodes(rng, n_meters, hours, base_flow, leak_rate_per_day, mean_leak_hours)
+    flow = np.maximum(normal_flow + leak_flow, 0.0).round(1)
+
+    base_pressure = rng.uniform(2.2, 3.0, size=(n_meters, 1))
+    pressure = (base_pressure
+                - 0.3 * (profile - 1.0)
+                - 0.5 * leak_flow / base_flow
+                + rng.normal(0.0, 0.03, size=(n_meters, hours)))
+    pressure = np.maximum(pressure, 0.0).round(2)
+
+    time_strings = np.datetime_as_string(times, unit='s')
+    return {
+        'meter_ids': meter_ids,
+        'times': time_strings,
+        'flow': flow,
+        'pressure': pressure,
+        'is_leak': is_leak,
+        'episodes': {
+            'meter_id': meter_ids[episodes['meter_index']],
+            'start_time': time_strings[np.minimum(episodes['start'], hours - 1)] if hours else time_strings,
+            'end_time': time_strings[episodes['end'] - 1] if hours else time_strings,
+            'magnitude': episodes['magnitude'].round(1),
+        },
+    }
+
+
+def iter_fleet_chunks(n_meters, chunk_meters=500, **kwargs):
+    meter_ids = np.arange(1, n_meters + 1)
+    for offset in range(0, n_meters, chunk_meters):
+        yield generate_chunk(meter_ids[offset:offset + chunk_meters], **kwargs)
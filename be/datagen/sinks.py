@@ -0,0 +1,134 @@
+import os
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+MEASUREMENT_COLUMNS = ['id', 'meter_id', 'instant_flow', 'measurement_time', 'instant_pressure']
+
+
+def chunk_frame(chunk, first_id):
+    n_meters, hours = chunk['flow'].shape
+    rows = n_meters * hours
+    return pd.DataFrame({
+        'id': np.arange(first_id, first_id + rows),
+        'meter_id': np.repeat(chunk['meter_ids'], hours),
+        'instant_flow': chunk['flow'].ravel(),
+        'measurement_time': np.tile(chunk['times'], n_meters),
+        'instant_pressure': chunk['pressure'].ravel(),
+        'is_leak': chunk['is_leak'].ravel(),
+    })
+
+def episodes_frame(chunk):
+    return pd.DataFrame(chunk['episodes'])
+
+def layout_frames(meter_ids, branch_ids, company_ids, installation_time):
+    companies = pd.DataFrame({
+        'company_id': np.unique(company_ids),
+        'name': [f'Synthetic Company {c}' for c in np.unique(company_ids)],
+        'address': '',
+    })
+    branches = pd.DataFrame({
+        'branch_id': np.arange(1, len(company_ids) + 1),
+        'company_id': company_ids,
+        'name': [f'Synthetic Branch {b}' for b in range(1, len(company_ids) + 1)],
+        'address': '',
+    })
+    meters = pd.DataFrame({
+        'meter_id': meter_ids,
+        'branch_id': branch_ids,
+        'meter_name': [f'Synthetic Meter {m}' for m in meter_ids],
+        'installation_time': installation_time,
+    })
+    return {'companies': companies, 'branches': branches, 'water_meters': meters}
+
+
+class CsvSink:
+    # Ghi cùng định dạng với postdata/ để init_data có thể nạp thư mục đầu ra; nhãn rò rỉ nằm ở tệp riêng
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self.started = set()
+
+    def append(self, name, frame):
+        path = os.path.join(self.out_dir, f'{name}.csv')
+        frame.to_csv(path, mode='a' if name in self.started else 'w', header=name not in self.started, index=False)
+        self.started.add(name)
+
+    def write_layout(self, frames):
+        for name, frame in frames.items():
+            self.append(name, frame)
+
+    def write_chunk(self, chunk, first_id):
+        frame = chunk_frame(chunk, first_id)
+        self.append('measurements', frame[MEASUREMENT_COLUMNS])
+        self.append('leak_labels', frame.loc[:, ['id', 'meter_id', 'measurement_time', 'is_leak']])
+        self.append('leak_episodes', episodes_frame(chunk))
+
+    def close(self):
+        pass
+
+
+class ParquetSink:
+    def __init__(self, out_dir, compression='zstd'):
+        if pa is None:
+            raise RuntimeError("Parquet output requires pyarrow")
+        self.out_dir = out_dir
+        self.compression = compression
+        os.makedirs(out_dir, exist_ok=True)
+        self.writers = {}
+
+    def append(self, name, frame):
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if name not in self.writers:
+            self.writers[name] = pq.ParquetWriter(os.path.join(self.out_dir, f'{name}.parquet'), table.schema,
+                                                  compression=self.compression)
+        self.writers[name].write_table(table)
+
+    def write_layout(self, frames):
+        for name, frame in frames.items():
+            pq.write_table(pa.Table.from_pandas(frame, preserve_index=False),
+                           os.path.join(self.out_dir, f'{name}.parquet'), compression=self.compression)
+
+    def write_chunk(self, chunk, first_id):
+        self.append('measurements', chunk_frame(chunk, first_id))
+        self.append('leak_episodes', episodes_frame(chunk))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+class MongoSink:
+    def __init__(self, uri, batch_size=10000, drop=False):
+        from pymongo import MongoClient
+        self.client = MongoClient(uri)
+        self.db = self.client.get_default_database()
+        self.batch_size = batch_size
+        if drop:
+            for name in ('companies', 'branches', 'water_meters', 'meter_measurement_data', 'synthetic_leak_labels'):
+                self.db[name].delete_many({})
+
+    def insert_frame(self, collection, frame):
+        records = frame.to_dict('records')
+        for offset in range(0, len(records), self.batch_size):
+            self.db[collection].insert_many(records[offset:offset + self.batch_size], ordered=False)
+
+    def write_layout(self, frames):
+        meters = frames['water_meters'].assign(threshold=0.015)
+        self.insert_frame('companies', frames['companies'])
+        self.insert_frame('branches', frames['branches'])
+        self.insert_frame('water_meters', meters)
+
+    def write_chunk(self, chunk, first_id):
+        frame = chunk_frame(chunk, first_id)
+        self.insert_frame('meter_measurement_data', frame[MEASUREMENT_COLUMNS])
+        self.insert_frame('synthetic_leak_labels', episodes_frame(chunk))
+
+    def close(self):
+        self.client.close()
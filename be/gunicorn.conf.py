@@ -0,0 +1,45 @@
+from app.config import Config
+from app.ml.config import MLConfig
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+bind = Config.GUNICORN_BIND
+workers = Config.GUNICORN_WORKERS
+threads = Config.GUNICORN_THREADS
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = Config.GUNICORN_TIMEOUT
+graceful_timeout = Config.GUNICORN_GRACEFUL_TIMEOUT
+keepalive = Config.GUNICORN_KEEPALIVE
+max_requests = Config.GUNICORN_MAX_REQUESTS
+max_requests_jitter = Config.GUNICORN_MAX_REQUESTS_JITTER
+# Nạp ứng dụng (và trọng số mô hình) trong master trước khi fork
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Chỉ số ổn định 0..workers-1 cho worker mới (thay thế worker đã thoát), dùng để ghim CPU
+    used = {getattr(other, 'slot', None) for other in server.WORKERS.values()}
+    worker.slot = next(index for index in range(len(used) + 1) if index not in used)
+
+
+def post_fork(server, worker):
+    from app.database import reconnect_mongo
+
+    reconnect_mongo(server.app.wsgi().config)
+    if MLConfig.INFERENCE_MODE != 'remote':
+        from app.ml.runtime import available_cpus, configure_torch
+
+        # Không đặt TORCH_INTRA_OP_THREADS: chia đều số lõi cho các worker thay vì mỗi worker dùng tất cả
+        intra_threads = MLConfig.TORCH_INTRA_OP_THREADS or max(1, len(available_cpus()) // server.num_workers)
+        configure_torch(intra_threads=intra_threads, worker_index=worker.slot, workers=server.num_workers)
+
+
+def post_worker_init(worker):
+    from app.services.prediction_jobs import start_prediction_workers
+
+    start_prediction_workers()
+
+
+def worker_exit(server, worker):
+    from app.services.prediction_jobs import stop_prediction_workers
+
+    stop_prediction_workers()
@@ -1,8 +1,10 @@
 from app import create_app
-from app.routes.init_data import init_data
+from app.config import Config
+from app.services.prediction_jobs import start_prediction_workers
 app = create_app()
 
+# Server phát triển. Production: gunicorn -c gunicorn.conf.py wsgi:app
+# Nạp dữ liệu mẫu (xoá dữ liệu hiện có): python -m app.routes.init_data --yes
 if __name__ == "__main__":
-    with app.app_context():
-        init_data()
-    app.run(debug=True)
\ No newline at end of file
+    start_prediction_workers()
+    app.run(debug=Config.DEBUG, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,30 @@
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from app import create_app
+from app.database import mongo
+from app.repositories.base import seeded_counters
+from app.repositories.cache import meter_cache
+from app.services import threshold_sketches
+
+
+@pytest.fixture
+def app():
+    # MongoDB giả trong bộ nhớ cho mỗi test; bộ đệm đồng hồ, landmark sketch và trạng thái seed bộ đếm là của
+    # process nên phải xoá
+    app = create_app()
+    client = mongomock.MongoClient()
+    mongo.cx = client
+    mongo.db = client['flaskdb']
+    meter_cache.clear()
+    seeded_counters.clear()
+    threshold_sketches._landmarks.clear()
+    with app.app_context():
+        yield app
+    meter_cache.clear()
+
+
+@pytest.fixture
+def db(app):
+    return mongo.db
@@ -0,0 +1,10 @@
+from app.repositories import ai_models, seed_counters
+
+
+def test_register_allocates_ids_after_seeded_models(db):
+    db.ai_models.insert_one({'model_id': 3, 'name': 'seeded'})
+    seed_counters()
+    first = ai_models.register('a', '/tmp/a.pth', epochs=2)
+    second = ai_models.register('b', '/tmp/b.pth')
+    assert (first['model_id'], second['model_id']) == (4, 5)
+    assert ai_models.get(4)['epochs'] == 2
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+import pytest
+from app.config import Config
+from app.database import ensure_indexes
+from app.services import alerts
+
+START = datetime(2024, 1, 1)
+
+
+def prediction(hour, leak, confidence=0.7, meter_id=1):
+    return {'p_id': hour, 'meter_id': meter_id, 'branch_id': 5,
+            'prediction_time': (START + timedelta(hours=hour)).isoformat(),
+            'label_code': 'leak' if leak else 'normal', 'confidence': confidence}
+
+
+def predictions(labels, meter_id=1, first_hour=0):
+    return [prediction(first_hour + offset, leak, meter_id=meter_id) for offset, leak in enumerate(labels)]
+
+
+@pytest.fixture(autouse=True)
+def alert_config(app, monkeypatch):
+    monkeypatch.setattr(Config, 'ALERT_OPEN_AFTER', 3)
+    monkeypatch.setattr(Config, 'ALERT_CLOSE_AFTER', 2)
+    monkeypatch.setattr(Config, 'ALERT_CRITICAL_CONFIDENCE', 0.9)
+    monkeypatch.setattr(Config, 'ALERT_CRITICAL_AFTER', 5)
+    ensure_indexes()
+
+
+def test_alert_opens_after_consecutive_anomalies(db):
+    alerts.record_alerts(predictions([1, 1, 0, 1, 1]))
+    assert db.alerts.count_documents({}) == 0
+
+    alerts.record_alerts(predictions([1], first_hour=5))
+    alert, = db.alerts.find({})
+    assert alert['status'] == alerts.ALERT_OPEN
+    assert alert['level'] == alerts.LEVEL_WARNING
+    assert alert['anomaly_count'] == 3
+    assert alert['time'] == prediction(3, True)['prediction_time']
+
+
+def test_alert_closes_after_consecutive_normals(db):
+    alerts.record_alerts(predictions([1, 1, 1, 0, 1, 0]))
+    assert db.alerts.find_one({})['status'] == alerts.ALERT_OPEN
+    alerts.record_alerts(predictions([0], first_hour=6))
+    alert = db.alerts.find_one({})
+    assert alert['status'] == alerts.ALERT_CLOSED
+    assert alert['anomaly_count'] == 4
+
+    # Chuỗi bất thường mới mở cảnh báo mới
+    alerts.record_alerts(predictions([1, 1, 1], first_hour=7))
+    assert [alert['status'] for alert in db.alerts.find({}, sort=[('id', 1)])] == [alerts.ALERT_CLOSED, alerts.ALERT_OPEN]
+
+
+def test_high_confidence_opens_critical_and_streak_escalates(db):
+    alerts.record_alerts([prediction(0, True, confidence=0.95)])
+    assert db.alerts.find_one({})['level'] == alerts.LEVEL_CRITICAL
+
+    alerts.record_alerts(predictions([1, 1, 1], meter_id=2))
+    assert db.alerts.find_one({'meter_id': 2})['level'] == alerts.LEVEL_WARNING
+    alerts.record_alerts(predictions([1, 1], meter_id=2, first_hour=3))
+    assert db.alerts.find_one({'meter_id': 2})['level'] == alerts.LEVEL_CRITICAL
+
+
+def test_late_predictions_are_ignored(db):
+    alerts.record_alerts(predictions([1, 1, 1]))
+    state = db.alerts.find_one({})
+    alerts.record_alerts([prediction(1, True)])
+    assert db.alerts.find_one({})['anomaly_count'] == state['anomaly_count']
+    assert db.alert_state.find_one({'meter_id': 1})['version'] == 1
+
+
+def test_open_alert_without_state_is_adopted(db):
+    alerts.record_alerts(predictions([1, 1, 1]))
+    # alert_state mất (vd. process chết sau khi ghi cảnh báo): không mở cảnh báo thứ hai
+    db.alert_state.delete_many({})
+    alerts.record_alerts(predictions([1], first_hour=3))
+    alert, = db.alerts.find({})
+    assert alert['status'] == alerts.ALERT_OPEN
+    assert alert['anomaly_count'] == 4
+
+
+def test_backfill_rebuilds_alerts_from_predictions(db):
+    db.water_meters.insert_one({'meter_id': 1, 'branch_id': 5})
+    db.predictions.insert_many(predictions([1, 1, 1, 0, 0, 1, 1, 1]))
+    assert alerts.backfill_alerts() == 2
+    assert [alert['status'] for alert in db.alerts.find({}, sort=[('id', 1)])] == [alerts.ALERT_CLOSED, alerts.ALERT_OPEN]
+    assert db.alert_state.find_one({'meter_id': 1})['open_alert'] is not None
+
+
+def test_write_errors_map_to_meters_across_bulk_batches(db, monkeypatch):
+    monkeypatch.setattr('app.repositories.base.BULK_WRITE_BATCH', 2)
+    # Process khác đã mở cảnh báo cho đồng hồ 3: chỉ mục meter_id_open từ chối cảnh báo thứ hai
+    db.alerts.insert_one({'id': 99, 'meter_id': 3, 'status': alerts.ALERT_OPEN})
+    changes = {}
+    for alert_id, meter_id in enumerate([1, 2, 3, 4], start=1):
+        change = alerts.alert_change(changes, alert_id, meter_id)
+        change['new'] = {'id': alert_id, 'meter_id': meter_id, 'status': alerts.ALERT_OPEN}
+    assert alerts.write_alerts(changes, '2024-01-01T00:00:00') == {3}
+    assert sorted(alert['meter_id'] for alert in db.alerts.find({'id': {'$ne': 99}})) == [1, 2, 4]
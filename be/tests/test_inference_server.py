@@ -0,0 +1,34 @@
+from itertools import starmap
+from app.ml import inference_server
+from app.ml.inference_server import InferenceServer, split_items
+
+
+class FakePredictor:
+    def __init__(self):
+        self.batches = []
+
+    def predict_results(self, items):
+        self.batches.append([item[0] for item in items])
+        return [(meter_id % 2 == 0, 0.8, 0.01 * meter_id, 0.5) for meter_id, *_ in items]
+
+
+class InlinePool:
+    def starmap(self, fn, args, chunksize=None):
+        return list(starmap(fn, args))
+
+
+def test_split_items_keeps_order():
+    assert split_items(list(range(5)), 2) == [[0, 1, 2], [3, 4]]
+    assert split_items([1], 4) == [[1]]
+    assert split_items([], 4) == []
+
+
+def test_predict_sends_one_batch_per_worker(monkeypatch):
+    predictor = FakePredictor()
+    monkeypatch.setattr(inference_server, '_predictor', predictor)
+    server = InferenceServer('127.0.0.1:0', 'key', workers=2, torch_threads=1)
+    server.pool = InlinePool()
+    response = server.dispatch({'op': 'predict', 'items': [[meter_id, 1.0] for meter_id in range(1, 6)]})
+    assert response['ok']
+    assert predictor.batches == [[1, 2, 3], [4, 5]]
+    assert [result[0] for result in response['result']] == [False, True, False, True, False]
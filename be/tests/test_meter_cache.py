@@ -0,0 +1,84 @@
+import pytest
+from app.repositories import meters, thresholds
+from app.repositories.cache import TTLCache, meter_cache, project, cacheable
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.repositories.cache.time.monotonic', lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache('test', ttl=10, max_size=10)
+    cache.put(1, {'a': 1})
+    clock[0] += 10
+    assert cache.get(1) == {'a': 1}
+    clock[0] += 0.5
+    assert cache.get(1) is None
+    assert cache.entries == {}
+
+
+def test_oldest_entry_is_evicted_when_full():
+    cache = TTLCache('test', ttl=10, max_size=2)
+    for key in (1, 2, 3):
+        cache.put(key, {'key': key})
+    assert cache.get(1) is None
+    assert cache.get(2) == {'key': 2} and cache.get(3) == {'key': 3}
+
+
+def test_get_returns_copy_and_empty_values_are_not_cached():
+    cache = TTLCache('test', ttl=10, max_size=10)
+    cache.put(1, {'a': 1})
+    cache.get(1)['a'] = 2
+    assert cache.get(1) == {'a': 1}
+    cache.put(2, None)
+    assert 2 not in cache.entries
+    disabled = TTLCache('test', ttl=0, max_size=10)
+    disabled.put(1, {'a': 1})
+    assert disabled.get(1) is None
+
+
+def test_patch_keeps_expiry_and_invalidate_drops(clock):
+    cache = TTLCache('test', ttl=10, max_size=10)
+    cache.put(1, {'a': 1, 'b': 1})
+    clock[0] += 5
+    cache.patch(1, b=2)
+    cache.patch(2, b=2)
+    assert cache.get(1) == {'a': 1, 'b': 2}
+    assert cache.get(2) is None
+    clock[0] += 6
+    assert cache.get(1) is None
+    cache.put(1, {'a': 1})
+    cache.invalidate(1, 3)
+    assert cache.get(1) is None
+
+
+def test_project_and_cacheable():
+    document = {'meter_id': 1, 'meter_name': 'm1', 'threshold': 0.5}
+    assert project(document, {'_id': 0, 'threshold': 1}) == {'threshold': 0.5}
+    assert project(None, {'threshold': 1}) is None
+    assert cacheable({'_id': 0, 'threshold': 1}, {'threshold': 1})
+    assert not cacheable({'installation_time': 1, 'serial': 1}, {'installation_time': 1})
+
+
+def test_meter_lookups_are_cached_and_invalidated(db):
+    meters.insert_one({'meter_id': 1, 'branch_id': 2, 'meter_name': 'm1', 'threshold': 0.5})
+    assert meters.get(1, {'_id': 0, 'branch_id': 1}) == {'branch_id': 2}
+    # Sửa trực tiếp trong MongoDB (process khác) không thấy được cho tới khi hết hạn/bị xoá khỏi bộ đệm
+    db.water_meters.update_one({'meter_id': 1}, {'$set': {'meter_name': 'renamed'}})
+    assert meters.get(1)['meter_name'] == 'm1'
+
+    thresholds.set(1, 0.8)
+    assert meters.get(1)['threshold'] == 0.8
+    assert thresholds.get(1) == 0.8
+
+    meter_cache.invalidate(1)
+    assert meters.get(1)['meter_name'] == 'renamed'
+
+
+def test_missing_meter_is_not_cached(db):
+    assert meters.get(5) is None
+    db.water_meters.insert_one({'meter_id': 5, 'branch_id': 1, 'meter_name': 'm5'})
+    assert meters.get(5)['meter_name'] == 'm5'
@@ -0,0 +1,25 @@
+import os
+from app.metrics import Counter, Histogram, Registry
+
+
+def test_samples_carry_worker_label():
+    registry = Registry()
+    jobs = registry.register(Counter('jobs_total', 'Jobs', ('outcome',)))
+    latency = registry.register(Histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0)))
+    jobs.inc(outcome='done')
+    jobs.inc(2, outcome='done')
+    latency.observe(0.5)
+    worker = f'worker="{os.getpid()}"'
+    lines = registry.render().splitlines()
+    assert f'jobs_total{{outcome="done",{worker}}} 3.0' in lines
+    assert f'latency_seconds_bucket{{le="0.1",{worker}}} 0' in lines
+    assert f'latency_seconds_bucket{{le="1.0",{worker}}} 1' in lines
+    assert f'latency_seconds_count{{{worker}}} 1' in lines
+
+
+def test_metrics_endpoint(app):
+    client = app.test_client()
+    client.get('/metrics')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert f'worker="{os.getpid()}"' in response.get_data(as_text=True)
@@ -0,0 +1,164 @@
+from datetime import datetime, timedelta
+import pytest
+from app.config import Config
+from app.database import ensure_indexes
+from app.services import prediction_jobs, rollups
+
+
+def enqueue(measurement_id, meter_id=1):
+    return prediction_jobs.enqueue_prediction(measurement_id, meter_id, 1, 2.5, f'2024-01-01T00:{measurement_id:02d}:00')
+
+
+def test_enqueue_is_idempotent(db):
+    assert enqueue(1)
+    assert not enqueue(1)
+    assert db.prediction_jobs.count_documents({}) == 1
+
+
+def test_lease_marks_jobs_and_counts_attempts(db):
+    enqueue(1)
+    enqueue(2)
+    jobs = prediction_jobs.lease_jobs('w1', 5)
+    assert sorted(job['_id'] for job in jobs) == [1, 2]
+    assert all(job['status'] == prediction_jobs.JOB_LEASED and job['attempts'] == 1 for job in jobs)
+    assert prediction_jobs.lease_jobs('w2', 5) == []
+
+
+def test_expired_lease_is_taken_by_another_worker(db):
+    enqueue(1)
+    prediction_jobs.lease_jobs('w1', 1)
+    db.prediction_jobs.update_one({'_id': 1}, {'$set': {'lease_expires_at': datetime.utcnow() - timedelta(seconds=1)}})
+    jobs = prediction_jobs.lease_jobs('w2', 1)
+    assert [job['lease_owner'] for job in jobs] == ['w2']
+    assert jobs[0]['attempts'] == 2
+    # Worker cũ không còn giữ lease nên không xoá được job
+    prediction_jobs.complete_job(jobs[0], 'w1')
+    assert db.prediction_jobs.count_documents({}) == 1
+
+
+def test_failed_job_backs_off_then_goes_to_dead_letters(db, monkeypatch):
+    monkeypatch.setattr(Config, 'PREDICTION_JOB_MAX_ATTEMPTS', 2)
+    enqueue(1)
+    job, = prediction_jobs.lease_jobs('w1', 1)
+    prediction_jobs.fail_job(job, 'w1', 'boom')
+    pending = db.prediction_jobs.find_one({'_id': 1})
+    assert pending['status'] == prediction_jobs.JOB_PENDING
+    assert pending['available_at'] > datetime.utcnow()
+    assert 'lease_owner' not in pending
+    assert prediction_jobs.lease_jobs('w1', 1) == []
+
+    db.prediction_jobs.update_one({'_id': 1}, {'$set': {'available_at': datetime.utcnow()}})
+    job, = prediction_jobs.lease_jobs('w1', 1)
+    prediction_jobs.fail_job(job, 'w1', 'boom again')
+    assert db.prediction_jobs.count_documents({}) == 0
+    dead, = prediction_jobs.list_dead_letters()
+    assert dead['_id'] == 1 and dead['attempts'] == 2 and dead['last_error'] == 'boom again'
+
+    assert prediction_jobs.requeue_dead_letters() == 1
+    job = db.prediction_jobs.find_one({'_id': 1})
+    assert job['status'] == prediction_jobs.JOB_PENDING and job['attempts'] == 0
+    assert prediction_jobs.job_stats()['dead'] == 0
+
+
+class FakeInference:
+    def __init__(self, fail=False, error=0.0):
+        self.fail = fail
+        self.error = error
+
+    def predict_with_windows(self, items):
+        if self.fail:
+            raise RuntimeError('model down')
+        return [(False, 0.9, self.error, 0.5) for _ in items], None, None
+
+
+def test_process_jobs_writes_one_prediction_per_job(db, monkeypatch):
+    ensure_indexes()
+    db.water_meters.insert_one({'meter_id': 1, 'branch_id': 1, 'threshold': 0.5})
+    monkeypatch.setattr(prediction_jobs, 'inference', FakeInference())
+    monkeypatch.setattr(prediction_jobs, 'submit_shadow', lambda items, seconds: None)
+    for measurement_id in (1, 2, 3):
+        enqueue(measurement_id)
+    prediction_jobs.process_jobs(prediction_jobs.lease_jobs('w1', 5), 'w1')
+
+    written = list(db.predictions.find({}, {'_id': 0, 'p_id': 1, 'measurement_id': 1}))
+    assert sorted(doc['measurement_id'] for doc in written) == [1, 2, 3]
+    assert len({doc['p_id'] for doc in written}) == 3
+    assert db.prediction_jobs.count_documents({}) == 0
+
+    # Chạy lại job đã có prediction không tạo bản ghi mới
+    enqueue(1)
+    prediction_jobs.process_jobs(prediction_jobs.lease_jobs('w1', 5), 'w1')
+    assert db.predictions.count_documents({}) == 3
+
+
+def test_retry_finishes_side_effects_once(db, monkeypatch):
+    ensure_indexes()
+    db.water_meters.insert_one({'meter_id': 1, 'branch_id': 1, 'threshold': 0.5})
+    monkeypatch.setattr(prediction_jobs, 'submit_shadow', lambda items, seconds: None)
+    monkeypatch.setattr(prediction_jobs, 'inference', FakeInference(error=0.2))
+    real_rollup = rollups.record_prediction
+
+    def rollup_down(*args):
+        raise RuntimeError('rollup write failed')
+
+    monkeypatch.setattr(rollups, 'record_prediction', rollup_down)
+    enqueue(1)
+    prediction_jobs.process_jobs(prediction_jobs.lease_jobs('w1', 5), 'w1')
+    assert db.predictions.find_one({'measurement_id': 1})['pending_effects'] == ['rollup']
+    assert db.prediction_jobs.find_one({'_id': 1})['status'] == prediction_jobs.JOB_PENDING
+
+    monkeypatch.setattr(rollups, 'record_prediction', real_rollup)
+    db.prediction_jobs.update_one({'_id': 1}, {'$set': {'available_at': datetime.utcnow()}})
+    prediction_jobs.process_jobs(prediction_jobs.lease_jobs('w1', 5), 'w1')
+    assert 'pending_effects' not in db.predictions.find_one({'measurement_id': 1})
+    assert db.prediction_jobs.count_documents({}) == 0
+    hourly = db.meter_rollups.find_one({'meter_id': 1, 'resolution': 'hourly'})
+    assert hourly['prediction_count'] == 1
+    sketch = db.threshold_sketches.find_one({'_id': 1})
+    assert sum(sketch['buckets'].values()) == 1
+
+
+def test_process_jobs_retries_when_inference_fails(db, monkeypatch):
+    monkeypatch.setattr(prediction_jobs, 'inference', FakeInference(fail=True))
+    enqueue(1)
+    prediction_jobs.process_jobs(prediction_jobs.lease_jobs('w1', 5), 'w1')
+    job = db.prediction_jobs.find_one({'_id': 1})
+    assert job['status'] == prediction_jobs.JOB_PENDING and 'model down' in job['last_error']
+    assert db.predictions.count_documents({}) == 0
+
+
+@pytest.fixture
+def local_predictor(db, monkeypatch):
+    pytest.importorskip('torch')
+    from app.ml.inference import LocalInference
+    from app.ml.predict import LSTMAEPredictor
+
+    predictor = LSTMAEPredictor(config={'input_size': 1, 'hidden_size': 4, 'num_layers': 1, 'dropout_ratio': 0.0,
+                                        'seq_len': 4, 'use_act': True})
+    predictor.model = object()
+    local = LocalInference()
+    local._predictor = predictor
+    monkeypatch.setattr(prediction_jobs, 'inference', local)
+    db.water_meters.insert_one({'meter_id': 1, 'branch_id': 1, 'threshold': 0.5})
+    db.meter_measurement_data.insert_many([
+        {'id': 100 + hour, 'meter_id': 1, 'measurement_time': f'2023-12-31T{hour:02d}:00:00', 'instant_flow': 1.0 + hour}
+        for hour in range(6)
+    ])
+    return predictor
+
+
+@pytest.mark.parametrize('broken', ['prepare_window', 'forward'])
+def test_scoring_errors_retry_the_job(db, local_predictor, monkeypatch, broken):
+    def fail(*args):
+        raise RuntimeError('mongo down')
+
+    monkeypatch.setattr(local_predictor, broken, fail)
+    enqueue(1)
+    enqueue(2)
+    prediction_jobs.process_jobs(prediction_jobs.lease_jobs('w1', 5), 'w1')
+    assert db.predictions.count_documents({}) == 0
+    jobs = list(db.prediction_jobs.find())
+    assert len(jobs) == 2
+    assert all(job['status'] == prediction_jobs.JOB_PENDING and 'mongo down' in job['last_error'] for job in jobs)
+    # API trả kết quả ngay vẫn nhận kết quả dự phòng với ngưỡng đang lưu
+    assert local_predictor.predict_many([(1, 2.0)]) == [(False, 0.95, 0.0, 0.5)]
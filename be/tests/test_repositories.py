@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from app.database import ensure_indexes
+from app.repositories import meters, measurements, predictions
+from app.repositories.measurements import fill_missing
+
+REPOSITORIES = [meters, measurements, predictions]
+
+
+@pytest.mark.parametrize('repository', REPOSITORIES, ids=lambda repository: repository.id_counter)
+def test_reserve_ids_is_contiguous_and_starts_after_existing(db, repository):
+    repository.collection.insert_one({repository.id_field: 41})
+    assert repository.reserve_ids(3) == [42, 43, 44]
+    assert repository.reserve_ids(1) == [45]
+
+
+@pytest.mark.parametrize('repository', REPOSITORIES, ids=lambda repository: repository.id_counter)
+def test_ensure_indexes_seeds_counters(db, repository):
+    repository.collection.insert_one({repository.id_field: 100})
+    ensure_indexes()
+    assert db.counters.find_one({'_id': repository.id_counter})['seq'] == 100
+    # Sau khi seed, cấp id chỉ còn $inc: không đọc lại id lớn nhất
+    repository.collection.insert_one({repository.id_field: 500})
+    assert repository.reserve_ids(1) == [101]
+
+
+def test_fill_missing_carries_last_present_value_forward():
+    rows = np.array([[1.0, np.nan], [2.0, 3.0], [3.0, np.nan], [4.0, 5.0]])
+    assert fill_missing(rows).tolist() == [[1.0, 3.0], [2.0, 3.0], [3.0, 3.0], [4.0, 5.0]]
+    assert fill_missing(np.array([[1.0, np.nan], [2.0, np.nan]])).tolist() == [[1.0, 0.0], [2.0, 0.0]]
@@ -0,0 +1,105 @@
+import os
+from datetime import datetime
+import pytest
+from app.config import Config
+from app.services import retention
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'ARCHIVE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def measurement(measurement_id, time, flow=1.0):
+    return {'id': measurement_id, 'meter_id': 1, 'measurement_time': time, 'instant_flow': flow, 'instant_pressure': None}
+
+
+def test_retention_cutoff_rounds_to_month_start():
+    assert retention.retention_cutoff(30, now=datetime(2024, 3, 20, 15)) == '2024-02-01T00:00:00'
+    assert retention.next_month('2024-12-01T00:00:00') == '2025-01-01T00:00:00'
+
+
+def test_archive_delete_and_restore_roundtrip(db):
+    db.meter_measurement_data.insert_many([
+        measurement(2, '2024-01-05T00:00:00', 2.0),
+        measurement(1, '2024-01-05T00:00:00', 1.0),
+        measurement(3, '2024-01-31T23:00:00', 3.0),
+        measurement(4, '2024-02-01T00:00:00', 4.0),
+    ])
+    rows, month_filter = retention.archive_month('measurements', '2024-01-01T00:00:00')
+    assert rows == 3
+    assert retention.list_archives()[0]['month'] == '2024-01'
+    assert db.meter_measurement_data.delete_many(month_filter).deleted_count == 3
+    assert [doc['id'] for doc in db.meter_measurement_data.find()] == [4]
+
+    assert retention.restore_archive('measurements', '2024-01') == 3
+    # Khôi phục lại lần nữa ghi đè theo khoá, không nhân đôi
+    assert retention.restore_archive('measurements', '2024-01') == 3
+    restored = list(db.meter_measurement_data.find({'id': {'$lt': 4}}, {'_id': 0}, sort=[('id', 1)]))
+    assert restored == [measurement(1, '2024-01-05T00:00:00', 1.0), measurement(2, '2024-01-05T00:00:00', 2.0),
+                        measurement(3, '2024-01-31T23:00:00', 3.0)]
+
+
+def test_archive_skips_rows_added_after_snapshot(db, monkeypatch):
+    db.meter_measurement_data.insert_many([measurement(1, '2024-01-05T00:00:00'), measurement(2, '2024-01-06T00:00:00')])
+    rows, month_filter = retention.archive_month('measurements', '2024-01-01T00:00:00')
+    db.meter_measurement_data.insert_one(measurement(3, '2024-01-07T00:00:00'))
+    assert rows == 2
+    db.meter_measurement_data.delete_many(month_filter)
+    assert [doc['id'] for doc in db.meter_measurement_data.find()] == [3]
+
+
+def test_empty_month_writes_no_file(db, archive_dir):
+    assert retention.archive_month('measurements', '2024-01-01T00:00:00')[0] == 0
+    db.meter_measurement_data.insert_one(measurement(1, '2024-02-05T00:00:00'))
+    assert retention.archive_month('measurements', '2024-01-01T00:00:00')[0] == 0
+    assert os.listdir(archive_dir / 'measurements' / '2024-01') == []
+
+
+@pytest.mark.parametrize('month', ['2024-1', '../2024-01', '2024-01/..', '2024-01-01'])
+def test_restore_rejects_invalid_month(month):
+    with pytest.raises(ValueError):
+        retention.restore_archive('measurements', month)
+
+
+def test_restore_missing_archive():
+    with pytest.raises(FileNotFoundError):
+        retention.restore_archive('measurements', '2023-12')
+
+
+def test_missing_meter_rollup_triggers_backfill(db, monkeypatch):
+    backfills = []
+    monkeypatch.setattr(retention, 'backfill_rollups', lambda since=None: backfills.append(since))
+    month = '2024-01-01T00:00:00'
+    db.meter_measurement_data.insert_many([
+        measurement(1, '2024-01-05T00:00:00'),
+        dict(measurement(2, '2024-01-06T00:00:00'), meter_id=2),
+    ])
+    db.meter_rollups.insert_one({'meter_id': 1, 'resolution': 'monthly', 'bucket': month, 'flow_count': 1})
+    retention.ensure_compacted('measurements', month)
+    assert backfills == [month]
+
+    db.meter_rollups.insert_one({'meter_id': 2, 'resolution': 'monthly', 'bucket': month, 'flow_count': 1})
+    retention.ensure_compacted('measurements', month)
+    assert backfills == [month]
+
+
+def test_prediction_archive_keeps_idempotency_key(db):
+    db.predictions.insert_many([
+        {'p_id': 1, 'meter_id': 1, 'measurement_id': 10, 'model_id': 1, 'prediction_time': '2024-01-05T00:00:00',
+         'prediction_threshold': 0.5, 'predicted_label': 'Rò rỉ', 'label_code': 'leak', 'confidence': 0.9,
+         'recorded_instant_flow': 2.0},
+        # Prediction nạp từ CSV không có measurement_id
+        {'p_id': 2, 'meter_id': 1, 'model_id': 1, 'prediction_time': '2024-01-06T00:00:00',
+         'prediction_threshold': 0.5, 'predicted_label': 'Bình thường', 'label_code': 'normal', 'confidence': 0.8,
+         'recorded_instant_flow': 1.0},
+    ])
+    rows, month_filter = retention.archive_month('predictions', '2024-01-01T00:00:00')
+    db.predictions.delete_many(month_filter)
+    assert retention.restore_archive('predictions', '2024-01') == rows == 2
+    first, second = db.predictions.find({}, {'_id': 0}, sort=[('p_id', 1)])
+    assert first['measurement_id'] == 10 and first['label_code'] == 'leak'
+    assert 'measurement_id' not in second and second['label_code'] == 'normal'
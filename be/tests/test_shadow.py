@@ -0,0 +1,25 @@
+from app.ml.config import MLConfig
+from app.services import shadow
+
+
+def test_shadow_is_not_started_in_remote_mode(app, monkeypatch):
+    monkeypatch.setattr(MLConfig, 'SHADOW_MODEL_ID', 7)
+    monkeypatch.setattr(MLConfig, 'SHADOW_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(MLConfig, 'INFERENCE_MODE', 'remote')
+    assert shadow.start_shadow_worker() is None
+    assert not shadow.shadow_running()
+
+
+def test_report_latency_uses_recent_sample(db, monkeypatch):
+    monkeypatch.setattr(shadow, 'LATENCY_SAMPLE_SIZE', 3)
+    db.shadow_predictions.insert_many([
+        {'candidate_model_id': 7, 'meter_id': 1, 'measurement_id': index, 'measurement_time': f'2024-01-01T{index:02d}:00:00',
+         'agree': True, 'primary': {'is_anomaly': False, 'reconstruction_error': 0.1, 'latency_ms': float(index)},
+         'candidate': {'is_anomaly': False, 'reconstruction_error': 0.2, 'latency_ms': 2.0 * index}}
+        for index in range(10)
+    ])
+    report = shadow.shadow_report(7)
+    assert report['count'] == 10 and report['agreement_rate'] == 1.0
+    assert report['latency_sample'] == 3
+    assert report['primary_latency_ms']['p50'] == 8.0
+    assert report['candidate_latency_ms']['p50'] == 16.0
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from app.ml.config import MLConfig
+from app.services import threshold_sketches
+from app.services.threshold_sketches import ErrorSketch
+
+
+def sketch_doc(sketch, values):
+    buckets, zero = sketch.histogram(values)
+    return {'buckets': buckets, 'zero': zero, 'landmark': 0.0}
+
+
+@pytest.mark.parametrize('q', [0.5, 0.9, 0.95, 0.99])
+def test_quantile_within_relative_accuracy(q):
+    sketch = ErrorSketch(0.01)
+    values = np.random.default_rng(0).lognormal(mean=-3, sigma=1.5, size=20000)
+    estimate = sketch.quantile(sketch_doc(sketch, values), q)
+    exact = np.quantile(values, q, method='inverted_cdf')
+    assert abs(estimate - exact) <= 0.01 * exact
+
+
+def test_zero_values_go_to_zero_bucket():
+    sketch = ErrorSketch(0.01)
+    doc = sketch_doc(sketch, [0.0] * 6 + [1.0] * 4)
+    assert doc['zero'] == 6
+    assert sketch.quantile(doc, 0.5) == 0.0
+    assert sketch.quantile(doc, 0.9) == pytest.approx(1.0, rel=0.01)
+    assert sketch.quantile({'buckets': {}, 'zero': 0.0}, 0.5) is None
+
+
+def test_decay_weights_newer_points_more():
+    sketch = ErrorSketch(0.01, half_life_seconds=10)
+    assert sketch.weight(0, 10) == 2.0
+    assert not sketch.needs_rescale(0, 600)
+    assert sketch.needs_rescale(0, 601)
+    doc = {'buckets': {str(sketch.bucket(1.0)): 1.0, str(sketch.bucket(2.0)): 4.0}, 'zero': 0.0, 'landmark': 0.0}
+    assert sketch.count(doc, 20) == pytest.approx(1.25)
+    assert sketch.quantile(doc, 0.5) == pytest.approx(2.0, rel=0.01)
+
+
+def test_recorded_errors_give_threshold(db, monkeypatch):
+    monkeypatch.setattr(MLConfig, 'THRESHOLD_SKETCH_MIN_COUNT', 10)
+    monkeypatch.setattr(MLConfig, 'THRESHOLD_SKETCH_HALF_LIFE_HOURS', 0)
+    for value in range(1, 10):
+        threshold_sketches.record_error(7, float(value), now=100.0)
+    assert threshold_sketches.sketch_threshold(7, 50, now=100.0) is None
+
+    threshold_sketches.record_error(7, 10.0, now=100.0)
+    assert threshold_sketches.sketch_threshold(7, 90, now=100.0) == pytest.approx(9.0, rel=0.01)
+
+    threshold_sketches.seed_sketch(7, [0.5] * 20, now=200.0)
+    assert threshold_sketches.sketch_threshold(7, 90, now=200.0) == pytest.approx(0.5, rel=0.01)
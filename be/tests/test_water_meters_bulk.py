@@ -0,0 +1,42 @@
+import pytest
+
+URL = '/api/water-meters/water_meters/bulk'
+
+
+@pytest.fixture
+def client(app, db):
+    db.branches.insert_many([{'branch_id': 0}, {'branch_id': 1}])
+    return app.test_client()
+
+
+def meter(branch_id, name='m'):
+    return {'branch_id': branch_id, 'meter_name': name, 'installation_time': '2024-01-01T00:00:00'}
+
+
+def test_all_rows_created(client, db):
+    response = client.post(URL, json=[meter(0, 'a'), meter(1, 'b')])
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['created'] == 2 and body['failed'] == 0
+    assert sorted(doc['meter_name'] for doc in db.water_meters.find()) == ['a', 'b']
+
+
+def test_mixed_rows_return_multi_status(client):
+    response = client.post(URL, json={'meters': [meter(1), meter(9), {'branch_id': 1, 'meter_name': ''}]})
+    assert response.status_code == 207
+    statuses = [result['status'] for result in response.get_json()['results']]
+    assert statuses == ['created', 'error', 'error']
+
+
+def test_no_rows_created(client, db):
+    response = client.post(URL, json=[meter(9), {'meter_name': 'x'}])
+    assert response.status_code == 400
+    assert response.get_json()['created'] == 0
+    assert db.water_meters.count_documents({}) == 0
+
+
+def test_csv_upload(client):
+    body = 'branch_id,meter_name,installation_time\n0,a,2024-01-01\n1,,2024-01-01\n'
+    response = client.post(URL, data=body, content_type='text/csv')
+    assert response.status_code == 207
+    assert response.get_json()['results'][1]['error'] == 'Missing required fields: meter_name'
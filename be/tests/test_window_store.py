@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+from app.config import Config
+from app.repositories import measurements
+from app.services import window_store
+
+FEATURES = ('instant_flow', 'instant_pressure')
+
+
+@pytest.fixture(autouse=True)
+def store_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'WINDOW_STORE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def add_measurements(db, meter_id, first_id, count, pressure=True):
+    db.meter_measurement_data.insert_many([
+        {'id': first_id + offset, 'meter_id': meter_id, 'measurement_time': f'2024-01-01T{(first_id + offset) % 24:02d}:00:00',
+         'instant_flow': float(first_id + offset), 'instant_pressure': float(offset) if pressure else None}
+        for offset in range(count)
+    ])
+
+
+def assert_same_window(meter_id, limit, **kwargs):
+    expected = measurements.feature_window(meter_id, limit, FEATURES, **kwargs)
+    actual = window_store.feature_window(meter_id, limit, FEATURES, **kwargs)
+    np.testing.assert_array_equal(actual, expected.astype(np.float32))
+    return actual
+
+
+def test_window_matches_repository(db):
+    add_measurements(db, 1, 0, 10)
+    window = assert_same_window(1, 4)
+    assert window[:, 0].tolist() == [9.0, 8.0, 7.0, 6.0]
+    assert_same_window(1, 20)
+    assert_same_window(1, 3, start_time='2024-01-01T02:00:00', end_time='2024-01-01T06:00:00')
+    assert_same_window(1, 10, start_time='2024-01-01T07:00:00')
+    assert window_store.feature_window(2, 5, FEATURES).shape == (0, 2)
+
+
+def test_refresh_only_reads_new_rows(db):
+    add_measurements(db, 1, 0, 5)
+    assert window_store.refresh_meter(1, FEATURES) == 5
+    assert window_store.refresh_meter(1, FEATURES) == 0
+    add_measurements(db, 1, 5, 3)
+    # Bản ghi cùng thời điểm với mốc high-water ghi sau lần refresh trước cũng được lấy
+    db.meter_measurement_data.insert_one({'id': 100, 'meter_id': 1, 'measurement_time': '2024-01-01T07:00:00',
+                                          'instant_flow': 100.0, 'instant_pressure': 0.0})
+    assert window_store.refresh_meter(1, FEATURES) == 4
+    assert window_store.refresh_meter(1, FEATURES) == 0
+    values, times = window_store.open_meter(1, FEATURES)
+    assert len(values) == len(times) == 9
+    assert values[-2:, 0].tolist() == [7.0, 100.0]
+
+
+def test_missing_values_are_kept_as_nan(db):
+    add_measurements(db, 1, 0, 3, pressure=False)
+    window = assert_same_window(1, 3)
+    assert np.isnan(window[:, 1]).all()
+
+
+def test_timezone_aware_times_are_normalized(db):
+    db.meter_measurement_data.insert_many([
+        {'id': 1, 'meter_id': 1, 'measurement_time': '2024-01-01T08:00:00+07:00', 'instant_flow': 1.0},
+        {'id': 2, 'meter_id': 1, 'measurement_time': '2024-01-01T02:00:00', 'instant_flow': 2.0},
+        {'id': 3, 'meter_id': 1, 'measurement_time': '2024-01-01T03:30:00Z', 'instant_flow': 3.0},
+    ])
+    assert window_store.time_seconds('2024-01-01T08:00:00+07:00') == window_store.time_seconds('2024-01-01T01:00:00')
+    window = window_store.feature_window(1, 10, ('instant_flow',), start_time='2024-01-01T01:00:00',
+                                         end_time='2024-01-01T09:00:00+07:00')
+    assert window[:, 0].tolist() == [2.0, 1.0]
+
+
+def test_changed_features_rebuild(db):
+    add_measurements(db, 1, 0, 4)
+    window_store.refresh_meter(1, FEATURES)
+    assert window_store.open_meter(1, ('instant_flow',)) is None
+    assert window_store.feature_window(1, 2, ('instant_flow',))[:, 0].tolist() == [3.0, 2.0]
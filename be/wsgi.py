@@ -0,0 +1,26 @@
+import gc
+from app import create_app
+from app.config import Config
+from app.logging_utils import get_logger
+from app.ml.config import MLConfig
+
+logger = get_logger('app.wsgi')
+
+
+def create_wsgi_app():
+    app = create_app()
+    if Config.PRELOAD_MODEL and MLConfig.INFERENCE_MODE != 'remote':
+        # Tải trọng số một lần trong master: các worker sau fork dùng chung trang nhớ (copy-on-write).
+        # Không chạy suy luận ở đây, pool luồng torch/OpenMP phải được tạo trong từng worker.
+        from app.ml.inference import inference
+        try:
+            inference.predictor.load_model()
+        except Exception:
+            # Không chặn khởi động: mỗi worker sẽ tự tải mô hình ở lần dự đoán đầu tiên
+            logger.exception("Không tải trước được mô hình")
+    # Đưa các đối tượng đã tạo vào thế hệ cố định của GC để lần thu gom trong worker không ghi lên các trang dùng chung
+    gc.freeze()
+    return app
+
+
+app = create_wsgi_app()